@@ -15,6 +15,22 @@ class TelloDron(object):
         self.flight_time_s = 0
         self.telemetry_ts = None
 
+        # Estado completo del paquete de telemetría (None hasta el primer paquete)
+        self.pitch_deg = None
+        self.roll_deg = None
+        self.vgx = self.vgy = self.vgz = None       # velocidades (dm/s)
+        self.agx = self.agy = self.agz = None       # aceleraciones (milésimas de g)
+        self.tof_cm = None                          # distancia ToF al suelo
+        self.baro_m = None                          # altitud barométrica
+        self.templ_c = None
+        self.temph_c = None
+
+        # Histórico de telemetría (TelemetryHistory, se crea en startTelemetry)
+        self.history = None
+
+        # Caja negra (FlightRecorder, se crea en start_recording)
+        self._recorder = None
+
         # Backend djitellopy
         self._tello = None
 
@@ -37,11 +53,22 @@ class TelloDron(object):
     from TelloLink.modules.tello_connect import connect, _connect, disconnect, _send, _require_connected
     from TelloLink.modules.tello_takeOff import takeOff, _takeOff, _checkAltitudeReached, _ascend_to_target
     from TelloLink.modules.tello_land import Land, _land
-    from TelloLink.modules.tello_telemetry import startTelemetry, stopTelemetry
-    from TelloLink.modules.tello_move import _move, up, down, set_speed, forward, back, left, right, rc
+    from TelloLink.modules.tello_telemetry import (startTelemetry, stopTelemetry, telemetry, subscribe, unsubscribe,
+                                                   telemetry_stream)
+    from TelloLink.modules.tello_move import _move, up, down, set_speed, forward, back, left, right, rc, go
     from TelloLink.modules.tello_heading import rotate, cw, ccw
     from TelloLink.modules.tello_video import start_video, stop_video, show_video_blocking
     from TelloLink.modules.tello_pose import PoseVirtual
+    from TelloLink.modules.tello_estimator import enable_pose_estimator, disable_pose_estimator
+    from TelloLink.modules.tello_pads import (enable_mission_pads, disable_mission_pads, set_pad_layout,
+                                              save_pad_layout, pad_fix)
     from TelloLink.modules.tello_goto import goto_rel, abort_goto
     from TelloLink.modules.tello_mission import run_mission, abort_mission
-    from TelloLink.modules.tello_geofence import set_geofence, disable_geofence, recenter_geofence, add_exclusion_poly, add_exclusion_circle, clear_exclusions
\ No newline at end of file
+    from TelloLink.modules.tello_async import (connect_async, disconnect_async, send_async, forward_async, back_async,
+                                               left_async, right_async, up_async, down_async, rotate_async,
+                                               takeOff_async, Land_async)
+    from TelloLink.modules.tello_geofence import set_geofence, disable_geofence, recenter_geofence, add_exclusion_poly, add_exclusion_circle, clear_exclusions, set_geofence_buffer
+    from TelloLink.modules.tello_geofence import _gf_excl_polys, _gf_excl_circles, _gf_limits, _gf_center, geofence_config, save_geofence, load_geofence
+    from TelloLink.modules.tello_geofence import geofence_check_points, geofence_check_segment
+    from TelloLink.modules.tello_geofence import configure_geofence_sdf, geofence_distance, geofence_gradient, geofence_plan
+    from TelloLink.modules.tello_blackbox import start_recording, stop_recording, replay_flight
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .Tello import TelloDron
 from .modules.tello_joystick import JoystickController
-__all__ = ["TelloDron", "JoystickController"]
\ No newline at end of file
+from .modules.tello_simulator import TelloSimulator
+__all__ = ["TelloDron", "JoystickController", "TelloSimulator"]
\ No newline at end of file
@@ -0,0 +1,498 @@
+import asyncio
+import threading
+import time
+
+from TelloLink.modules.tello_move import _distancia_acotada, _resp_is_ok, _ensure_techo, _gf_clip_step, COOLDOWN_S, MIN_STEP
+from TelloLink.modules.tello_heading import _magnitud_grados, MIN_DEG, STEP_MAX_DEG
+from TelloLink.modules.tello_telemetry import parse_state
+
+# Parámetros del protocolo SDK de Tello
+TELLO_IP = "192.168.10.1"
+CMD_PORT = 8889           # comandos / respuestas
+STATE_PORT = 8890         # paquetes de estado (~10 Hz)
+VIDEO_PORT = 11111        # H.264 tras 'streamon'
+RESPONSE_TIMEOUT = 15     # mismo valor que usamos con djitellopy en tello_connect
+
+
+# --- Bucle compartido para los wrappers síncronos ---
+# Un único hilo con un event loop sirve a todos los drones conectados con backend asyncio.
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def _get_shared_loop():
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None or _shared_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            th = threading.Thread(target=loop.run_forever, name="tello-asyncio", daemon=True)
+            th.start()
+            _shared_loop = loop
+        return _shared_loop
+
+
+class _CommandProtocol(asyncio.DatagramProtocol):
+    # Socket de comandos: cada transporte tiene el suyo (puerto local efímero), así las respuestas no se mezclan entre drones
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def datagram_received(self, data, addr):
+        self._owner._on_response(data)
+
+    def error_received(self, exc):
+        self._owner._on_error(exc)
+
+
+class _StateProtocol(asyncio.DatagramProtocol):
+    # Socket de estado: todos los Tello envían al mismo puerto local, se reparte por IP de origen
+
+    def __init__(self):
+        self.handlers = {}
+
+    def datagram_received(self, data, addr):
+        handler = self.handlers.get(addr[0])
+        if handler is not None:
+            handler(data, time.time())
+
+
+# (loop, puerto local) -> [transport, protocol, nº de usuarios]
+_state_endpoints = {}
+
+
+async def _acquire_state_endpoint(port: int):
+    loop = asyncio.get_running_loop()
+    key = (loop, port)
+    entry = _state_endpoints.get(key)
+    if entry is None:
+        tr, proto = await loop.create_datagram_endpoint(_StateProtocol, local_addr=("0.0.0.0", port))
+        entry = [tr, proto, 0]
+        _state_endpoints[key] = entry
+    entry[2] += 1
+    return entry[1]
+
+
+def _release_state_endpoint(loop, port: int):
+    key = (loop, port)
+    entry = _state_endpoints.get(key)
+    if entry is None:
+        return
+    entry[2] -= 1
+    if entry[2] <= 0:
+        entry[0].close()
+        del _state_endpoints[key]
+
+
+class TelloAsyncTransport:
+    """
+    Transporte UDP nativo de asyncio para un Tello.
+    Las corrutinas (open, send, close) se ejecutan en el loop del transporte; los métodos con nombre
+    de djitellopy (send_read_command, get_height, send_rc_control...) son envoltorios síncronos para
+    que el resto de módulos funcionen igual con este backend.
+    """
+
+    def __init__(self, host: str = TELLO_IP, port: int = CMD_PORT, state_port: int = STATE_PORT,
+                 timeout: float = RESPONSE_TIMEOUT, video_port: int = VIDEO_PORT):
+        self.host = host
+        self.port = int(port)
+        self.state_port = int(state_port)
+        self.video_port = int(video_port)
+        self.RESPONSE_TIMEOUT = timeout
+        self._frame_read = None
+
+        self.state = {}
+        self.state_ts = None
+        self._state_listeners = []
+
+        self._loop = None
+        self._udp = None
+        self._lock = None
+        self._pending = None
+        self._state_proto = None
+
+    # --- Corrutinas (ejecutar en self._loop) ---
+
+    async def open(self):
+        self._loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+        self._udp, _ = await self._loop.create_datagram_endpoint(
+            lambda: _CommandProtocol(self), remote_addr=(self.host, self.port))
+        self._state_proto = await _acquire_state_endpoint(self.state_port)
+        self._state_proto.handlers[self.host] = self._on_state
+
+        # Entrar en modo SDK
+        resp = await self.send("command")
+        if not _resp_is_ok(resp):
+            await self.close()
+            raise RuntimeError(f"command -> {resp}")
+        return True
+
+    async def send(self, cmd: str, timeout: float | None = None) -> str:
+        if self._udp is None:
+            raise RuntimeError("Transporte asyncio cerrado.")
+        if timeout is None:
+            timeout = self.RESPONSE_TIMEOUT
+        # El Tello no etiqueta las respuestas: un comando pendiente por dron, el resto espera en el lock
+        async with self._lock:
+            fut = self._loop.create_future()
+            self._pending = fut
+            self._udp.sendto(cmd.encode("utf-8"))
+            try:
+                return await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                return f"error timeout ({cmd})"
+            finally:
+                self._pending = None
+
+    async def close(self):
+        if self._state_proto is not None:
+            self._state_proto.handlers.pop(self.host, None)
+            _release_state_endpoint(self._loop, self.state_port)
+            self._state_proto = None
+        if self._udp is not None:
+            self._udp.close()
+            self._udp = None
+
+    # --- Callbacks de los protocolos ---
+
+    def _on_response(self, data: bytes):
+        fut = self._pending
+        # Respuestas tardías (tras un timeout) se descartan
+        if fut is not None and not fut.done():
+            fut.set_result(data.decode("utf-8", errors="ignore").strip())
+
+    def _on_error(self, exc):
+        fut = self._pending
+        if fut is not None and not fut.done():
+            fut.set_result(f"error {exc}")
+
+    def _on_state(self, data: bytes, ts: float):
+        self.state = parse_state(data.decode("ascii", errors="ignore"))
+        self.state_ts = ts
+        for cb in list(self._state_listeners):
+            try:
+                cb(self.state, ts)
+            except Exception:
+                pass
+
+    def add_state_listener(self, cb):
+        self._state_listeners.append(cb)
+
+    def remove_state_listener(self, cb):
+        try:
+            self._state_listeners.remove(cb)
+        except ValueError:
+            pass
+
+    # --- Envoltorios síncronos (API estilo djitellopy) ---
+
+    def run_sync(self, coro):
+        # Ejecuta una corrutina en el loop del transporte desde otro hilo y espera el resultado
+        if self._loop is None:
+            raise RuntimeError("Transporte asyncio no abierto.")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            coro.close()
+            raise RuntimeError("Llamada síncrona desde el propio event loop; usa la versión *_async.")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def send_read_command(self, cmd: str) -> str:
+        return self.run_sync(self.send(cmd))
+
+    def send_rc_control(self, a: int, b: int, c: int, d: int):
+        # 'rc' no tiene respuesta: se envía sin esperar
+        if self._udp is None:
+            raise RuntimeError("Transporte asyncio cerrado.")
+        msg = f"rc {int(a)} {int(b)} {int(c)} {int(d)}".encode("utf-8")
+        self._loop.call_soon_threadsafe(self._udp.sendto, msg)
+
+    def get_current_state(self) -> dict:
+        return self.state
+
+    def _state_field(self, key):
+        v = self.state.get(key)
+        if v is None:
+            raise RuntimeError(f"Campo de estado '{key}' no disponible")
+        return v
+
+    def get_height(self):
+        return self._state_field("h")
+
+    def get_yaw(self):
+        return self._state_field("yaw")
+
+    def get_battery(self):
+        return self._state_field("bat")
+
+    def get_flight_time(self):
+        return self._state_field("time")
+
+    def get_temperature(self):
+        return (self._state_field("templ") + self._state_field("temph")) / 2
+
+    def streamon(self):
+        return self.send_read_command("streamon")
+
+    def streamoff(self):
+        if self._frame_read is not None:
+            self._frame_read.stop()
+            self._frame_read = None
+        return self.send_read_command("streamoff")
+
+    def get_frame_read(self):
+        # Reutilizamos el lector de vídeo (PyAV) de djitellopy apuntando a nuestro puerto de vídeo
+        if self._frame_read is None:
+            from djitellopy.tello import BackgroundFrameRead
+            self._frame_read = BackgroundFrameRead(self, f"udp://@0.0.0.0:{self.video_port}")
+            self._frame_read.start()
+        return self._frame_read
+
+    def end(self):
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._loop.create_task(self.close())
+        else:
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result(timeout=2.0)
+
+
+# --- API asíncrona de TelloDron ---
+
+async def connect_async(self, host: str = TELLO_IP, port: int = CMD_PORT, state_port: int = STATE_PORT,
+                        video_port: int = VIDEO_PORT):
+    # Conecta usando el loop en ejecución; un mismo loop puede gobernar varios drones
+    if self.state != "disconnected":
+        return False
+    transport = TelloAsyncTransport(host=host, port=port, state_port=state_port, video_port=video_port)
+    try:
+        await transport.open()
+    except Exception as Err:
+        print("Error conectando a Tello:", Err)
+        return False
+    self._tello = transport
+    self.state = "connected"
+    return True
+
+
+async def disconnect_async(self):
+    try:
+        self.stopTelemetry()
+    except Exception:
+        pass
+    tr = getattr(self, "_tello", None)
+    try:
+        if isinstance(tr, TelloAsyncTransport):
+            await tr.close()
+        elif tr is not None:
+            tr.end()
+    finally:
+        self._tello = None
+        self.state = "disconnected"
+    return True
+
+
+async def send_async(self, cmd: str, timeout: float | None = None) -> str:
+    self._require_connected()
+    tr = self._tello
+    if isinstance(tr, TelloAsyncTransport):
+        rec = getattr(self, "_recorder", None)
+        if rec is not None:
+            rec.cmd(cmd)
+        resp = await tr.send(cmd, timeout)
+        if rec is not None:
+            rec.ack(resp)
+        return resp
+    # Backend djitellopy: no es nativo, se delega a un hilo para no bloquear el loop
+    return await asyncio.get_running_loop().run_in_executor(None, self._send, cmd)
+
+
+def _update_pose_move(self, verb, d):
+    try:
+        pose = getattr(self, "pose", None)
+        if pose is not None:
+            pose.update_move(verb, d)
+    except Exception:
+        pass
+
+
+async def _move_async(self, verb, dist_cm):
+    self._require_connected()
+    d = _gf_clip_step(self, verb, _distancia_acotada(dist_cm))
+    if d == 0:
+        return False
+    resp = await send_async(self, f"{verb} {d}")
+    if not _resp_is_ok(resp):
+        raise RuntimeError(f"{verb} {d} -> {resp}")
+    _update_pose_move(self, verb, d)
+    await asyncio.sleep(COOLDOWN_S)
+    return True
+
+
+async def forward_async(self, dist_cm: int):
+    return await _move_async(self, "forward", dist_cm)
+
+
+async def back_async(self, dist_cm: int):
+    return await _move_async(self, "back", dist_cm)
+
+
+async def left_async(self, dist_cm: int):
+    return await _move_async(self, "left", dist_cm)
+
+
+async def right_async(self, dist_cm: int):
+    return await _move_async(self, "right", dist_cm)
+
+
+async def up_async(self, dist_cm: int):
+    # Mismo recorte por techo que tello_move.up
+    self._require_connected()
+    _ensure_techo(self)
+    d = _distancia_acotada(dist_cm)
+    curr_h = getattr(self, "height_cm", None)
+    if isinstance(curr_h, int):
+        max_cm = int(self.TECHO_M * 100)
+        if curr_h + d > max_cm:
+            d = max(0, max_cm - curr_h)
+            if d < MIN_STEP:
+                print(f"[INFO] up recortado a 0 (ya en techo ≈ {self.TECHO_M} m)")
+                return True
+    if d == 0:
+        return True
+    return await _move_async(self, "up", d)
+
+
+async def down_async(self, dist_cm: int):
+    self._require_connected()
+    d = _distancia_acotada(dist_cm)
+    curr_h = getattr(self, "height_cm", None)
+    if isinstance(curr_h, int) and d > curr_h:
+        d = max(MIN_STEP, curr_h)
+    return await _move_async(self, "down", d)
+
+
+async def rotate_async(self, deg):
+    self._require_connected()
+    if not deg:
+        return True
+    verb = "cw" if deg > 0 else "ccw"
+    restante = _magnitud_grados(deg)
+    if restante < MIN_DEG:
+        return True
+    while restante > 0:
+        paso = min(restante, STEP_MAX_DEG)
+        resp = await send_async(self, f"{verb} {paso}")
+        if str(resp).lower() != "ok":
+            raise RuntimeError(f"{verb} {paso} -> {resp}")
+        try:
+            if getattr(self, "pose", None) is not None:
+                self.pose.update_yaw(float(paso) if verb == "cw" else -float(paso))
+        except Exception:
+            pass
+        restante -= paso
+        await asyncio.sleep(COOLDOWN_S)
+    return True
+
+
+def _height_now(self) -> int:
+    tr = getattr(self, "_tello", None)
+    try:
+        if tr is not None:
+            return max(0, int(tr.get_height()))
+    except Exception:
+        pass
+    try:
+        return max(0, int(getattr(self, "height_cm", 0) or 0))
+    except Exception:
+        return 0
+
+
+async def _wait_height(self, cond, timeout_s: float) -> bool:
+    t0 = time.time()
+    while time.time() - t0 < timeout_s:
+        if cond(_height_now(self)):
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def takeOff_async(self, altura_objetivo_m=0.5):
+    # Versión asíncrona de tello_takeOff._takeOff: misma secuencia, sin bloquear hilos
+    if getattr(self, "_takeoff_in_progress", False):
+        print("[takeOff] Ya hay un despegue en curso; ignoro la petición duplicada.")
+        return True
+    if getattr(self, "state", "") == "disconnected":
+        print("[ERROR] Dron desconectado, abortando despegue.")
+        return False
+
+    self._takeoff_in_progress = True
+    try:
+        resp = await send_async(self, "takeoff")
+        print(f"[INFO] tello_takeOff -> respuesta inicial: {resp}")
+
+        ok_alt = await _wait_height(self, lambda h: h >= 20, 5.0)
+        if not ok_alt:
+            print("[WARN] Altura <20 cm tras 5s, aplico empujón 'up 20'")
+            await send_async(self, "up 20")
+            ok_alt = await _wait_height(self, lambda h: h >= 20, 2.0)
+        if not ok_alt:
+            print("[ERROR] No se confirmó despegue (altura <20 cm tras reintento).")
+            return False
+
+        h = _height_now(self)
+        self.state = "flying"
+        try:
+            pose = getattr(self, "pose", None)
+            if pose is not None:
+                pose.reset()
+                pose.z_cm = float(h)
+                pose.yaw_deg = 0.0
+        except Exception:
+            pass
+
+        target_h_cm = int(altura_objetivo_m * 100)
+        if h < target_h_cm:
+            await send_async(self, f"up {int(target_h_cm - h)}")
+
+        self._after_takeoff_ts = time.time()
+        await asyncio.sleep(0.7)
+        return True
+    except Exception as e:
+        print(f"[ERROR] takeOff -> {e}")
+        return False
+    finally:
+        self._takeoff_in_progress = False
+
+
+async def Land_async(self):
+    from TelloLink.modules.tello_land import _normalize_after_land
+
+    if getattr(self, "_landing_in_progress", False):
+        print("[land] Ya hay un aterrizaje en curso; ignoro la petición duplicada.")
+        return True
+    if getattr(self, "state", "") != "flying":
+        _normalize_after_land(self)
+        return True
+
+    self._landing_in_progress = True
+    try:
+        self.state = "landing"
+        if _height_now(self) > 20:
+            try:
+                resp = await send_async(self, "land")
+                print(f"[land] Respuesta SDK: {resp!r}")
+            except Exception as e:
+                print(f"[land] Aviso al enviar 'land': {e}")
+            await _wait_height(self, lambda h: h <= 15, 15.0)
+        _normalize_after_land(self)
+        print("[land] Completado.")
+        return True
+    finally:
+        self._landing_in_progress = False
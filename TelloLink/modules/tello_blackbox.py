@@ -0,0 +1,336 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+from TelloLink.modules.tello_pose import watch_pose, unwatch_pose
+
+# Caja negra: registro binario de solo-añadir con todo lo que pasa en un vuelo.
+#
+# Fichero .tlbb:  cabecera  MAGIC(4s) VERSION(H) T0(d)
+#                 registros T(d) KIND(B) LEN(H) PAYLOAD(LEN bytes)
+# Fichero .tlbb.idx: un offset (Q) por cada segundo desde T0 -> búsqueda de cualquier instante en O(1)
+
+_MAGIC = b"TLBB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHd")
+_REC = struct.Struct("<dBH")
+_IDX = struct.Struct("<Q")
+_POSE = struct.Struct("<dddd")
+_RC = struct.Struct("<hhhh")
+_GF = struct.Struct("<ddd")
+
+# Tipos de registro
+CMD, ACK, RC, STATE, POSE, GEOFENCE = 1, 2, 3, 4, 5, 6
+KIND_NAMES = {CMD: "cmd", ACK: "ack", RC: "rc", STATE: "state", POSE: "pose", GEOFENCE: "geofence"}
+
+_QUEUE_MAX = 10000
+_FLUSH_S = 0.5
+
+
+def _encode_state(st: dict) -> bytes:
+    parts = []
+    for k, v in st.items():
+        if isinstance(v, tuple):
+            v = ",".join(str(i) for i in v)
+        parts.append(f"{k}:{v}")
+    return (";".join(parts) + ";").encode("ascii", errors="ignore")
+
+
+def _decode(kind: int, payload: bytes):
+    if kind == POSE:
+        return _POSE.unpack(payload)
+    if kind == RC:
+        return _RC.unpack(payload)
+    if kind == STATE:
+        from TelloLink.modules.tello_telemetry import parse_state
+        return parse_state(payload.decode("ascii", errors="ignore"))
+    if kind == GEOFENCE:
+        x, y, z = _GF.unpack_from(payload)
+        return x, y, z, payload[_GF.size:].decode("utf-8", errors="ignore")
+    return payload.decode("utf-8", errors="ignore")
+
+
+class FlightRecorder:
+    """
+    Escritor de la caja negra. record() solo encola (no bloquea nunca: si la cola está llena el
+    registro se descarta y se cuenta en `dropped`); un hilo escribe en disco y mantiene el índice.
+    """
+
+    def __init__(self, path: str, queue_size: int = _QUEUE_MAX):
+        self.path = path
+        self.t0 = time.time()
+        self.dropped = 0
+        self._q = queue.Queue(maxsize=queue_size)
+        self._f = open(path, "wb")
+        self._fidx = open(path + ".idx", "wb")
+        self._f.write(_HEADER.pack(_MAGIC, _VERSION, self.t0))
+        self._next_sec = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    # --- Ruta caliente (cualquier hilo) ---
+
+    def record(self, kind: int, payload: bytes, t: float | None = None) -> None:
+        try:
+            self._q.put_nowait((time.time() if t is None else t, kind, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def cmd(self, text: str):
+        self.record(CMD, text.encode("utf-8"))
+
+    def ack(self, text: str):
+        self.record(ACK, str(text).encode("utf-8"))
+
+    def rc(self, a, b, c, d):
+        self.record(RC, _RC.pack(int(a), int(b), int(c), int(d)))
+
+    def state(self, st: dict, t: float | None = None):
+        self.record(STATE, _encode_state(st), t)
+
+    def pose(self, x, y, z, yaw):
+        self.record(POSE, _POSE.pack(float(x), float(y), float(z), float(yaw)))
+
+    def geofence(self, x, y, z, reason: str):
+        self.record(GEOFENCE, _GF.pack(float(x), float(y), float(z)) + reason.encode("utf-8"))
+
+    # --- Hilo escritor ---
+
+    def _write(self, t, kind, payload):
+        if len(payload) > 0xFFFF:
+            payload = payload[:0xFFFF]
+        # Índice: primer registro de cada segundo (los segundos sin registros apuntan al siguiente)
+        sec = int(t - self.t0)
+        if sec >= self._next_sec:
+            off = self._f.tell()
+            for _ in range(self._next_sec, sec + 1):
+                self._fidx.write(_IDX.pack(off))
+            self._next_sec = sec + 1
+        self._f.write(_REC.pack(t, kind, len(payload)))
+        self._f.write(payload)
+
+    def _writer_loop(self):
+        last_flush = time.time()
+        while self._running or not self._q.empty():
+            try:
+                item = self._q.get(timeout=_FLUSH_S)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                self._write(*item)
+            if time.time() - last_flush >= _FLUSH_S:
+                self._f.flush()
+                self._fidx.flush()
+                last_flush = time.time()
+        self._f.close()
+        self._fidx.close()
+
+    def close(self):
+        self._running = False
+        self._thread.join(timeout=5.0)
+
+
+class FlightLog:
+    """Lector de la caja negra por mmap, con búsqueda por tiempo en O(1) mediante el índice por segundos."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.t0 = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} no es un registro de vuelo de TelloLink")
+        if version != _VERSION:
+            raise ValueError(f"Versión de registro no soportada: {version}")
+        self._index = self._load_index()
+
+    def _load_index(self):
+        idx_path = self.path + ".idx"
+        if os.path.exists(idx_path):
+            with open(idx_path, "rb") as f:
+                raw = f.read()
+            n = len(raw) // _IDX.size
+            return list(struct.unpack(f"<{n}Q", raw[:n * _IDX.size]))
+        # Sin índice (vuelo interrumpido): lo reconstruimos recorriendo el fichero una vez
+        index = []
+        for off, t, _, _ in self._scan(_HEADER.size):
+            sec = int(t - self.t0)
+            while len(index) <= sec:
+                index.append(off)
+        return index
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _scan(self, off: int):
+        mm, size = self._mm, len(self._mm)
+        while off + _REC.size <= size:
+            t, kind, n = _REC.unpack_from(mm, off)
+            start = off + _REC.size
+            if start + n > size:
+                break  # registro a medio escribir
+            yield off, t, kind, mm[start:start + n]
+            off = start + n
+
+    @property
+    def duration_s(self) -> float:
+        return float(len(self._index))
+
+    def seek(self, t: float) -> int:
+        # Offset del primer registro con tiempo >= t (t absoluto, como time.time())
+        sec = int(t - self.t0)
+        if sec < 0 or not self._index:
+            return _HEADER.size
+        if sec >= len(self._index):
+            return len(self._mm)
+        for off, rt, _, _ in self._scan(self._index[sec]):
+            if rt >= t:
+                return off
+        return len(self._mm)
+
+    def records(self, t_from: float | None = None, t_to: float | None = None, kinds=None):
+        # Itera (t, kind, valor decodificado) entre t_from y t_to
+        off = _HEADER.size if t_from is None else self.seek(t_from)
+        for _, t, kind, payload in self._scan(off):
+            if t_to is not None and t > t_to:
+                break
+            if kinds is not None and kind not in kinds:
+                continue
+            yield t, kind, _decode(kind, payload)
+
+    def rc_samples(self, t_from: float | None = None, t_to: float | None = None):
+        """
+        Órdenes rc como arrays (adelante, derecha, arriba, yaw, dt) para PoseVirtual.update_from_rc_batch.
+        Cada orden dura hasta la siguiente (máx. 1 s, como en replay_flight); la última no tiene duración.
+        """
+        try:
+            import numpy as np
+        except Exception:
+            raise RuntimeError("Falta NumPy (pip install numpy)")
+        rows = [(t,) + tuple(v) for t, _, v in self.records(t_from, t_to, kinds=(RC,))]
+        if len(rows) < 2:
+            return tuple(np.zeros(0) for _ in range(5))
+        arr = np.asarray(rows, dtype=np.float64)
+        # rc a b c d = lateral, adelante, vertical, yaw
+        dt = np.minimum(np.diff(arr[:, 0]), 1.0)
+        return arr[:-1, 2], arr[:-1, 1], arr[:-1, 3], arr[:-1, 4], dt
+
+    def __iter__(self):
+        return self.records()
+
+
+# --- API de TelloDron ---
+
+def _bb(self):
+    return getattr(self, "_recorder", None)
+
+
+def _on_pose_change(self, pose):
+    rec = _bb(self)
+    if rec is not None:
+        rec.pose(*pose.snapshot()[:4])
+
+
+def _record_state(self, st: dict, ts: float):
+    rec = _bb(self)
+    if rec is not None:
+        rec.state(st, ts)
+
+
+def start_recording(self, path: str | None = None) -> str:
+    if _bb(self) is not None:
+        return self._recorder.path
+    if path is None:
+        out_dir = os.path.join(".", "flightlogs")
+        os.makedirs(out_dir, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(out_dir, f"tello_{ts}.tlbb")
+    self._recorder = FlightRecorder(path)
+    self._recorder_pose_cb = lambda pose: _on_pose_change(self, pose)
+    watch_pose(self, self._recorder_pose_cb)
+    print(f"[blackbox] Grabando en {path}")
+    return path
+
+
+def stop_recording(self) -> str | None:
+    rec = _bb(self)
+    if rec is None:
+        return None
+    unwatch_pose(self, self._recorder_pose_cb)
+    self._recorder = None
+    rec.close()
+    if rec.dropped:
+        print(f"[blackbox] Aviso: {rec.dropped} registros descartados (cola llena)")
+    print(f"[blackbox] Grabación cerrada: {rec.path}")
+    return rec.path
+
+
+_MOVES = ("forward", "back", "left", "right", "up", "down")
+
+
+def replay_flight(self, path: str, t_from: float | None = None, t_to: float | None = None, callback=None):
+    """
+    Reproduce offline un registro: reconstruye la pose con PoseVirtual a partir de los comandos
+    aceptados, las órdenes rc y los paquetes de estado, y evalúa el geofence configurado en este
+    dron en cada paso. No toca self.pose. Devuelve [(t, x, y, z, yaw, violado), ...].
+    """
+    from TelloLink.modules.tello_pose import PoseVirtual
+    from TelloLink.modules.tello_geofence import _inside_inclusion, _inside_any_exclusion
+
+    pose = PoseVirtual()
+    gf_on = bool(getattr(self, "_gf_enabled", False))
+    out = []
+    pending = None
+    last_rc = None
+    last_yaw = None
+
+    def step(t):
+        x, y, z, yaw = pose.x_cm, pose.y_cm, pose.z_cm, pose.yaw_deg
+        bad = gf_on and ((not _inside_inclusion(self, x, y, z)) or _inside_any_exclusion(self, x, y, z))
+        out.append((t, x, y, z, yaw, bad))
+        if callback is not None:
+            callback(t, pose, bad)
+
+    with FlightLog(path) as log:
+        for t, kind, val in log.records(t_from, t_to, kinds=(CMD, ACK, RC, STATE)):
+            if kind == CMD:
+                pending = val
+            elif kind == ACK and pending is not None:
+                parts = pending.split()
+                ok = str(val).strip().lower() == "ok"
+                if ok and parts[0] == "takeoff":
+                    pose.reset()
+                    pose.set_takeoff_reference(last_yaw)
+                elif ok and len(parts) == 2 and parts[0] in _MOVES:
+                    pose.update_move(parts[0], float(parts[1]))
+                elif ok and len(parts) == 5 and parts[0] == "go":
+                    # go x y z speed (y del SDK = izquierda)
+                    pose.update_go(float(parts[1]), float(parts[2]), float(parts[3]))
+                elif ok and len(parts) == 2 and parts[0] in ("cw", "ccw"):
+                    pose.update_yaw(float(parts[1]) if parts[0] == "cw" else -float(parts[1]))
+                pending = None
+                step(t)
+            elif kind == RC:
+                # El rc anterior se mantuvo desde last_rc hasta ahora
+                if last_rc is not None:
+                    # rc a b c d = lateral, adelante, vertical, yaw; update_from_rc espera (adelante, lateral, ...)
+                    a, b, c, d = last_rc[1]
+                    pose.update_from_rc(b, a, c, d, dt_sec=min(1.0, t - last_rc[0]))
+                    step(t)
+                last_rc = (t, val)
+            elif kind == STATE:
+                last_yaw = val.get("yaw", last_yaw)
+                pose.set_from_telemetry(height_cm=val.get("h"), yaw_deg=last_yaw)
+    return out
@@ -1,17 +1,42 @@
+import asyncio
 import threading
 import time
 from djitellopy import Tello
 
+from TelloLink.modules.tello_pads import enable_mission_pads
 
-def _connect(self, freq=5, callback=None, params=None):
-    try:
-        # Crea el objeto Tello y conecta
-        self._tello = Tello()
 
-        # ✅ NUEVO: Aumentar timeout para comandos lentos
-        self._tello.RESPONSE_TIMEOUT = 15
+def _open_backend(backend, host=None, port=None, state_port=None, video_port=None):
+    # djitellopy solo admite los puertos estándar: con puertos propios (p.ej. el simulador) usamos asyncio
+    if any(p not in (None, dflt) for p, dflt in ((port, Tello.CONTROL_UDP_PORT), (state_port, Tello.STATE_UDP_PORT),
+                                                  (video_port, Tello.VS_UDP_PORT))):
+        backend = "asyncio"
+
+    # Backend asyncio: transporte UDP nativo sobre el loop compartido; los métodos síncronos lo envuelven
+    if backend == "asyncio":
+        from TelloLink.modules.tello_async import TelloAsyncTransport, _get_shared_loop
+        transport = TelloAsyncTransport(host=host or Tello.TELLO_IP,
+                                        port=port or Tello.CONTROL_UDP_PORT,
+                                        state_port=state_port or Tello.STATE_UDP_PORT,
+                                        video_port=video_port or Tello.VS_UDP_PORT)
+        loop = _get_shared_loop()
+        asyncio.run_coroutine_threadsafe(transport.open(), loop).result()
+        return transport
+
+    # Crea el objeto Tello y conecta
+    tello = Tello(host=host or Tello.TELLO_IP)
+
+    # ✅ NUEVO: Aumentar timeout para comandos lentos
+    tello.RESPONSE_TIMEOUT = 15
+
+    tello.connect()
+    return tello
 
-        self._tello.connect()
+
+def _connect(self, freq=5, callback=None, params=None, backend="djitellopy",
+             host=None, port=None, state_port=None, video_port=None, mission_pads=None):
+    try:
+        self._tello = _open_backend(backend, host=host, port=port, state_port=state_port, video_port=video_port)
 
         # Limpieza preventiva del stream
         try:
@@ -30,6 +55,13 @@ def _connect(self, freq=5, callback=None, params=None):
         except Exception:
             pass
 
+        # Mission pads (Tello EDU): mon + mdirection; un fallo no impide volar sin ellas
+        if mission_pads is not None:
+            try:
+                enable_mission_pads(self, direction=int(mission_pads))
+            except Exception as e:
+                print(f"[pads] No se pudieron activar: {e}")
+
         return True
 
     except Exception as Err:
@@ -39,16 +71,20 @@ def _connect(self, freq=5, callback=None, params=None):
         return False
 
 
-def connect(self, freq=5, blocking=True, callback=None, params=None):
+def connect(self, freq=5, blocking=True, callback=None, params=None, backend="djitellopy",
+            host=None, port=None, state_port=None, video_port=None, mission_pads=None):
+    # backend: "djitellopy" (por defecto) o "asyncio" (transporte nativo de tello_async)
+    # host/port/state_port/video_port permiten apuntar a otro dron o al simulador (tello_simulator)
+    # mission_pads: None (sin pads) o la mdirection (0 abajo, 1 delante, 2 ambas) para corregir la pose con ellas
     if self.state != "disconnected":
         return False
 
+    kw = dict(freq=freq, callback=callback, params=params, backend=backend,
+              host=host, port=port, state_port=state_port, video_port=video_port, mission_pads=mission_pads)
     if blocking:
-        return _connect(self, freq=freq, callback=callback, params=params)
+        return _connect(self, **kw)
     else:
-        t = threading.Thread(
-            target=_connect, args=(self,), kwargs=dict(freq=freq, callback=callback, params=params), daemon=True
-        )
+        t = threading.Thread(target=_connect, args=(self,), kwargs=kw, daemon=True)
         t.start()
         return True
 
@@ -84,8 +120,17 @@ def _require_connected(self):
 
 def _send(self, cmd: str) -> str:
     _require_connected(self)
+    rec = getattr(self, "_recorder", None)
+    if rec is None:
+        return _send_backend(self, cmd)
+    rec.cmd(cmd)
+    resp = _send_backend(self, cmd)
+    rec.ack(resp)
+    return resp
+
 
-    # djitellopy expone distintos nombres según versión
+def _send_backend(self, cmd: str) -> str:
+    # djitellopy expone distintos nombres según versión (TelloAsyncTransport implementa send_read_command)
     if hasattr(self._tello, "send_read_command"):
         resp = self._tello.send_read_command(cmd)
         return str(resp)
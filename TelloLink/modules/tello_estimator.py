@@ -0,0 +1,339 @@
+import math
+import time
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from TelloLink.modules.tello_pose import PoseVirtual, sync_pose_watchers, SRC_COMMAND, SRC_ESTIMATOR, SRC_FIX
+
+# Filtro de Kalman de la pose. Estado (marco de la pose: x adelante, y derecha, z arriba):
+#   [x, y, z, vx, vy, vz, ax, ay, az]  (cm, cm/s; a* = copia de la posición al final del último comando)
+# La copia (stochastic cloning) permite fusionar "forward 50" como medida relativa: posición - copia = 50 cm.
+# El yaw va aparte (un escalar): la IMU del Tello ya lo da con precisión.
+_N = 9
+_ACCEL_NOISE = 2500.0       # densidad espectral de la aceleración (cm²/s³)
+_VEL_TAU_S = 1.0            # la velocidad tiende a 0 sin medidas (el Tello frena solo en hover)
+_VEL_SIGMA = 8.0            # vgx/vgy/vgz (vienen en dm/s: cuantización ±5 cm/s)
+_H_SIGMA = 5.0              # altura 'h'
+_TOF_SIGMA = 3.0            # ToF (con puerta: un objeto bajo el dron no baja la pose)
+_BARO_SIGMA = 25.0          # barómetro (con su sesgo estimado despacio)
+_BARO_BIAS_ALPHA = 0.01
+_TOF_MAX_CM = 800           # fuera de rango el Tello manda 6553
+_GATE = 9.0                 # innovación² / varianza (3 sigma)
+_MOVE_SIGMA0 = 2.0          # error de un comando de movimiento: 2 cm + 10 % de la distancia
+_MOVE_SIGMA_K = 0.1
+_RC_SIGMA0 = 20.0           # velocidad ordenada por rc: muy aproximada (RC 100 ≈ 100 cm/s)
+_RC_SIGMA_K = 0.3
+_RC_MAX_CM_S = 100.0
+_VEL_STALE_S = 0.5          # sin velocidades medidas en este tiempo, rc/move se integran a ciegas
+_YAW_NOISE = 4.0            # deriva del yaw (grados²/s)
+_YAW_SIGMA = 1.0
+_YAW_MOVE_K = 0.05
+
+
+def _unit(*idx_sign):
+    h = np.zeros(_N)
+    for i, s in idx_sign:
+        h[i] = s
+    return h
+
+
+class PoseEstimator(PoseVirtual):
+    """
+    PoseVirtual que fusiona los comandos (predicción) con vgx/vgy/vgz, ToF, barómetro, altura y yaw del
+    paquete de estado en un filtro de Kalman. Misma interfaz x_cm/y_cm/z_cm/yaw_deg (se puede asignar a
+    mano, el filtro lo adopta) más covariance y position_sigma_cm. Requiere NumPy.
+    """
+    __slots__ = ("_x", "_P", "_yaw_var", "_t", "_t_vel", "_vel_seen", "_tof_off", "_baro_off", "_pub")
+
+    def __init__(self, *args, **kwargs):
+        if np is None:
+            raise RuntimeError("Falta NumPy (pip install numpy)")
+        super().__init__(*args, **kwargs)
+        self._init_filter(self.x_cm, self.y_cm, self.z_cm)
+
+    def __repr__(self) -> str:
+        return (f"PoseEstimator(x={self.x_cm:.1f}, y={self.y_cm:.1f}, z={self.z_cm:.1f}, "
+                f"yaw={self.yaw_deg:.1f}, sigma={self.position_sigma_cm:.1f})")
+
+    # --- Interfaz de incertidumbre ---
+
+    @property
+    def covariance(self):
+        # Covarianza 6x6 de [x, y, z, vx, vy, vz] (cm², cm²/s²)
+        with self._wlock:
+            return self._P[:6, :6].copy()
+
+    @property
+    def position_sigma_cm(self) -> float:
+        # 1 sigma de la posición horizontal en la peor dirección (mayor autovalor del bloque xy)
+        with self._wlock:
+            a, b, c = self._P[0, 0], self._P[0, 1], self._P[1, 1]
+        return math.sqrt(max(0.0, (a + c) / 2.0 + math.sqrt(((a - c) / 2.0) ** 2 + b * b)))
+
+    @property
+    def yaw_sigma_deg(self) -> float:
+        return math.sqrt(self._yaw_var)
+
+    @property
+    def velocity_cm_s(self) -> tuple:
+        with self._wlock:
+            return tuple(float(v) for v in self._x[3:6])
+
+    # --- Núcleo del filtro ---
+
+    def _init_filter(self, x, y, z):
+        self._x = np.zeros(_N)
+        self._x[0:3] = (x, y, z)
+        self._P = np.diag([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0])
+        self._anchor()
+        self._yaw_var = 1.0
+        self._t = None
+        self._t_vel = 0.0
+        self._tof_off = self._baro_off = None
+        self._pub = (float(x), float(y), float(z), self.yaw_deg)
+
+    def _anchor(self):
+        # La copia pasa a ser la posición actual (con sus correlaciones)
+        self._x[6:9] = self._x[0:3]
+        self._P[6:9, :] = self._P[0:3, :]
+        self._P[:, 6:9] = self._P[:, 0:3]
+        self._vel_seen = False
+
+    def _pull(self):
+        # Si alguien asignó x_cm/y_cm/z_cm/yaw_deg a mano, el filtro adopta esos valores
+        cur = self.snapshot()[:4]
+        if cur == self._pub:
+            return
+        for i in range(3):
+            d = cur[i] - self._x[i]
+            self._x[i] += d
+            self._x[6 + i] += d
+        self._pub = cur
+
+    def _publish(self, source: str, yaw=None, yaw0=None) -> bool:
+        # Posición del filtro + yaw (el corregido si se da, si no el actual) en una sola escritura de la pose:
+        # una fila del rastro por paquete. Con _wlock tomado.
+        old = tuple(round(v, 1) for v in self._pub)
+        x, y, z = (float(v) for v in self._x[0:3])
+        yaw = self.yaw_deg if yaw is None else yaw
+        self._store(x, y, z, yaw, self.yaw0_deg if yaw0 is None else yaw0, source)
+        self._pub = (x, y, z, yaw)
+        return tuple(round(v, 1) for v in self._pub) != old
+
+    def _propagate(self, t):
+        if self._t is None:
+            self._t = t
+            return
+        dt = t - self._t
+        if dt <= 0:
+            return
+        self._t = t
+        a = math.exp(-dt / _VEL_TAU_S)
+        b = _VEL_TAU_S * (1.0 - a)
+        F = np.eye(_N)
+        for i in range(3):
+            F[i, 3 + i] = b
+            F[3 + i, 3 + i] = a
+        self._x = F @ self._x
+        q = _ACCEL_NOISE
+        Q = np.zeros((_N, _N))
+        for i in range(3):
+            Q[i, i] = q * dt ** 3 / 3.0
+            Q[i, 3 + i] = Q[3 + i, i] = q * dt ** 2 / 2.0
+            Q[3 + i, 3 + i] = q * dt
+        self._P = F @ self._P @ F.T + Q
+        self._yaw_var += _YAW_NOISE * dt
+
+    def _update(self, h, z, r, gate=None) -> bool:
+        # Medida escalar z = h·x con varianza r
+        Ph = self._P @ h
+        s = float(h @ Ph) + r
+        y = float(z) - float(h @ self._x)
+        if gate is not None and y * y > gate * s:
+            return False
+        K = Ph / s
+        self._x += K * y
+        self._P -= np.outer(K, Ph)
+        return True
+
+    def _update_yaw(self, yaw_rel, r) -> float:
+        # Devuelve el yaw corregido; se escribe en la pose junto con la posición en _publish
+        y = (yaw_rel - self.yaw_deg + 180.0) % 360.0 - 180.0
+        k = self._yaw_var / (self._yaw_var + r)
+        self._yaw_var *= (1.0 - k)
+        return (self.yaw_deg + k * y) % 360.0
+
+    def _done(self, changed=True):
+        # Aviso a los observadores ya fuera del lock del filtro
+        if changed:
+            self._notify()
+
+    # --- Telemetría (se llama con cada paquete de estado) ---
+
+    def update_from_state(self, st: dict, ts: float | None = None) -> None:
+        with self._wlock:
+            self._pull()
+            self._propagate(time.time() if ts is None else float(ts))
+
+            yaw = st.get("yaw")
+            if yaw is not None:
+                yaw = self._update_yaw(self._relative_yaw(float(yaw)), _YAW_SIGMA ** 2)
+
+            vg = (st.get("vgx"), st.get("vgy"), st.get("vgz"))
+            if None not in vg:
+                # vgx/vgy en el marco del despegue del Tello (yaw absoluto 0) -> marco de la pose (yaw0)
+                th = math.radians(self.yaw0_deg)
+                c, s = math.cos(th), math.sin(th)
+                a, b = float(vg[0]) * 10.0, float(vg[1]) * 10.0
+                for i, v in ((3, c * a + s * b), (4, -s * a + c * b), (5, -float(vg[2]) * 10.0)):
+                    self._update(_H[i], v, _VEL_SIGMA ** 2)
+                self._t_vel = self._t
+                self._vel_seen = True
+
+            h, tof, baro = st.get("h"), st.get("tof"), st.get("baro")
+            if h is not None:
+                h = float(h)
+                if self._tof_off is None and tof is not None:
+                    self._tof_off = float(tof) - h
+                if self._baro_off is None and baro is not None:
+                    self._baro_off = float(baro) * 100.0 - h
+                self._update(_H[2], h, _H_SIGMA ** 2)
+            if tof is not None and self._tof_off is not None and self._tof_off < float(tof) < _TOF_MAX_CM:
+                self._update(_H[2], float(tof) - self._tof_off, _TOF_SIGMA ** 2, gate=_GATE)
+            if baro is not None and self._baro_off is not None:
+                zb = float(baro) * 100.0
+                self._update(_H[2], zb - self._baro_off, _BARO_SIGMA ** 2, gate=_GATE)
+                self._baro_off += _BARO_BIAS_ALPHA * (zb - self._x[2] - self._baro_off)
+            changed = self._publish(SRC_ESTIMATOR, yaw)
+        self._done(changed)
+
+    def set_from_telemetry(self, height_cm: float | None = None,
+                           yaw_deg: float | None = None) -> None:
+        st = {}
+        if height_cm is not None:
+            st["h"] = height_cm
+        if yaw_deg is not None:
+            st["yaw"] = yaw_deg
+        self.update_from_state(st)
+
+    # --- Comandos (predicción) ---
+
+    def _command(self, dx, dy, dz):
+        # Desplazamiento ordenado desde el final del comando anterior. Con velocidades medidas desde entonces
+        # se fusiona con lo integrado; sin ellas (sin telemetría) es la única información y se aplica entera.
+        with self._wlock:
+            self._pull()
+            self._propagate(time.time())
+            d = (dx, dy, dz)
+            sigma = _MOVE_SIGMA0 + _MOVE_SIGMA_K * math.sqrt(dx * dx + dy * dy + dz * dz)
+            if self._vel_seen:
+                for i in range(3):
+                    self._update(_H_REL[i], d[i], sigma ** 2)
+            else:
+                self._x[0:3] += d
+                self._P[0:3, 0:3] += np.eye(3) * sigma ** 2
+            self._anchor()
+            self._publish(SRC_COMMAND)
+        self._done()
+
+    def update_move(self, direction: str, dist_cm: float) -> None:
+        self._command(*self.move_delta(direction, dist_cm))
+
+    def update_go(self, fwd_cm: float, left_cm: float, up_cm: float) -> None:
+        self._command(*self.body_delta(fwd_cm, -float(left_cm), up_cm))
+
+    def update_yaw(self, delta_deg: float) -> None:
+        with self._wlock:
+            self.yaw_deg = (self.yaw_deg + float(delta_deg)) % 360.0
+            self._yaw_var += (_YAW_MOVE_K * float(delta_deg)) ** 2
+            self._pub = self._pub[:3] + (self.yaw_deg,)
+        self._done()
+
+    def update_from_rc(self, vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec=0.1):
+        now = time.time()
+        with self._wlock:
+            self._pull()
+            if now - self._t_vel > _VEL_STALE_S:
+                # Sin velocidades medidas: integración a ciegas como PoseVirtual, con su incertidumbre
+                x0 = self._x[0:3].copy()
+                self._rc_store(vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec)
+                self._pull()
+                d = float(np.linalg.norm(self._x[0:3] - x0))
+                self._P[0:3, 0:3] += np.eye(3) * (_RC_SIGMA_K * d) ** 2
+                self._t = now
+                changed = True
+            else:
+                # Con telemetría: la velocidad ordenada es una medida más (poco fiable) y la pose se lleva a "ahora"
+                self._propagate(now)
+                fx, ry, vz = (float(v) / 100.0 * _RC_MAX_CM_S for v in (vx_pct, vy_pct, vz_pct))
+                vx, vy, _ = self.body_delta(fx, ry)
+                for i, v in ((3, vx), (4, vy), (5, vz)):
+                    self._update(_H[i], v, (_RC_SIGMA0 + _RC_SIGMA_K * abs(v)) ** 2)
+                changed = self._publish(SRC_ESTIMATOR)
+        self._done(changed)
+
+    def apply_fix(self, x_cm: float, y_cm: float, yaw_deg: float | None = None, weight: float = 1.0,
+                  sigma_cm: float | None = None) -> None:
+        # Fijo absoluto de posición: medida del filtro con su sigma (sin sigma, como PoseVirtual con weight)
+        if sigma_cm is None:
+            super().apply_fix(x_cm, y_cm, yaw_deg, weight)
+            return
+        with self._wlock:
+            self._pull()
+            self._propagate(time.time())
+            r = float(sigma_cm) ** 2
+            self._update(_H[0], x_cm, r)
+            self._update(_H[1], y_cm, r)
+            yaw = yaw0 = None
+            if yaw_deg is not None:
+                yaw = self._update_yaw(float(yaw_deg) % 360.0, r / 25.0)
+                yaw0 = (self.yaw0_deg - ((yaw - self.yaw_deg + 180.0) % 360.0 - 180.0)) % 360.0
+            self._publish(SRC_FIX, yaw, yaw0)
+        self._done()
+
+    # --- Referencias ---
+
+    def reset(self) -> None:
+        with self._wlock:
+            self.yaw_deg = 0.0
+            self._init_filter(0.0, 0.0, 0.0)
+        super().reset()
+
+
+if np is not None:
+    _H = [_unit((i, 1.0)) for i in range(6)]
+    _H_REL = [_unit((i, 1.0), (6 + i, -1.0)) for i in range(3)]
+
+
+def enable_pose_estimator(self):
+    """Sustituye la pose del dron por un PoseEstimator que arranca en la pose actual."""
+    old = getattr(self, "pose", None)
+    if isinstance(old, PoseEstimator):
+        return old
+    est = PoseEstimator(*old.snapshot()) if old is not None else PoseEstimator()
+    if old is not None:
+        est._trail = old.trail
+        for cb in old._listeners:
+            est.add_listener(cb)
+    self.pose = est
+    sync_pose_watchers(self)
+    print("[pose] Estimador de Kalman activado")
+    return est
+
+
+def disable_pose_estimator(self):
+    """Vuelve a la PoseVirtual de navegación a estima, conservando la pose actual."""
+    old = getattr(self, "pose", None)
+    if not isinstance(old, PoseEstimator):
+        return old
+    pose = PoseVirtual(*old.snapshot())
+    pose._trail = old.trail
+    for cb in old._listeners:
+        pose.add_listener(cb)
+    self.pose = pose
+    sync_pose_watchers(self)
+    print("[pose] Estimador de Kalman desactivado")
+    return pose
@@ -1,8 +1,20 @@
 from __future__ import annotations
+import json
 import math
 import threading
 import time
-from typing import List, Tuple, Optional, Dict, Any
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import List, Tuple, Optional, Dict, Any, Mapping
+from TelloLink.modules.tello_zones import ExclusionIndex, zone_list_property, buffer_polygon
+from TelloLink.modules.tello_sdf import GeofenceSDF
+from TelloLink.modules.tello_pose import watch_pose, unwatch_pose, SRC_COMMAND
+
+# NumPy es opcional: sin él las consultas por lotes se resuelven punto a punto
+try:
+    import numpy as np
+except Exception:
+    np = None
 
 # Configuración general ---
 _DEFAULT_MAX_X_CM = 150.0
@@ -12,6 +24,14 @@ _DEFAULT_POLL_S = 0.10
 _HARD_LAND_DELAY = 0.2
 _MODE_SOFT_ABORT = "soft"
 _MODE_HARD_LAND = "hard"
+_SEG_STEP_CM = 5.0       # muestreo de los segmentos en geofence_check_segment
+_SEG_TOL_CM = 0.5        # precisión del primer punto de violación de un segmento
+_GUARD_MARGIN_CM = 10.0  # distancia que se deja hasta el borde al recortar un movimiento (modo hard)
+_SDF_RES_CM = 10.0       # resolución por defecto del campo de distancias
+_SDF_MAX_DIST_CM = 300.0  # distancia a partir de la cual el campo se satura
+_PLAN_CLEARANCE_CM = 30.0  # holgura por defecto de las rutas planificadas hasta cualquier borde
+_FILE_MAGIC = "TLGF"       # plantillas de geofence (.npz)
+_FILE_VERSION = 1
 
 
 #Funciones geométricas
@@ -58,6 +78,179 @@ def _point_in_circle(x, y, cx, cy, r_cm):
     return (dx * dx + dy * dy) <= (r_cm * r_cm + 1e-6)
 
 
+# --- Configuración inmutable ---
+
+@dataclass(frozen=True)
+class GeofenceConfig:
+    """
+    Instantánea inmutable de la geometría del geofence (inclusión, centro, exclusiones ya indexadas).
+    Nunca se modifica: cada cambio publica una nueva con version + 1, así quien lee se queda con una referencia
+    estable sin copiar nada y las cachés que guardan la versión saben cuándo quedan obsoletas.
+
+    Las zonas ya llevan aplicado su margen (polígonos ensanchados, círculos agrandados; la geometría original
+    queda en src_poly/src_r) y `bounds` es la inclusión encogida por el margen por defecto: `limits` es la
+    configurada, para mostrarla, y `bounds` la que se comprueba.
+    """
+    version: int
+    limits: Optional[Mapping[str, float]]
+    center: Tuple[float, float]
+    polys: Tuple[dict, ...]
+    circles: Tuple[dict, ...]
+    buffer: float
+    bounds: Optional[Mapping[str, float]]
+    sources: tuple = field(repr=False, compare=False)  # (lista, versión, rebuild_version) de polígonos y círculos
+    _index: list = field(default_factory=list, repr=False, compare=False)
+
+    @property
+    def index(self) -> ExclusionIndex:
+        # El índice (y su compilación a NumPy) se construye en la primera consulta, no en cada publicación.
+        # Una publicación que solo añade zonas se lo lleva (ver _gf_publish): aquí puede desaparecer entre
+        # la comprobación y la lectura, de ahí el try
+        try:
+            return self._index[0]
+        except IndexError:
+            pass
+        with _publish_lock:
+            if not self._index:
+                idx = ExclusionIndex(_point_in_poly, _point_in_circle)
+                idx.sync(self.polys, self.circles)
+                self._index.append(idx)
+            return self._index[0]
+
+
+_KEEP = object()
+_publish_lock = threading.Lock()
+
+
+def _freeze_zone(entry, buffer: float = 0.0):
+    # Copia propia de la zona, con su margen ya aplicado (se calcula una sola vez por zona):
+    # lo que la UI cambie después en su dict no afecta a la instantánea
+    if not isinstance(entry, dict):
+        return entry
+    out = dict(entry)
+    b = out.get("buffer")
+    b = max(0.0, float(buffer if b is None else b))
+    if "poly" in out:
+        src = tuple((float(x), float(y)) for x, y in (out["poly"] or ()))
+        out["src_poly"] = src
+        out["poly"] = tuple(buffer_polygon(src, b)) if b > 0 else src
+    elif out.get("r") is not None:
+        out["src_r"] = float(out["r"])
+        out["r"] = out["src_r"] + b
+    return out
+
+
+def _raw_zone(entry: dict) -> dict:
+    # Zona tal como se configuró (sin el margen aplicado), con su margen explícito
+    out = {k: v for k, v in entry.items() if k not in ("src_poly", "src_r")}
+    if "src_poly" in entry:
+        out["poly"] = [list(p) for p in entry["src_poly"]]
+    if "src_r" in entry:
+        out["r"] = entry["src_r"]
+    return out
+
+
+def _frozen_zones(lst, prev: tuple, prev_src, buffer: float, prev_buffer):
+    # Si desde la instantánea anterior la lista solo ha recibido appends (y el margen es el mismo),
+    # se reutilizan sus copias. Devuelve (zonas, True si son las anteriores más otras al final)
+    items = list(lst)
+    if prev_src is not None and prev_src[0] is lst and prev_src[2] == lst.rebuild_version \
+            and len(items) >= len(prev) and buffer == prev_buffer:
+        if len(items) == len(prev):
+            return prev, True
+        return prev + tuple(_freeze_zone(e, buffer) for e in items[len(prev):]), True
+    return tuple(_freeze_zone(e, buffer) for e in items), False
+
+
+def _shrink_limits(limits, b: float):
+    # Inclusión efectiva: el rectángulo pierde b por cada lado (z no se toca: la altura la mide el ToF)
+    if not limits or b <= 0:
+        return limits
+    out = dict(limits)
+    for key in ("max_x", "max_y"):
+        v = float(out.get(key, 0.0) or 0.0)
+        if v > 0:
+            out[key] = max(1e-6, v - 2.0 * b)
+    return MappingProxyType(out)
+
+
+def _gf_publish(self, limits=_KEEP, center=_KEEP, buffer=_KEEP) -> GeofenceConfig:
+    """Construye y publica (una sola asignación) la configuración con los límites/centro/listas actuales."""
+    with _publish_lock:
+        prev = self.__dict__.get("_gf_config")
+        if limits is _KEEP:
+            limits = prev.limits if prev is not None else None
+        elif limits:
+            limits = MappingProxyType(dict(limits))
+        else:
+            limits = None
+        if center is _KEEP:
+            center = prev.center if prev is not None else (0.0, 0.0)
+        else:
+            center = (float(center[0]), float(center[1]))
+        if buffer is _KEEP:
+            buffer = prev.buffer if prev is not None else 0.0
+        buffer = max(0.0, float(buffer))
+        pl, cl = self._gf_excl_polys, self._gf_excl_circles
+        prev_buffer = prev.buffer if prev is not None else None
+        polys, p_grew = _frozen_zones(pl, prev.polys if prev is not None else (),
+                                      prev.sources[:3] if prev is not None else None, buffer, prev_buffer)
+        circles, c_grew = _frozen_zones(cl, prev.circles if prev is not None else (),
+                                        prev.sources[3:] if prev is not None else None, buffer, prev_buffer)
+        if prev is not None and polys is prev.polys and circles is prev.circles:
+            # Mismas zonas (solo cambian límites o centro): se comparte el índice ya construido
+            index = prev._index
+        elif prev is not None and p_grew and c_grew and prev._index:
+            # Solo se han añadido zonas: el índice ya construido pasa a la configuración nueva y se le insertan
+            # (y compilan) solo las nuevas. La anterior se queda sin él y lo reconstruiría si se volviera a consultar
+            idx = prev._index.pop()
+            idx.append_zones(polys, circles)
+            index = [idx]
+        else:
+            index = []
+        cfg = GeofenceConfig(version=(prev.version + 1) if prev is not None else 1, limits=limits, center=center,
+                             polys=polys, circles=circles, buffer=buffer, bounds=_shrink_limits(limits, buffer),
+                             sources=(pl, pl.version, pl.rebuild_version, cl, cl.version, cl.rebuild_version),
+                             _index=index)
+        self._gf_config = cfg
+        return cfg
+
+
+def _gf_cfg(self) -> GeofenceConfig:
+    # Configuración vigente; si alguien ha tocado directamente las listas de zonas, se publica una nueva
+    cfg = self.__dict__.get("_gf_config")
+    pl, cl = self._gf_excl_polys, self._gf_excl_circles
+    if cfg is not None:
+        spl, spv, _, scl, scv, _ = cfg.sources
+        if spl is pl and spv == pl.version and scl is cl and scv == cl.version:
+            return cfg
+    return _gf_publish(self)
+
+
+def geofence_config(self) -> GeofenceConfig:
+    return _gf_cfg(self)
+
+
+def _limits_property():
+    def fget(self):
+        return _gf_cfg(self).limits
+
+    def fset(self, value):
+        _gf_publish(self, limits=value)
+
+    return property(fget, fset)
+
+
+def _center_property():
+    def fget(self):
+        return _gf_cfg(self).center
+
+    def fset(self, value):
+        _gf_publish(self, center=value)
+
+    return property(fget, fset)
+
+
 # --- API pública ---
 
 def set_geofence(self,
@@ -80,21 +273,13 @@ def set_geofence(self,
     #  Soporte para z_min
     lim["zmin"] = float(z_min_cm) if z_min_cm is not None else 0.0
 
-    self._gf_limits = lim if lim else None
     self._gf_mode = mode if mode in (_MODE_SOFT_ABORT, _MODE_HARD_LAND) else _MODE_SOFT_ABORT
-    self._gf_poll_s = max(0.05, float(poll_interval_s))
+    self._gf_poll_s = max(0.05, float(poll_interval_s))  # ya no hay sondeo: se conserva por compatibilidad
 
-    # Si no había centro definido, por defecto (0,0)
-    if not hasattr(self, "_gf_center"):
-        self._gf_center = (0.0, 0.0)
+    # Nueva configuración con estos límites (el centro, por defecto (0,0), y las exclusiones se mantienen)
+    _gf_publish(self, limits=lim)
     self._gf_enabled = True
 
-    # Asegura contenedores (SIEMPRE como listas de dicts)
-    if not hasattr(self, "_gf_excl_polys"):
-        self._gf_excl_polys = []
-    if not hasattr(self, "_gf_excl_circles"):
-        self._gf_excl_circles = []
-
     # Histéresis / rachas
     self._gf_violation_streak = 0
 
@@ -118,17 +303,14 @@ def recenter_geofence(self):
     """Reancla el centro del cubo al punto actual."""
     pose = getattr(self, "pose", None)
     if pose:
-        self._gf_center = (float(getattr(pose, "x_cm", 0.0) or 0.0),
-                           float(getattr(pose, "y_cm", 0.0) or 0.0))
-        print(f"[geofence] Recentrado en {self._gf_center}")
+        cfg = _gf_publish(self, center=(float(getattr(pose, "x_cm", 0.0) or 0.0),
+                                        float(getattr(pose, "y_cm", 0.0) or 0.0)))
+        print(f"[geofence] Recentrado en {cfg.center}")
     else:
         print("[geofence] No se pudo recentrar (pose desconocida).")
 
 
-def add_exclusion_circle(self, cx, cy, r_cm, z_min_cm=None, z_max_cm=None):
-
-    if not hasattr(self, "_gf_excl_circles"):
-        self._gf_excl_circles = []
+def add_exclusion_circle(self, cx, cy, r_cm, z_min_cm=None, z_max_cm=None, buffer_cm=None):
 
     cx = float(cx)
     cy = float(cy)
@@ -139,10 +321,12 @@ def add_exclusion_circle(self, cx, cy, r_cm, z_min_cm=None, z_max_cm=None):
         "cy": cy,
         "r": r,
         "zmin": float(z_min_cm) if z_min_cm is not None else None,
-        "zmax": float(z_max_cm) if z_max_cm is not None else None
+        "zmax": float(z_max_cm) if z_max_cm is not None else None,
+        "buffer": float(buffer_cm) if buffer_cm is not None else None  # None = margen por defecto
     }
 
     self._gf_excl_circles.append(item)
+    _gf_publish(self)
     _ensure_gf_monitor(self)
 
     z_range = f"z∈[{item['zmin']},{item['zmax']}]" if item['zmin'] is not None and item[
@@ -152,20 +336,19 @@ def add_exclusion_circle(self, cx, cy, r_cm, z_min_cm=None, z_max_cm=None):
     return item
 
 
-def add_exclusion_poly(self, points, z_min_cm=None, z_max_cm=None):
-
-    if not hasattr(self, "_gf_excl_polys"):
-        self._gf_excl_polys = []
+def add_exclusion_poly(self, points, z_min_cm=None, z_max_cm=None, buffer_cm=None):
 
     poly = [(float(x), float(y)) for (x, y) in points]
 
     item = {
         "poly": poly,
         "zmin": float(z_min_cm) if z_min_cm is not None else None,
-        "zmax": float(z_max_cm) if z_max_cm is not None else None
+        "zmax": float(z_max_cm) if z_max_cm is not None else None,
+        "buffer": float(buffer_cm) if buffer_cm is not None else None  # None = margen por defecto
     }
 
     self._gf_excl_polys.append(item)
+    _gf_publish(self)
     _ensure_gf_monitor(self)
 
     z_range = f"z∈[{item['zmin']},{item['zmax']}]" if item['zmin'] is not None and item[
@@ -178,96 +361,208 @@ def add_exclusion_poly(self, points, z_min_cm=None, z_max_cm=None):
 def clear_exclusions(self):
     self._gf_excl_polys = []
     self._gf_excl_circles = []
+    _gf_publish(self)
     print("[geofence] Exclusiones eliminadas.")
 
 
+def _pose_sigma_cm(self) -> Optional[float]:
+    # Incertidumbre (1 sigma, cm) de la posición horizontal si la pose la estima; None si no
+    sigma = getattr(getattr(self, "pose", None), "position_sigma_cm", None)
+    if callable(sigma):
+        sigma = sigma()
+    try:
+        return float(sigma) if sigma is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def set_geofence_buffer(self, buffer_cm: float = 0.0, sigma_k: Optional[float] = None) -> float:
+    """
+    Margen de seguridad por defecto (cm) de todas las zonas que no tengan uno propio y de la inclusión.
+    Con sigma_k, el margen es sigma_k veces la incertidumbre actual de la pose (si la pose no la estima,
+    se usa buffer_cm). La geometría con margen se calcula aquí una vez; las comprobaciones no cambian de coste.
+    """
+    b = float(buffer_cm)
+    if sigma_k is not None:
+        sigma = _pose_sigma_cm(self)
+        if sigma is None:
+            print(f"[geofence] La pose no estima su incertidumbre; margen fijo de {b:.0f} cm.")
+        else:
+            b = max(b, float(sigma_k) * sigma)
+    cfg = _gf_publish(self, buffer=b)
+    print(f"[geofence] Margen de seguridad: {cfg.buffer:.1f} cm")
+    return cfg.buffer
+
+
 def _start_geofence_monitor(self, force=False):
-    """Arranca el hilo del monitor si no está ya en marcha."""
+    """
+    Engancha la evaluación del geofence a los cambios de la pose y a cada paquete de estado (_gf_end_packet);
+    no hay hilo de sondeo.
+    """
     if getattr(self, "_gf_monitoring", False) and not force:
         return
+    self._gf_violation_streak = 0
+    pose = getattr(self, "pose", None)
+    self._gf_last_xy = (float(pose.x_cm), float(pose.y_cm)) if pose is not None else None
+    if getattr(self, "_gf_listener", None) is None:
+        self._gf_listener = lambda pose: _gf_on_pose(self, pose)
     self._gf_monitoring = True
-    t = threading.Thread(target=_gf_monitor_loop, args=(self,), daemon=True)
-    self._gf_thread = t
-    t.start()
+    watch_pose(self, self._gf_listener)
     print("[geofence] Monitor iniciado.")
 
 
 def _stop_geofence_monitor(self):
-    """Detiene el hilo del monitor si está activo."""
+    """Desengancha la evaluación del geofence de la pose."""
     self._gf_monitoring = False
-    t = getattr(self, "_gf_thread", None)
-    if t and isinstance(t, threading.Thread):
-        try:
-            t.join(timeout=1.0)
-        except Exception:
-            pass
-    self._gf_thread = None
+    cb = getattr(self, "_gf_listener", None)
+    if cb is not None:
+        unwatch_pose(self, cb)
     print("[geofence] Monitor detenido.")
 
 
 def _ensure_gf_monitor(self):
-    """Garantiza que el monitor esté corriendo cuando _gf_enabled es True."""
+    """Garantiza que el monitor esté activo cuando _gf_enabled es True."""
     if getattr(self, "_gf_enabled", False) and not getattr(self, "_gf_monitoring", False):
         _start_geofence_monitor(self)
 
 
+def save_geofence(self, path: str) -> str:
+    """
+    Guarda el geofence (inclusión, centro, modo, exclusiones y su índice ya compilado) en un .npz versionado.
+    Devuelve la ruta escrita (NumPy añade .npz si falta).
+    """
+    if np is None:
+        raise RuntimeError("Falta NumPy (pip install numpy)")
+    cfg = _gf_cfg(self)
+    idx = cfg.index
+    polys, circles = idx.zones
+    meta = {"format": _FILE_MAGIC, "version": _FILE_VERSION,
+            "limits": dict(cfg.limits) if cfg.limits else None, "center": list(cfg.center), "buffer": cfg.buffer,
+            "mode": getattr(self, "_gf_mode", _MODE_SOFT_ABORT), "enabled": bool(getattr(self, "_gf_enabled", False)),
+            "polys": [_raw_zone(p) for p in polys], "circles": [_raw_zone(c) for c in circles]}
+    if not str(path).endswith(".npz"):
+        path = f"{path}.npz"
+    np.savez(path, meta=np.array(json.dumps(meta)), **idx.to_arrays())
+    print(f"[geofence] Plantilla guardada en {path} ({len(polys)} polígonos, {len(circles)} círculos)")
+    return path
+
+
+def load_geofence(self, path: str) -> GeofenceConfig:
+    """
+    Carga una plantilla de save_geofence: se publica de una vez con el índice y la compilación guardados,
+    sin reconstruir zona a zona. Si el geofence estaba activo al guardar, queda activo.
+    """
+    if np is None:
+        raise RuntimeError("Falta NumPy (pip install numpy)")
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format") != _FILE_MAGIC:
+            raise ValueError(f"{path} no es una plantilla de geofence de TelloLink")
+        if meta.get("version") != _FILE_VERSION:
+            raise ValueError(f"Versión de plantilla no soportada: {meta.get('version')}")
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+
+    buffer = float(meta.get("buffer", 0.0) or 0.0)
+    polys = tuple(_freeze_zone(p, buffer) for p in meta["polys"])
+    circles = tuple(_freeze_zone(c, buffer) for c in meta["circles"])
+    index = ExclusionIndex.from_arrays(arrays, polys, circles, _point_in_poly, _point_in_circle)
+    lim = MappingProxyType(dict(meta["limits"])) if meta.get("limits") else None
+    with _publish_lock:
+        # Listas editables para la UI (copias) y una instantánea que ya trae su índice
+        self._gf_excl_polys = [_raw_zone(p) for p in polys]
+        self._gf_excl_circles = [_raw_zone(c) for c in circles]
+        pl, cl = self._gf_excl_polys, self._gf_excl_circles
+        prev = self.__dict__.get("_gf_config")
+        cfg = GeofenceConfig(version=(prev.version + 1) if prev is not None else 1,
+                             limits=lim, center=(float(meta["center"][0]), float(meta["center"][1])),
+                             polys=polys, circles=circles, buffer=buffer, bounds=_shrink_limits(lim, buffer),
+                             sources=(pl, pl.version, pl.rebuild_version, cl, cl.version, cl.rebuild_version),
+                             _index=[index])
+        self._gf_config = cfg
+
+    mode = meta.get("mode")
+    self._gf_mode = mode if mode in (_MODE_SOFT_ABORT, _MODE_HARD_LAND) else _MODE_SOFT_ABORT
+    if meta.get("enabled"):
+        self._gf_enabled = True
+        _ensure_gf_monitor(self)
+    print(f"[geofence] Plantilla cargada de {path}: {len(polys)} polígonos, {len(circles)} círculos, modo={self._gf_mode}")
+    return cfg
+
+
 # --- Funciones internas ---
 
-def _gf_monitor_loop(self):
-    """Bucle de supervisión del geofence (inclusión + exclusiones)."""
-    self._gf_violation_streak = 0
-    while getattr(self, "_gf_monitoring", False) and getattr(self, "_gf_enabled", False):
-        try:
-            st = getattr(self, "state", "")
-            if st not in ("flying", "landing", "hovering", "takingoff"):
-                time.sleep(self._gf_poll_s)
-                continue
-
-            pose = getattr(self, "pose", None)
-            if pose is None:
-                time.sleep(self._gf_poll_s)
-                continue
-
-            x = float(getattr(pose, "x_cm", 0.0) or 0.0)
-            y = float(getattr(pose, "y_cm", 0.0) or 0.0)
-            z = float(getattr(pose, "z_cm", getattr(self, "height_cm", 0.0)) or 0.0)
-
-            #  Validación completa
-            violated = (not _inside_inclusion(self, x, y, z)) or _inside_any_exclusion(self, x, y, z)
-
-            if violated:
-                self._gf_violation_streak += 1
-            else:
-                self._gf_violation_streak = 0
-
-            # Dispara acción si hay 2 lecturas consecutivas de violación
-            if self._gf_violation_streak >= 2:
-                _handle_violation(self)
-                # Si es HARD, dejamos que _handle_violation pare el monitor o aterrizaje
-                if getattr(self, "_gf_mode", _MODE_SOFT_ABORT) == _MODE_HARD_LAND:
-                    # En HARD, no seguimos tras ordenar el aterrizaje
-                    break
-
-        except Exception as e:
-            print(f"[geofence] Error monitor: {e}")
-
-        time.sleep(self._gf_poll_s)
-
-    # Sale del bucle
-    self._gf_monitoring = False
+def _gf_on_pose(self, pose):
+    """
+    Evaluación del geofence (inclusión + exclusiones) en el mismo hilo que acaba de cambiar la pose.
+
+    Se mantiene la histéresis de 2 lecturas consecutivas en violación para todo lo que es una medida: la
+    telemetría, el estimador (reescribe x/y con cada paquete) y los fijos de mission pads. Solo un cambio de
+    x/y publicado por un comando (estima determinista, pose.source == SRC_COMMAND) da la violación por
+    confirmada sin esperar a otra lectura: un valor atípico aislado no basta para aterrizar.
+    """
+    if not (getattr(self, "_gf_monitoring", False) and getattr(self, "_gf_enabled", False)):
+        return
+    if getattr(self, "_gf_packet_thread", None) == threading.get_ident():
+        return  # cambio hecho por el paquete de estado en curso: se evalúa una vez al final (_gf_end_packet)
+    try:
+        st = getattr(self, "state", "")
+        if st not in ("flying", "landing", "hovering", "takingoff"):
+            return
+
+        x, y, z = pose.snapshot()[:3]
+        commanded = getattr(pose, "source", SRC_COMMAND) == SRC_COMMAND \
+            and self._gf_last_xy is not None and self._gf_last_xy != (x, y)
+        self._gf_last_xy = (x, y)
+
+        #  Validación completa (una sola instantánea de la configuración para ambas comprobaciones)
+        cfg = _gf_cfg(self)
+        violated = (not _inside_inclusion(self, x, y, z, cfg)) or _inside_any_exclusion(self, x, y, z, cfg)
+
+        if violated:
+            self._gf_violation_streak = max(self._gf_violation_streak + 1, 2 if commanded else 0)
+        else:
+            self._gf_violation_streak = 0
+
+        # Dispara acción si hay 2 lecturas consecutivas de violación
+        if self._gf_violation_streak >= 2:
+            _handle_violation(self)
+            # En HARD, no seguimos evaluando tras ordenar el aterrizaje
+            if getattr(self, "_gf_mode", _MODE_SOFT_ABORT) == _MODE_HARD_LAND:
+                self._gf_monitoring = False
+
+    except Exception as e:
+        print(f"[geofence] Error monitor: {e}")
+
+
+def _gf_begin_packet(self):
+    # Los cambios de la pose que haga este hilo hasta _gf_end_packet no se evalúan uno a uno
+    self._gf_packet_thread = threading.get_ident()
 
 
-def _inside_inclusion(self, x, y, z):
+def _gf_end_packet(self):
+    """
+    Una lectura del geofence por paquete de estado, haya cambiado la pose o no: en hover estable la pose no
+    notifica, y una violación sostenida tiene que acumular igualmente sus 2 lecturas consecutivas. Un paquete
+    que toca la pose varias veces (telemetría, estimador, fijo de pad) cuenta como una sola lectura.
+    """
+    self._gf_packet_thread = None
+    pose = getattr(self, "pose", None)
+    if pose is not None:
+        _gf_on_pose(self, pose)
+
+
+def _inside_inclusion(self, x, y, z, cfg=None):
     """
     Devuelve True si (x,y,z) está dentro de la inclusión; si no hay inclusión, devuelve True.
 
      CORREGIDO: max_x y max_y son anchos TOTALES, se dividen por 2 para obtener semiejes.
     """
-    lim = getattr(self, "_gf_limits", None)
+    cfg = cfg or _gf_cfg(self)
+    lim = cfg.bounds
     if not lim:
         return True  # SOLO exclusiones
 
-    cx, cy = getattr(self, "_gf_center", (0.0, 0.0))
+    cx, cy = cfg.center
     max_x = float(lim.get("max_x", 0.0) or 0.0)
     max_y = float(lim.get("max_y", 0.0) or 0.0)
     max_z = float(lim.get("max_z", 0.0) or 0.0)
@@ -286,53 +581,185 @@ def _inside_inclusion(self, x, y, z):
     return in_x and in_y and in_z
 
 
-def _inside_any_exclusion(self, x, y, z):
+# Listas de zonas de TelloDron: cualquier lista asignada se envuelve en ZoneList para que el índice vea los cambios
+_gf_excl_polys = zone_list_property("_gf_excl_polys")
+_gf_excl_circles = zone_list_property("_gf_excl_circles")
+
+
+# Límites y centro de la inclusión: leerlos da los de la configuración vigente, asignarlos publica una nueva
+_gf_limits = _limits_property()
+_gf_center = _center_property()
+
+
+def _gf_exclusion_index(self) -> ExclusionIndex:
+    return _gf_cfg(self).index
+
+
+def _inside_any_exclusion(self, x, y, z, cfg=None):
     """
     Verifica si (x,y,z) está dentro de alguna zona de exclusión.
 
-     CORREGIDO: maneja exclusivamente dicts y valida rangos Z correctamente.
+    Solo se prueban las zonas que el índice espacial devuelve para (x,y) y cuyo rango Z admite z,
+    sobre la geometría compilada a NumPy (mismos resultados que _point_in_poly/_point_in_circle).
+    """
+    hit = (cfg or _gf_cfg(self)).index.first_hit(x, y, z)
+    if hit is None:
+        return False
+    print(f"[geofence]  VIOLACIÓN {'POLY' if hit[0] == 'poly' else 'CIRCLE'} @ ({x:.1f},{y:.1f},{z:.1f})")
+    return True
+
+
+def _violates(self, x, y, z, cfg=None) -> bool:
+    # Como el monitor (fuera de la inclusión o dentro de una exclusión), sin mensajes
+    cfg = cfg or _gf_cfg(self)
+    return (not _inside_inclusion(self, x, y, z, cfg)) or cfg.index.first_hit(x, y, z) is not None
+
+
+def _inclusion_mask(cfg, x, y, z):
+    # Versión vectorizada de _inside_inclusion
+    lim = cfg.bounds
+    inside = np.ones(x.shape[0], dtype=bool)
+    if not lim:
+        return inside
+    cx, cy = cfg.center
+    max_x = float(lim.get("max_x", 0.0) or 0.0)
+    max_y = float(lim.get("max_y", 0.0) or 0.0)
+    max_z = float(lim.get("max_z", 0.0) or 0.0)
+    zmin = float(lim.get("zmin", 0.0) or 0.0)
+    if max_x > 0:
+        inside &= np.abs(x - cx) <= max_x / 2.0
+    if max_y > 0:
+        inside &= np.abs(y - cy) <= max_y / 2.0
+    if max_z > 0:
+        inside &= (zmin <= z) & (z <= max_z)
+    return inside
+
+
+def geofence_check_points(self, xyz):
+    """
+    Máscara de violación (True = fuera de la inclusión o dentro de una exclusión) para N puntos (x, y, z) en cm,
+    en una sola pasada vectorizada. Evalúa la geometría configurada aunque el monitor no esté activo.
+    """
+    cfg = _gf_cfg(self)
+    if np is None:
+        return [_violates(self, float(x), float(y), float(z), cfg) for x, y, z in xyz]
+    pts = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    x, y, z = (np.ascontiguousarray(pts[:, i]) for i in range(3))
+    bad = ~_inclusion_mask(cfg, x, y, z)
+    bad |= cfg.index.contains_many(x, y, z)
+    return bad
+
+
+def geofence_check_segment(self, p0, p1, step_cm: float = _SEG_STEP_CM):
+    """
+    Primer parámetro t en [0, 1] del segmento p0 -> p1 en el que se viola el geofence (None si es seguro).
+    Se muestrea cada step_cm de una vez y se afina por bisección entre la última muestra segura y la primera mala.
+    """
+    p0 = [float(v) for v in p0]
+    p1 = [float(v) for v in p1]
+    d = [b - a for a, b in zip(p0, p1)]
+    length = math.sqrt(sum(v * v for v in d))
+    n = max(2, int(math.ceil(length / max(step_cm, 0.1))) + 1)
+    ts = [i / (n - 1) for i in range(n)]
+    cfg = _gf_cfg(self)
+    bad = geofence_check_points(self, [[a + t * v for a, v in zip(p0, d)] for t in ts])
+    first = next((i for i, b in enumerate(bad) if b), None)
+    if first is None:
+        return None
+    if first == 0:
+        return 0.0
+    lo, hi = ts[first - 1], ts[first]
+    while (hi - lo) * length > _SEG_TOL_CM:
+        mid = (lo + hi) / 2.0
+        if _violates(self, *(a + mid * v for a, v in zip(p0, d)), cfg=cfg):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def configure_geofence_sdf(self, resolution_cm: float = _SDF_RES_CM, max_dist_cm: float = _SDF_MAX_DIST_CM):
+    """Resolución y saturación del campo de distancias (se recalcula en la próxima consulta)."""
+    self._gf_sdf_res_cm = max(1.0, float(resolution_cm))
+    self._gf_sdf_max_cm = max(self._gf_sdf_res_cm, float(max_dist_cm))
+
+
+def _gf_sdf(self) -> GeofenceSDF:
+    # Campo de distancias de la configuración vigente; solo se rasteriza de nuevo si cambia su versión
+    if np is None:
+        raise RuntimeError("Falta NumPy (pip install numpy)")
+    cfg = _gf_cfg(self)
+    res = getattr(self, "_gf_sdf_res_cm", _SDF_RES_CM)
+    max_d = getattr(self, "_gf_sdf_max_cm", _SDF_MAX_DIST_CM)
+    key = (cfg.version, res, max_d)
+    cached = getattr(self, "_gf_sdf_cache", None)
+    if cached is None or cached[0] != key:
+        cached = self._gf_sdf_cache = (key, GeofenceSDF(cfg.index.compiled, cfg.bounds, cfg.center, res, max_d))
+    return cached[1]
+
+
+def geofence_distance(self, x: float, y: float, z: float) -> float:
     """
-    # Polígonos: deben ser dicts {poly, zmin, zmax}
-    for entry in list(getattr(self, "_gf_excl_polys", [])):
-        if not isinstance(entry, dict):
-            continue  # Ignora formatos antiguos/corruptos
-
-        poly = entry.get("poly", [])
-        zmin = entry.get("zmin")
-        zmax = entry.get("zmax")
-
-        if _point_in_poly(x, y, poly):
-            #  Validación de altura Z
-            z_ok = (zmin is None or z >= zmin) and (zmax is None or z <= zmax)
-            if z_ok:
-                print(f"[geofence]  VIOLACIÓN POLY @ ({x:.1f},{y:.1f},{z:.1f})")
-                return True
-
-    # Círculos: deben ser dicts {cx, cy, r, zmin, zmax}
-    for entry in list(getattr(self, "_gf_excl_circles", [])):
-        if not isinstance(entry, dict):
-            continue  # Ignora formatos antiguos/corruptos
-
-        cx_c = entry.get("cx")
-        cy_c = entry.get("cy")
-        r = entry.get("r")
-        zmin = entry.get("zmin")
-        zmax = entry.get("zmax")
-
-        if _point_in_circle(x, y, cx_c, cy_c, r):
-            #  Validación de altura Z
-            z_ok = (zmin is None or z >= zmin) and (zmax is None or z <= zmax)
-            if z_ok:
-                print(f"[geofence]  VIOLACIÓN CIRCLE @ ({x:.1f},{y:.1f},{z:.1f})")
-                return True
-
-    return False
+    Distancia con signo (cm) de (x, y, z) al borde más cercano del geofence: positiva en zona permitida,
+    negativa en violación, saturada a ±max_dist_cm. Consulta bilineal O(1) sobre el campo precalculado.
+    """
+    return _gf_sdf(self).lookup(float(x), float(y), float(z))[0]
+
+
+def geofence_gradient(self, x: float, y: float, z: float):
+    """(gx, gy, gz): dirección en la que crece la distancia al borde (alejarse de la valla)."""
+    return _gf_sdf(self).lookup(float(x), float(y), float(z))[1:]
+
+
+def geofence_plan(self, p0, p1, clearance_cm: float = _PLAN_CLEARANCE_CM):
+    """
+    Ruta que rodea las exclusiones (y no sale de la inclusión) de p0 a p1, con clearance_cm de holgura:
+    lista mínima de puntos de paso [(x, y, z), ...] que termina en p1, o None si no hay ruta.
+    Las rutas se guardan por salida/llegada y se descartan en cuanto cambia la geometría.
+    """
+    return _gf_sdf(self).plan(p0, p1, clearance_cm)
+
+
+def _gf_allowed_fraction(self, dx, dy, dz, what: str = "", warn: bool = True) -> float:
+    """
+    Comprobación predictiva antes de enviar un movimiento: fracción (0..1) del desplazamiento (dx,dy,dz)
+    desde la pose actual que se puede recorrer sin violar el geofence. En modo soft solo avisa (devuelve 1).
+    Si ya estamos en violación, se permite cualquier movimiento que termine fuera de ella.
+    """
+    if not getattr(self, "_gf_enabled", False):
+        return 1.0
+    pose = getattr(self, "pose", None)
+    if pose is None:
+        return 1.0
+    p0 = pose.snapshot()[:3]
+    p1 = (p0[0] + dx, p0[1] + dy, p0[2] + dz)
+    length = math.sqrt(dx * dx + dy * dy + dz * dz)
+    if length <= 0:
+        return 1.0
+    if _violates(self, *p0):
+        if not _violates(self, *p1):
+            return 1.0
+        t = 0.0
+    else:
+        t = geofence_check_segment(self, p0, p1)
+        if t is None:
+            return 1.0
+    if getattr(self, "_gf_mode", _MODE_SOFT_ABORT) != _MODE_HARD_LAND:
+        if warn:
+            print(f"[geofence][SOFT] {what}: la trayectoria sale del geofence a {t * length:.0f} cm; se envía igualmente.")
+        return 1.0
+    return max(0.0, t - _GUARD_MARGIN_CM / length)
 
 
 def _handle_violation(self):
     """Maneja una violación del geofence."""
     mode = getattr(self, "_gf_mode", _MODE_SOFT_ABORT)
 
+    rec = getattr(self, "_recorder", None)
+    if rec is not None:
+        pose = getattr(self, "pose", None)
+        rec.geofence(getattr(pose, "x_cm", 0.0), getattr(pose, "y_cm", 0.0), getattr(pose, "z_cm", 0.0), mode)
+
     # Evita reentradas
     if getattr(self, "_gf_last_report", None) != mode:
         print(f"[geofence]  Violación detectada (modo={mode}).")
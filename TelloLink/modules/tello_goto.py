@@ -3,7 +3,8 @@ import math
 import threading
 import time
 from typing import Optional, Callable, Any
-from TelloLink.modules.tello_move import MIN_STEP
+from TelloLink.modules.tello_move import MIN_STEP, MAX_STEP, RC_FULL_CM_S
+from TelloLink.modules.tello_geofence import _gf_allowed_fraction, geofence_plan
 
 #Parámetros ajustables
 _MIN_BAT_PCT   = 20        #Batería mínima para realizar la operación
@@ -13,6 +14,14 @@ _TOL_XY_CM     = 8         #Tolerancia horizontal
 _TOL_Z_CM      = 8         #Tolerancia vertical
 _SLEEP_S       = 0.10      #Pausa entre comandos
 _MAX_RETRY_CMD = 2         #Reintentos de cada paso si falla
+_MIN_CORR_CM   = MIN_STEP / 2.0  #Por debajo de esto un paso mínimo (20 cm) dejaría más error del que corrige
+_GO_SPEED_CM_S = 60        #Velocidad de los "go" si no se indica otra
+_GO_MAX_S      = 10.0      #Duración máxima de cada tramo "go" (el ack llega al terminar y hay timeout de 15 s)
+_RC_HZ         = 25.0      #Frecuencia del lazo de control por rc
+_RC_KP         = 1.2       #Ganancia proporcional: cm/s por cm de error
+_RC_VMAX_CM_S  = 60.0      #Velocidad máxima si no se indica otra
+_RC_ACCEL_CM_S2 = 80.0     #Aceleración máxima (suaviza arranques y frenadas)
+_RC_VEL_STALE_S = 0.5      #Velocidad medida (vgx/vgy) más antigua que esto: no se usa
 
 #Función que decide el tamaño de cada paso a realizar según lo que le queda por recorrer.
 def _adaptive_step(rest: float, base: float, min_step: float = MIN_STEP) -> float:
@@ -22,7 +31,11 @@ def _adaptive_step(rest: float, base: float, min_step: float = MIN_STEP) -> floa
     #Escala el paso según la distancia que queda: lejos = paso base, cerca = paso reducido. Si rest / (3.0 * base) es mayor que 1, aún le falta mucho y coge 1 que es el paso base
     scale = max(0.35, min(1.0, rest / (3.0 * base)))
     # Paso final, siempre >= min_step. Si el paso que hemos escalado es menor que el mínimo de Tello, daría error, por eso eligiriamos el mínimo de tello
-    return max(min_step, base * scale)
+    step = max(min_step, base * scale)
+    # Si dejaría un resto menor que un paso mínimo del SDK (que ya no se puede corregir), se recorre todo de una vez
+    if rest - step < MIN_STEP:
+        return rest
+    return step
 
 #Función que hace girar al dron hasta el ángulo deseado
 def _rotate_to_yaw(self, target_yaw_deg: float) -> bool:
@@ -40,49 +53,207 @@ def _rotate_to_yaw(self, target_yaw_deg: float) -> bool:
 
 
 
-#Esta función envía un mmovimiento al dron, espera la confirmación y actualiza la pose virtual si tuvo éxito
+#Esta función envía un mmovimiento al dron y espera la confirmación (la pose la actualiza el propio movimiento)
 def _send_and_update(self, cmd: str, dist_cm: float) -> bool:
     dist_i = int(round(dist_cm))
     if dist_i <= 0: #Si la distancia del paso a realizar es 0, devuelve True
         return True
     for _ in range(_MAX_RETRY_CMD + 1): #Hacemos un bucle con el numero de "vueltas" (intentos) que son el inicial + el número de reintentos
         resp = getattr(self, cmd)(dist_i) #Ejecuta el movimiento
+        if resp is False: #Rechazado por el geofence: reintentar no cambia nada
+            return False
         ok = bool(str(resp).lower() == "ok" or resp is True) #Comprueba si el dron confirmó el movimiento
-        if ok: #Si se ejecutó correctamente
-            try:
-                if hasattr(self, "pose") and self.pose: #Comprueba que haya el atributo pose exista
-                    self.pose.update_move(cmd, dist_i) #Si existe, actualiza las coordenadas
-            except Exception:
-                pass
+        if ok: #Si se ejecutó correctamente (forward/up/... ya actualizan la PoseVirtual tras el OK)
             return True
         time.sleep(0.05)
     return False
 
 
+#Modo "go": recorre el desplazamiento con comandos "go x y z speed" (un comando por tramo de hasta 500 cm)
+#Devuelve False si hay que abortar; lo que quede por debajo de 20 cm lo termina el modo por pasos
+def _go_chunks(self, x_goal: float, y_goal: float, z_goal: float, speed_cm_s: Optional[float]) -> bool:
+    v = int(speed_cm_s or _GO_SPEED_CM_S)
+    max_chunk = min(float(MAX_STEP), v * _GO_MAX_S)
+    last_rest = None
+    while True:
+        if getattr(self, "_goto_abort", False):
+            print("[goto] Abortado por solicitud externa.")
+            return False
+        bat = self.telemetry().battery_pct
+        if isinstance(bat, int) and bat < _MIN_BAT_PCT:
+            print(f"[goto] Abortado por batería ({bat}%).")
+            return False
+
+        rx = x_goal - self.pose.x_cm
+        ry = y_goal - self.pose.y_cm
+        rz = z_goal - self.pose.z_cm
+        yaw = math.radians(getattr(self.pose, "yaw_deg", 0.0) or 0.0)
+        f_comp = rx * math.cos(yaw) + ry * math.sin(yaw)
+        r_comp = -rx * math.sin(yaw) + ry * math.cos(yaw)
+
+        if max(abs(f_comp), abs(r_comp), abs(rz)) <= MIN_STEP: #El SDK no acepta un go tan corto
+            return True
+        rest = math.sqrt(f_comp * f_comp + r_comp * r_comp + rz * rz)
+        if last_rest is not None and rest >= last_rest - 1.0: #Sin avance (p.ej. techo): seguimos por pasos
+            return True
+        last_rest = rest
+
+        k = min(1.0, max_chunk / rest) #Tramo de como mucho max_chunk cm en línea recta
+        try:
+            if not self.go(f_comp * k, -r_comp * k, rz * k, v): #y del SDK = izquierda
+                return True #rechazado por el geofence: decide el modo por pasos
+        except Exception as e:
+            print(f"[goto] go fallido ({e}); continuamos por pasos.")
+            return True
+        time.sleep(_SLEEP_S)
+
+
+def _limit(vx: float, vy: float, vmax: float):
+    n = math.hypot(vx, vy)
+    if n > vmax > 0:
+        return vx * vmax / n, vy * vmax / n
+    return vx, vy
+
+
+#Velocidad horizontal medida por el dron (vgx/vgy del último paquete, en el marco de la pose) o None si no es reciente
+def _measured_velocity(self, pose):
+    snap = self.telemetry()
+    if snap.vgx is None or snap.vgy is None or snap.ts is None or time.time() - snap.ts > _RC_VEL_STALE_S:
+        return None
+    #vgx/vgy: dm/s en el marco del despegue del Tello (yaw absoluto 0) -> marco de la pose (yaw0)
+    th = math.radians(pose.yaw0_deg)
+    c, s = math.cos(th), math.sin(th)
+    a, b = float(snap.vgx) * 10.0, float(snap.vgy) * 10.0
+    return c * a + s * b, -s * a + c * b
+
+
+#Realimentación del lazo rc: la pose avanza con lo que mide el dron, no solo con lo que se le ordena
+# - PoseEstimator: ya fusiona vgx/vgy de cada paquete; el rc ordenado le entra como medida poco fiable
+# - PoseVirtual con telemetría reciente: se integra la velocidad medida (corrige viento y rc != velocidad)
+# - Sin telemetría (fallback): navegación a estima con el rc ordenado; no ve deriva ni viento
+def _rc_feedback(self, pose, cmd, dt: float) -> None:
+    if not hasattr(pose, "update_from_state"):
+        v = _measured_velocity(self, pose)
+        if v is not None:
+            if v == (0.0, 0.0):
+                #Por debajo de la resolución de vgx/vgy (dm/s): la velocidad ordenada, acotada a medio dm/s
+                v = _limit(*(c * RC_FULL_CM_S / 100.0 for c in pose.body_delta(cmd[0], cmd[1])[:2]), 5.0)
+            pose.update_from_velocity(v[0], v[1], dt)
+            return
+    pose.update_from_rc(cmd[0], cmd[1], cmd[2], 0, dt_sec=dt)
+
+
+#Modo "rc": lazo cerrado de velocidad a _RC_HZ. Cada ciclo lleva la pose hasta ahora (_rc_feedback),
+#calcula la velocidad deseada (P + perfil de frenada + límite de aceleración) y envía un rc nuevo.
+#La z y el yaw los corrige la telemetría al llegar cada paquete. Devuelve False si hay que abortar.
+def _rc_control(self, x_goal: float, y_goal: float, z_goal: float, speed_cm_s: Optional[float]) -> bool:
+    vmax = float(speed_cm_s or _RC_VMAX_CM_S)
+    period = 1.0 / _RC_HZ
+    pose = self.pose
+    vw = [0.0, 0.0, 0.0]  #velocidad mundo comandada (x, y, z)
+    cmd = (0, 0, 0)       #rc activo: adelante, derecha, arriba (%)
+    dist0 = math.sqrt((x_goal - pose.x_cm) ** 2 + (y_goal - pose.y_cm) ** 2 + (z_goal - pose.z_cm) ** 2)
+    t_limit = time.time() + 5.0 + 3.0 * dist0 / max(vmax, 1.0)
+
+    def stop():
+        self.rc(0, 0, 0, 0)
+        _rc_feedback(self, pose, cmd, time.time() - t_last)
+
+    t_last = time.time()
+    next_tick = t_last
+    ok = True
+    while True:
+        now = time.time()
+        _rc_feedback(self, pose, cmd, now - t_last)
+        dt, t_last = now - t_last, now
+
+        if getattr(self, "_goto_abort", False):
+            print("[goto] Abortado por solicitud externa.")
+            ok = False
+            break
+        bat = self.telemetry().battery_pct
+        if isinstance(bat, int) and bat < _MIN_BAT_PCT:
+            print(f"[goto] Abortado por batería ({bat}%).")
+            ok = False
+            break
+        if now > t_limit:
+            print("[goto] rc: tiempo agotado; seguimos por pasos.")
+            break
+
+        px, py, pz, _, _ = pose.snapshot()
+        rx, ry, rz = x_goal - px, y_goal - py, z_goal - pz
+        rxy = math.hypot(rx, ry)
+        if rxy <= _TOL_XY_CM and abs(rz) <= _TOL_Z_CM:
+            break
+
+        # Velocidad deseada: P, limitada por vmax y por la que permite frenar a tiempo (v² = 2·a·d)
+        v_xy = min(vmax, _RC_KP * rxy, math.sqrt(2.0 * _RC_ACCEL_CM_S2 * rxy))
+        v_z = min(vmax, _RC_KP * abs(rz), math.sqrt(2.0 * _RC_ACCEL_CM_S2 * abs(rz)))
+        des = ((rx / rxy * v_xy) if rxy > 0 else 0.0, (ry / rxy * v_xy) if rxy > 0 else 0.0, math.copysign(v_z, rz))
+
+        # Límite de aceleración
+        dv_max = _RC_ACCEL_CM_S2 * max(dt, period)
+        dvx, dvy = _limit(des[0] - vw[0], des[1] - vw[1], dv_max)
+        dvz = max(-dv_max, min(dv_max, des[2] - vw[2]))
+        vw = [vw[0] + dvx, vw[1] + dvy, vw[2] + dvz]
+
+        # Mundo -> ejes del dron (mismo convenio que PoseVirtual)
+        yaw = math.radians(pose.yaw_deg or 0.0)
+        fwd = vw[0] * math.cos(yaw) + vw[1] * math.sin(yaw)
+        right = -vw[0] * math.sin(yaw) + vw[1] * math.cos(yaw)
+        cmd = tuple(int(round(max(-100.0, min(100.0, v / RC_FULL_CM_S * 100.0)))) for v in (fwd, right, vw[2]))
+        if self.rc(cmd[1], cmd[0], cmd[2], 0): #rc del SDK: lateral, adelante, vertical, yaw
+            sent = getattr(self, "_rc_sent", (cmd[1], cmd[0], cmd[2], 0))
+            if (sent[1], sent[0], sent[2]) != cmd: #el geofence ha reducido la velocidad
+                cmd = (sent[1], sent[0], sent[2])
+                vw = [v * RC_FULL_CM_S / 100.0 for v in pose.body_delta(*cmd)]
+        else:
+            cmd = (0, 0, 0)
+
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.time()))
+
+    stop()
+    return ok
+
+
+#Puntos de paso (absolutos) de la ruta planificada hasta pose + (dx, dy, dz); None si no hay ruta
+def _plan_legs(self, dx_cm: float, dy_cm: float, dz_cm: float):
+    p0 = self.pose.snapshot()[:3]
+    p1 = (p0[0] + dx_cm, p0[1] + dy_cm, p0[2] + dz_cm)
+    try:
+        return geofence_plan(self, p0, p1)
+    except RuntimeError as e: #sin NumPy: línea recta, como sin avoid
+        print(f"[goto] Sin planificador ({e}); se va en línea recta.")
+        return [p1]
+
+
 def _goto_rel_worker(self,
                      dx_cm: float, dy_cm: float, dz_cm: float = 0.0,
                      yaw_deg: Optional[float] = None,
                      speed_cm_s: Optional[float] = None,
                      callback: Optional[Callable[..., Any]] = None,
-                     params: Any = None) -> None:
+                     params: Any = None,
+                     mode: str = "step",
+                     avoid: bool = False) -> bool:
     #Chequeos básicos previos
     if not hasattr(self, "pose") or self.pose is None: #Si la pose no existe, aborta
         print("[goto] No hay PoseVirtual; abortando.")
-        return
+        return False
     if getattr(self, "state", "") == "disconnected": #Si está desconectado, aborta
         print("[goto] Dron desconectado; abortando.")
-        return
-    bat = getattr(self, "battery_pct", None) #Si la batería es inferior al umbral definido anteriormente (20%), aborta
+        return False
+    bat = self.telemetry().battery_pct #Si la batería es inferior al umbral definido anteriormente (20%), aborta
     if isinstance(bat, int) and bat < _MIN_BAT_PCT:
         print(f"[goto] Batería baja ({bat}%), abortando.")
-        return
+        return False
 
     #Si el dron no está volando, hace un despegue seguro a 0,5 metros
     if getattr(self, "state", "") != "flying":
         ok = self.takeOff(0.5, blocking=True)
         if not ok:
             print("[goto] No se pudo despegar.") #Si falla el despegue, aborta
-            return
+            return False
         time.sleep(0.4)
 
     #Si la velocidad no se ha pasado en la función, intenta fijar la velocidad del SDK de Tello
@@ -96,9 +267,34 @@ def _goto_rel_worker(self,
     if yaw_deg is not None:
         if not _rotate_to_yaw(self, float(yaw_deg)):
             print("[goto] Error en giro inicial.")
-            return
+            return False
         time.sleep(0.05)
 
+    #Ruta que rodea las exclusiones: se vuela tramo a tramo hasta el último punto de paso, que sigue el camino normal
+    if avoid and getattr(self, "_gf_enabled", False):
+        legs = _plan_legs(self, float(dx_cm), float(dy_cm), float(dz_cm))
+        if legs is None:
+            print("[goto] No hay ruta dentro del geofence hasta el objetivo; no se mueve.")
+            return False
+        if len(legs) > 1:
+            print(f"[goto] Ruta planificada: {len(legs)} tramos.")
+        x_end, y_end, z_end = legs[-1]
+        for wx, wy, wz in legs[:-1]:
+            px, py, pz, _, _ = self.pose.snapshot()
+            if not _goto_rel_worker(self, wx - px, wy - py, wz - pz, None, speed_cm_s, None, None, mode):
+                return False
+        px, py, pz, _, _ = self.pose.snapshot()
+        dx_cm, dy_cm, dz_cm = x_end - px, y_end - py, z_end - pz
+
+    #Geofence predictivo: en modo hard, si la recta hasta el objetivo sale del geofence, acortamos el objetivo
+    k = _gf_allowed_fraction(self, float(dx_cm), float(dy_cm), float(dz_cm), what="goto")
+    if k < 1.0:
+        if k * math.sqrt(dx_cm * dx_cm + dy_cm * dy_cm + dz_cm * dz_cm) < _TOL_XY_CM:
+            print("[goto] Objetivo fuera del geofence; no se mueve.")
+            return False
+        print(f"[goto] Objetivo recortado al {k * 100:.0f}% del trayecto por el geofence.")
+        dx_cm, dy_cm, dz_cm = dx_cm * k, dy_cm * k, dz_cm * k
+
     # Objetivo de cada coordenada (suma la posición actual del dron con el desplazamiento deseado que se le manda al dron)
     x_goal = self.pose.x_cm + float(dx_cm)
     y_goal = self.pose.y_cm + float(dy_cm)
@@ -120,19 +316,28 @@ def _goto_rel_worker(self,
             except TypeError:
                 try: callback()
                 except Exception: pass
-        return
+        return True
+
+    #Modo "go": el grueso del trayecto en uno o pocos comandos; el resto (<20 cm) se corrige por pasos
+    if mode == "go":
+        if not _go_chunks(self, x_goal, y_goal, z_goal, speed_cm_s):
+            return False
+    #Modo "rc": movimiento continuo en lazo cerrado; si no converge, termina el modo por pasos
+    elif mode == "rc":
+        if not _rc_control(self, x_goal, y_goal, z_goal, speed_cm_s):
+            return False
 
     # Bucle hasta llegar al objetivo, o que haya algún error debido a motivos de seguridad
     while True:
         # posibilidad de aborto externo
         if getattr(self, "_goto_abort", False): #Busca si el dron tiene el atributo _goto_abort, si no existe vale False, si existe aborta
             print("[goto] Abortado por solicitud externa.")
-            return
+            return False
         #Verificación de seguridad por batería baja
-        bat = getattr(self, "battery_pct", None) #Obtiene el valor actual de la batería
+        bat = self.telemetry().battery_pct #Obtiene el valor actual de la batería
         if isinstance(bat, int) and bat < _MIN_BAT_PCT: #Si el nivel está por debajo del mínim, aborta
             print(f"[goto] Abortado por batería ({bat}%).")
-            return
+            return False
 
         rx, ry, rz, rxy = remaining() #Actualiza la distancia que falta en tiempo real
 
@@ -141,41 +346,47 @@ def _goto_rel_worker(self,
             break
 
         #Corregir primero la altura
-        if abs(rz) > _TOL_Z_CM: #si aún hay que subir o bajar
+        if abs(rz) > max(_TOL_Z_CM, _MIN_CORR_CM): #si aún hay que subir o bajar
             stepz = _adaptive_step(rz, _STEP_Z_CM, min_step=20.0) #realiza el paso
             cmd = "up" if rz > 0 else "down"
             if not _send_and_update(self, cmd, stepz): #se envía el paso al dron y actualiza la pose, si falla se muestra el mensaje
-                print("[goto] Micro-paso Z fallido.")
+                print("[goto] Micro-paso Z fallido; abortando.")
+                return False
             time.sleep(_SLEEP_S)
             continue
 
         #Este bloque convierte lo que falta en el mapa a cuanto falta avanzar/retroceder/izquierda/derecha según hacia donde mira el dron (yaw)
         yaw = math.radians(getattr(self.pose, "yaw_deg", 0.0) or 0.0) #lee el yaw actual y lo convierte a radianes
         fx, fy = math.cos(yaw), math.sin(yaw)  # eje forward (mundo)
-        rx_, ry_ = math.sin(yaw), -math.cos(yaw)  # eje right = forward rotado -90° (CW)
+        rx_, ry_ = -math.sin(yaw), math.cos(yaw)  # eje right (mismo convenio que PoseVirtual.update_move)
 
         f_comp = rx * fx + ry * fy     #componente frontal
         r_comp = rx * rx_ + ry * ry_   #componente horizontal
 
         moved = False
 
-        if abs(f_comp) > (_TOL_XY_CM * 0.4): #Si lo que falta por avanzar o retroceder es mayor que el 40% de la tolerancia
+        if abs(f_comp) > max(_TOL_XY_CM * 0.4, _MIN_CORR_CM): #Si lo que falta por avanzar o retroceder supera lo que puede corregir un paso mínimo
             stepx = _adaptive_step(f_comp, _STEP_XY_CM, min_step=15.0) #Se realiza el paso con su función
             cmd = "forward" if f_comp > 0 else "back" #decide si va hacia delante o detrás
             if not _send_and_update(self, cmd, stepx): #se manda el comando al dron y se actualiza la pose
-                print("[goto] Micro-paso forward/back fallido.")
+                print("[goto] Micro-paso forward/back fallido; abortando.")
+                return False
             moved = True
         #Se realiza lo mismo pero para derecha o izquierda
-        if abs(r_comp) > (_TOL_XY_CM * 0.4):
+        if abs(r_comp) > max(_TOL_XY_CM * 0.4, _MIN_CORR_CM):
             stepy = _adaptive_step(r_comp, _STEP_XY_CM, min_step=15.0)
             cmd = "right" if r_comp > 0 else "left"
             if not _send_and_update(self, cmd, stepy):
-                print("[goto] Micro-paso right/left fallido.")
+                print("[goto] Micro-paso right/left fallido; abortando.")
+                return False
             moved = True
 
-        # si no hay nada significativo que mover, evita bucle vacío
-        if not moved and rxy <= _TOL_XY_CM:
-            break
+        # si no hay nada que un paso pueda mejorar (menos de _MIN_CORR_CM por eje) paramos para no oscilar ±20 cm,
+        # pero fuera de tolerancia no se da el objetivo por alcanzado
+        if not moved:
+            print(f"[goto] Tolerancia no alcanzada: quedan {rxy:.1f} cm en horizontal y {abs(rz):.1f} cm en vertical "
+                  f"(menos de lo que corrige un paso mínimo de {MIN_STEP} cm).")
+            return False
 
         time.sleep(_SLEEP_S)
 
@@ -185,6 +396,7 @@ def _goto_rel_worker(self,
         except TypeError:
             try: callback()
             except Exception: pass
+    return True
 
 #Función pública
 def goto_rel(self,
@@ -193,12 +405,19 @@ def goto_rel(self,
              speed_cm_s: Optional[float] = None,
              blocking: bool = True,
              callback: Optional[Callable[..., Any]] = None,
-             params: Any = None) -> None:
+             params: Any = None,
+             mode: str = "step",
+             avoid: bool = False) -> None:
+    # mode="step" (por defecto): micro-pasos por eje (comportamiento clásico)
+    # mode="go": comandos "go x y z speed" por tramos | mode="rc": lazo cerrado de velocidad por rc
+    # avoid=True: con el geofence activo, rodea las exclusiones por una ruta planificada en vez de ir en línea recta
+    if mode not in ("go", "rc", "step"):
+        raise ValueError(f"mode debe ser 'go', 'rc' o 'step' (recibido {mode!r})")
     setattr(self, "_goto_abort", False)
 
     t = threading.Thread(
         target=_goto_rel_worker,
-        args=(self, dx_cm, dy_cm, dz_cm, yaw_deg, speed_cm_s, callback, params),
+        args=(self, dx_cm, dy_cm, dz_cm, yaw_deg, speed_cm_s, callback, params, mode, avoid),
         daemon=True
     )
     t.start()
@@ -0,0 +1,151 @@
+import math
+
+# NumPy es opcional: sin él no hay histórico, pero el resto de TelloLink funciona igual
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+class RingBuffer:
+    """
+    Buffer circular de capacidad fija sobre un array estructurado de NumPy.
+    Cada fila se escribe dos veces (posición i e i+capacidad), así cualquier ventana de las últimas
+    k <= capacidad filas es un slice contiguo: vistas sin copia y append en O(1).
+    Las vistas son "vivas": si se van a guardar mientras se sigue escribiendo, hay que copiarlas.
+    """
+
+    def __init__(self, dtype, capacity: int):
+        if np is None:
+            raise RuntimeError("Falta NumPy (pip install numpy)")
+        self.capacity = max(1, int(capacity))
+        self._buf = np.zeros(2 * self.capacity, dtype=dtype)
+        self._n = 0  # total de filas añadidas desde el inicio
+
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    @property
+    def dtype(self):
+        return self._buf.dtype
+
+    def append(self, row: tuple) -> None:
+        i = self._n % self.capacity
+        self._buf[i] = row
+        self._buf[i + self.capacity] = row
+        self._n += 1
+
+    def clear(self) -> None:
+        self._n = 0
+
+    def view(self, count: int | None = None):
+        # Vista de las últimas `count` filas (todas si es None), de la más antigua a la más reciente
+        n = self._n
+        size = min(n, self.capacity)
+        k = size if count is None else max(0, min(int(count), size))
+        if k == 0:
+            return self._buf[:0]
+        end = (n - 1) % self.capacity + self.capacity + 1
+        return self._buf[end - k:end]
+
+    def last(self, seconds: float | None = None, count: int | None = None):
+        # Ventana (vista sin copia) por tiempo y/o por número de muestras (filas con campo "t" creciente)
+        v = self.view(count)
+        if seconds is not None and len(v):
+            t0 = v["t"][-1] - float(seconds)
+            v = v[int(np.searchsorted(v["t"], t0, side="left")):]
+        return v
+
+
+# Una fila por paquete de estado (NaN = campo no recibido)
+_HISTORY_FIELDS = ("height_cm", "battery_pct", "temp_c", "flight_time_s", "yaw_deg",
+                   "pitch_deg", "roll_deg", "vgx", "vgy", "vgz", "agx", "agy", "agz",
+                   "tof_cm", "baro_m", "templ_c", "temph_c",
+                   "x_cm", "y_cm", "z_cm", "pose_yaw_deg")
+
+HISTORY_DTYPE = [("t", "f8")] + [(name, "f4") for name in _HISTORY_FIELDS]
+
+_STATE_HZ = 10.0  # el Tello envía ~10 paquetes de estado por segundo
+
+
+class TelemetryHistory(RingBuffer):
+    """Histórico de las snapshots de telemetría de los últimos `seconds` segundos."""
+
+    def __init__(self, seconds: float = 600.0, rate_hz: float = _STATE_HZ):
+        super().__init__(HISTORY_DTYPE, int(math.ceil(seconds * rate_hz * 1.2)))
+
+    def append_snapshot(self, snap) -> None:
+        nan = math.nan
+        row = [snap.ts if snap.ts is not None else nan]
+        for name in _HISTORY_FIELDS:
+            v = getattr(snap, name)
+            row.append(nan if v is None else v)
+        self.append(tuple(row))
+
+    def field(self, name: str, seconds: float | None = None):
+        return self.last(seconds)[name]
+
+
+# Rastro de la pose: una fila por actualización; "s" = distancia recorrida acumulada desde el inicio del rastro
+TRAIL_DTYPE = [("t", "f8"), ("x", "f4"), ("y", "f4"), ("z", "f4"), ("yaw", "f4"), ("s", "f8")]
+
+
+class PoseTrail(RingBuffer):
+    """
+    Rastro acotado de la pose (t, x, y, z, yaw). Con la distancia acumulada en cada fila, la distancia
+    recorrida entre dos instantes es una resta aunque las filas antiguas ya se hayan sobrescrito.
+    """
+
+    def __init__(self, capacity: int = 6000):
+        super().__init__(TRAIL_DTYPE, capacity)
+        self._last = None
+        self.total_cm = 0.0
+
+    def append_pose(self, t: float, x: float, y: float, z: float, yaw: float) -> None:
+        if self._last is not None:
+            lx, ly, lz = self._last
+            self.total_cm += math.sqrt((x - lx) ** 2 + (y - ly) ** 2 + (z - lz) ** 2)
+        self._last = (x, y, z)
+        self.append((t, x, y, z, yaw, self.total_cm))
+
+    def clear(self) -> None:
+        super().clear()
+        self._last = None
+        self.total_cm = 0.0
+
+    def at(self, t: float):
+        """
+        (x, y, z, yaw) en el instante t, interpolando entre las dos muestras que lo rodean (el yaw por el
+        giro más corto). None si t es anterior al rastro; tras la última muestra, la última pose.
+        """
+        t = float(t)
+        v = self.view()
+        if not len(v) or t < v["t"][0]:
+            return None
+        i = int(np.searchsorted(v["t"], t, side="right"))
+        if i >= len(v):
+            r = v[-1]
+            return float(r["x"]), float(r["y"]), float(r["z"]), float(r["yaw"])
+        a, b = v[i - 1], v[i]
+        span = float(b["t"] - a["t"])
+        k = (t - float(a["t"])) / span if span > 0 else 1.0
+        dyaw = (float(b["yaw"] - a["yaw"]) + 180.0) % 360.0 - 180.0
+        return (float(a["x"] + k * (b["x"] - a["x"])), float(a["y"] + k * (b["y"] - a["y"])),
+                float(a["z"] + k * (b["z"] - a["z"])), (float(a["yaw"]) + k * dyaw) % 360.0)
+
+    def distance_cm(self, seconds: float | None = None) -> float:
+        # Distancia recorrida en los últimos `seconds` (todo el rastro si es None, aunque ya no quepa en el buffer)
+        if seconds is None:
+            return self.total_cm
+        v = self.last(seconds)
+        return float(v["s"][-1] - v["s"][0]) if len(v) else 0.0
+
+    def decimated(self, max_points: int = 500, seconds: float | None = None):
+        # Como mucho ~max_points filas equiespaciadas para dibujar; vista sin copia salvo para añadir la última
+        v = self.last(seconds)
+        n = len(v)
+        step = max(1, int(math.ceil(n / float(max(2, int(max_points))))))
+        if step == 1:
+            return v
+        d = v[::step]
+        return d if (n - 1) % step == 0 else np.concatenate((d, v[-1:]))
@@ -9,6 +9,7 @@ _MIN_BAT_PCT = 20  # batería mínima para ejecutar una misión
 def _is_abs_wp(wp: Dict[str, Any]) -> bool: # Si el waypoint no contiene todas las claves absolutas (x,y,z) ni todas las relativas (dx,dy,dz), se considera inválido y se lanza un error
     if not all(k in wp for k in ("x", "y", "z")) and not all(k in wp for k in ("dx", "dy", "dz")):
         raise ValueError("Waypoint incoherente: debe ser absoluto (x,y,z) o relativo (dx,dy,dz)")
+    return all(k in wp for k in ("x", "y", "z"))
 
 
 def _validate_and_normalize(waypoints: List[Dict[str, Any]]) -> List[Dict[str, Any]]: #Función que sirve para normalizar y preparar la lista de waypoints
@@ -62,7 +63,8 @@ def _mission_worker(self,
                     waypoints: List[Dict[str, Any]],
                     do_land: bool = True,
                     on_wp: Optional[Callable[[int, Dict[str, Any]], None]] = None,
-                    on_finish: Optional[Callable[[], None]] = None) -> None:
+                    on_finish: Optional[Callable[[], None]] = None,
+                    avoid: bool = False) -> None:
     #Flag de aborto
     setattr(self, "_mission_abort", False)
 
@@ -77,7 +79,7 @@ def _mission_worker(self,
     if getattr(self, "state", "") == "disconnected":
         print("[mission] Dron desconectado; abortando.")
         return
-    bat = getattr(self, "battery_pct", None)
+    bat = self.telemetry().battery_pct
     if isinstance(bat, int) and bat < _MIN_BAT_PCT:
         print(f"[mission] Batería baja ({bat}%), abortando.")
         return
@@ -97,7 +99,7 @@ def _mission_worker(self,
             break
 
         # Se vuelve a comprobar la batería antes de cada movimiento
-        bat = getattr(self, "battery_pct", None)
+        bat = self.telemetry().battery_pct
         if isinstance(bat, int) and bat < _MIN_BAT_PCT:
             print(f"[mission] Abortada por batería ({bat}%).")
             break
@@ -132,7 +134,7 @@ def _mission_worker(self,
         # Ejecuta el movimiento y manda el dron hacia el waypoint
         try:
             # Nota: goto_rel ya maneja yaw opcional al inicio del movimiento
-            self.goto_rel(dx_cm=dx, dy_cm=dy, dz_cm=dz, yaw_deg=yaw, blocking=True)
+            self.goto_rel(dx_cm=dx, dy_cm=dy, dz_cm=dz, yaw_deg=yaw, blocking=True, avoid=avoid)
         except Exception as e:
             print(f"[mission] Error en goto_rel de WP{idx}: {e}")
             break
@@ -168,10 +170,11 @@ def run_mission(self,
                 do_land: bool = True,
                 blocking: bool = True,
                 on_wp: Optional[Callable[[int, Dict[str, Any]], None]] = None,
-                on_finish: Optional[Callable[[], None]] = None) -> None:
-
+                on_finish: Optional[Callable[[], None]] = None,
+                avoid: bool = False) -> None:
+    # avoid=True: cada tramo rodea las exclusiones del geofence (las rutas se reutilizan entre misiones)
     th = threading.Thread(target=_mission_worker,
-                          args=(self, waypoints, do_land, on_wp, on_finish),
+                          args=(self, waypoints, do_land, on_wp, on_finish, avoid),
                           daemon=True)
     th.start()
     if blocking:
@@ -1,4 +1,6 @@
+import math
 import time
+from TelloLink.modules.tello_geofence import _gf_allowed_fraction
 
 #Valores nmáximos y mínimos del SDK de Tello
 MIN_STEP = 20       # cm (límite inferior de movimiento del Tello)
@@ -6,6 +8,8 @@ MAX_STEP = 500      # cm (límite superior de movimiento del Tello)
 MIN_SPEED = 10      # cm/s
 MAX_SPEED = 100     # cm/s
 COOLDOWN_S = 0.4    # pequeña pausa entre comandos por seguridad
+RC_FULL_CM_S = 100.0  # rc 100 -> 100 cm/s (mismo supuesto que PoseVirtual.update_from_rc)
+RC_HORIZON_S = 0.5    # anticipación de la comprobación de geofence en rc
 
 
 
@@ -20,6 +24,21 @@ def _ensure_techo(self):
     if not hasattr(self, "TECHO_M") or self.TECHO_M is None: #Si el atributo TECHO_ no existe o está definido como none, le popnemos 1,5 m.
         self.TECHO_M = 2.5
 
+def _gf_clip_step(self, verb: str, d: int) -> int:
+    # Recorta (o rechaza con 0) un movimiento cuyo recorrido saldría del geofence en modo hard
+    pose = getattr(self, "pose", None)
+    if pose is None or not getattr(self, "_gf_enabled", False):
+        return d
+    k = _gf_allowed_fraction(self, *pose.move_delta(verb, d), what=f"{verb} {d}")
+    if k >= 1.0:
+        return d
+    allowed = int(math.floor(d * k))
+    if allowed < MIN_STEP:
+        print(f"[geofence][HARD] {verb} {d} rechazado: saldría del geofence.")
+        return 0
+    print(f"[geofence][HARD] {verb} {d} recortado a {allowed} cm.")
+    return allowed
+
 def _distancia_acotada(dist_cm: int) -> int:
     # Acota la distancia a los límites del SDK
     try:
@@ -32,6 +51,9 @@ def _move(self, verb, dist_cm):
     #Envia un movimiento horizontal simple ("forward", "back", "left", "right" son los tipos de "verb" (opciones de movimiento))
     self._require_connected()
     d = _distancia_acotada(dist_cm)
+    d = _gf_clip_step(self, verb, d) #Comprobación predictiva del geofence antes de enviar
+    if d == 0:
+        return False
     resp = self._send(f"{verb} {d}") #Se envia el tipo de verb y su distancia, por ejemplo forward y 50)
     if not _resp_is_ok(resp):   #Si el dron no responde con un "ok", lanzamos ek error
         raise RuntimeError(f"{verb} {d} -> {resp}")
@@ -45,6 +67,45 @@ def _move(self, verb, dist_cm):
     time.sleep(COOLDOWN_S)
     return True
 
+#Movimiento 3D en un solo comando: "go x y z speed" (x adelante, y IZQUIERDA, z arriba, en ejes del dron)
+def go(self, x_cm: int, y_cm: int, z_cm: int, speed_cm_s: int = 50):
+    self._require_connected()
+    x, y, z = (max(-MAX_STEP, min(MAX_STEP, int(round(v)))) for v in (x_cm, y_cm, z_cm))
+    v = max(MIN_SPEED, min(MAX_SPEED, int(speed_cm_s)))
+
+    # Techo de seguridad: recortamos la componente vertical como hace up()
+    _ensure_techo(self)
+    curr_h = getattr(self, "height_cm", None)
+    if isinstance(curr_h, int) and z > 0:
+        z = min(z, max(0, int(self.TECHO_M * 100) - curr_h))
+
+    # El SDK rechaza el go si las tres componentes están dentro de ±20 cm
+    if max(abs(x), abs(y), abs(z)) <= MIN_STEP:
+        return True
+
+    # Geofence: el go es una recta, así que recortar es escalar las tres componentes
+    pose = getattr(self, "pose", None)
+    if pose is not None and getattr(self, "_gf_enabled", False):
+        k = _gf_allowed_fraction(self, *pose.body_delta(x, -y, z), what=f"go {x} {y} {z}")
+        if k < 1.0:
+            x, y, z = (int(math.floor(abs(c) * k)) * (1 if c >= 0 else -1) for c in (x, y, z))
+            if max(abs(x), abs(y), abs(z)) <= MIN_STEP:
+                print("[geofence][HARD] go rechazado: saldría del geofence.")
+                return False
+            print(f"[geofence][HARD] go recortado a {x} {y} {z}.")
+
+    resp = self._send(f"go {x} {y} {z} {v}")
+    if not _resp_is_ok(resp):
+        raise RuntimeError(f"go {x} {y} {z} {v} -> {resp}")
+    try:
+        pose = getattr(self, "pose", None)
+        if pose is not None:
+            pose.update_go(x, y, z)
+    except Exception:
+        pass
+    time.sleep(COOLDOWN_S)
+    return True
+
 #Atajos de los movimientos horizontales
 def forward(self, dist_cm: int):
     return _move(self, "forward", dist_cm)
@@ -79,6 +140,9 @@ def up(self, dist_cm: int):
                 return True  # nada que subir
     if d == 0:
         return True
+    d = _gf_clip_step(self, "up", d)
+    if d == 0:
+        return False
 
     resp = self._send(f"up {d}") #Se manda el comando al Tello
     if not _resp_is_ok(resp): #Si no devuelve "ok"
@@ -102,6 +166,9 @@ def down(self, dist_cm: int): #Función para bajar
     if isinstance(curr_h, int):
         if d > curr_h: #Si la altura que se desea bajar es mayor que la altura actual (imposible)
             d = max(MIN_STEP, curr_h)  #Va a bajar  la altura actual o lo que pueda (MIN_STEP)
+    d = _gf_clip_step(self, "down", d)
+    if d == 0:
+        return False
     resp = self._send(f"down {d}") #Se manda el comando al Tello
     if not _resp_is_ok(resp): #Si no devuelve "ok"
         raise RuntimeError(f"down {d} -> {resp}") #Lanza error
@@ -139,9 +206,22 @@ def rc(self, vx: int, vy: int, vz: int, yaw: int):
     vz = max(-100, min(100, int(vz)))
     yaw = max(-100, min(100, int(yaw)))
 
+    # Geofence: se mira a dónde llevaría esta velocidad en RC_HORIZON_S y, en modo hard, se reduce para
+    # quedarse antes del borde (al acercarse la velocidad tiende a 0). rc: vx = lateral, vy = adelante
+    pose = getattr(self, "pose", None)
+    if pose is not None and getattr(self, "_gf_enabled", False) and (vx or vy or vz):
+        h = RC_HORIZON_S * RC_FULL_CM_S / 100.0
+        k = _gf_allowed_fraction(self, *pose.body_delta(vy * h, vx * h, vz * h), warn=False)
+        if k < 1.0:
+            vx, vy, vz = int(vx * k), int(vy * k), int(vz * k)
+
     try:
 
         self._tello.send_rc_control(vx, vy, vz, yaw)
+        self._rc_sent = (vx, vy, vz, yaw)  # lo realmente enviado (puede venir recortado por el geofence)
+        rec = getattr(self, "_recorder", None)
+        if rec is not None:
+            rec.rc(vx, vy, vz, yaw)
         return True
     except Exception as e:
         print(f"[rc] Error enviando comando: {e}")
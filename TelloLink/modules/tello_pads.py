@@ -0,0 +1,188 @@
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Optional
+
+# Mission pads del Tello EDU. Con "mon" el paquete de estado trae mid (id del pad visto, -1/-2 = ninguno),
+# x, y, z (cm, posición del dron en el marco del pad: x hacia la cabeza del cohete, y a la IZQUIERDA, z arriba)
+# y mpry (pitch, roll, yaw del dron respecto al pad, yaw cw como el del dron).
+# Conociendo dónde está cada pad en el marco de la pose (el "layout"), cada observación es una posición
+# absoluta que corrige la deriva de la estima.
+
+_DIRECTIONS = (0, 1, 2)      # mdirection: 0 = hacia abajo, 1 = hacia delante, 2 = ambas
+_PAD_MODES = ("snap", "blend")
+_MAX_JUMP_CM = 300.0         # corrección mayor que esto: pad mal identificado o layout equivocado
+_FIX_SIGMA_CM = 5.0          # precisión de un fijo de pad (para PoseEstimator)
+
+_publish_lock = threading.Lock()
+_file_cache = {}             # (ruta absoluta, mtime) -> PadLayout
+
+
+@dataclass(frozen=True)
+class PadLayout:
+    """
+    Posición de cada pad en el marco de la pose: mid -> (x, y, z, yaw, cos(yaw), sin(yaw)).
+    Inmutable: cambiar el layout es publicar uno nuevo (el seno/coseno de cada pad se calcula una vez).
+    """
+    version: int = 0
+    pads: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    def __contains__(self, mid) -> bool:
+        return mid in self.pads
+
+    def __len__(self) -> int:
+        return len(self.pads)
+
+    def with_pads(self, pads: dict) -> "PadLayout":
+        # Layout nuevo con estos pads añadidos o sustituidos
+        merged = dict(self.pads)
+        for mid, p in pads.items():
+            x, y, z, yaw = p
+            th = math.radians(yaw)
+            merged[int(mid)] = (float(x), float(y), float(z), float(yaw) % 360.0, math.cos(th), math.sin(th))
+        return PadLayout(self.version + 1, MappingProxyType(merged))
+
+    def locate(self, mid: int, px: float, py_left: float, yaw_rel: float) -> tuple:
+        # Posición (x, y) y rumbo del dron en el marco de la pose a partir de lo que ve sobre el pad `mid`
+        x0, y0, _, yaw0, c, s = self.pads[mid]
+        r = -py_left
+        return x0 + px * c - r * s, y0 + px * s + r * c, (yaw0 + yaw_rel) % 360.0
+
+    def to_dict(self) -> dict:
+        return {"pads": {str(mid): {"x": p[0], "y": p[1], "z": p[2], "yaw": p[3]} for mid, p in self.pads.items()}}
+
+
+def _parse_pads(pads) -> dict:
+    # Acepta {mid: (x, y[, z[, yaw]])}, {mid: {"x":..,"y":..}} o [{"mid":.., "x":.., ...}, ...]
+    if isinstance(pads, dict) and "pads" in pads:
+        pads = pads["pads"]
+    items = pads.items() if isinstance(pads, dict) else ((p["mid"], p) for p in pads)
+    out = {}
+    for mid, p in items:
+        if isinstance(p, dict):
+            p = (p.get("x", 0.0), p.get("y", 0.0), p.get("z", 0.0), p.get("yaw", 0.0))
+        p = tuple(float(v) for v in p) + (0.0,) * (4 - len(p))
+        out[int(mid)] = p[:4]
+    return out
+
+
+def load_pad_layout(path: str) -> PadLayout:
+    """Lee un layout de pads en JSON. Se cachea por ruta y fecha de modificación."""
+    full = os.path.abspath(path)
+    key = (full, os.stat(full).st_mtime_ns)
+    layout = _file_cache.get(key)
+    if layout is None:
+        with open(full, "r", encoding="utf-8") as f:
+            layout = PadLayout().with_pads(_parse_pads(json.load(f)))
+        _file_cache[key] = layout
+    return layout
+
+
+def save_pad_layout(self, path: str) -> str:
+    """Guarda el layout actual (incluidos los pads aprendidos) en JSON."""
+    layout = getattr(self, "_pad_layout", None) or PadLayout()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(layout.to_dict(), f, indent=2)
+    print(f"[pads] Layout guardado: {len(layout)} pads -> {path}")
+    return path
+
+
+def set_pad_layout(self, pads=None, mode: str = "blend", weight: float = 0.3, learn: bool = True) -> PadLayout:
+    """
+    Fija dónde está cada pad (dict, lista o ruta a un JSON; None = vacío) y cómo se corrige la pose:
+    mode="snap" la lleva al fijo, mode="blend" avanza `weight` hacia él en cada observación.
+    Con learn=True, un pad que no está en el layout se sitúa con la pose del momento en que se ve por primera vez.
+    """
+    if mode not in _PAD_MODES:
+        raise ValueError(f"mode debe ser uno de {_PAD_MODES}")
+    if isinstance(pads, str):
+        layout = load_pad_layout(pads)
+    else:
+        layout = PadLayout().with_pads(_parse_pads(pads or {}))
+    with _publish_lock:
+        prev = getattr(self, "_pad_layout", None)
+        if prev is not None and layout.version <= prev.version:
+            layout = PadLayout(prev.version + 1, layout.pads)
+        self._pad_layout = layout
+    self._pad_mode = mode
+    self._pad_weight = 1.0 if mode == "snap" else max(0.0, min(1.0, float(weight)))
+    self._pad_learn = bool(learn)
+    print(f"[pads] Layout: {len(layout)} pads, modo={mode}, aprender={'sí' if learn else 'no'}")
+    return layout
+
+
+def enable_mission_pads(self, direction: int = 0) -> bool:
+    """Activa la detección de mission pads (mon + mdirection) y la corrección de la pose con ellas."""
+    if direction not in _DIRECTIONS:
+        raise ValueError(f"direction debe ser uno de {_DIRECTIONS}")
+    self._require_connected()
+    for cmd in ("mon", f"mdirection {direction}"):
+        resp = str(self._send(cmd)).strip().lower()
+        if resp != "ok":
+            print(f"[pads] '{cmd}' -> {resp} (¿Tello sin soporte de mission pads?)")
+            return False
+    if getattr(self, "_pad_layout", None) is None:
+        self._pad_layout = PadLayout()
+        self._pad_mode, self._pad_weight, self._pad_learn = "blend", 0.3, True
+    self._pads_enabled = True
+    print(f"[pads] Mission pads activadas (mdirection {direction})")
+    return True
+
+
+def disable_mission_pads(self) -> None:
+    self._pads_enabled = False
+    try:
+        self._send("moff")
+    except Exception:
+        pass
+    print("[pads] Mission pads desactivadas")
+
+
+def pad_fix(self) -> Optional[dict]:
+    """Último fijo de pad aplicado: {"mid", "x", "y", "yaw", "jump_cm", "ts"} o None."""
+    return getattr(self, "_pad_last", None)
+
+
+def _pad_correct(self, st: dict, ts: float) -> None:
+    # Se llama con cada paquete de estado (tras sincronizar la pose) si las mission pads están activas
+    mid = st.get("mid")
+    if mid is None or mid < 1 or getattr(self, "state", "") != "flying":
+        return
+    pose = getattr(self, "pose", None)
+    mpry = st.get("mpry")
+    if pose is None or mpry is None:
+        return
+    px, py, yaw_rel = float(st.get("x", 0)), float(st.get("y", 0)), float(mpry[2])
+    layout = getattr(self, "_pad_layout", None) or PadLayout()
+
+    if mid not in layout:
+        if not getattr(self, "_pad_learn", True):
+            return
+        # Primer avistamiento: el pad queda donde la pose dice que está (las siguientes visitas corrigen)
+        x, y, z, yaw, _ = pose.snapshot()
+        pad_yaw = (yaw - yaw_rel) % 360.0
+        th = math.radians(pad_yaw)
+        r = -py
+        pad = (x - (px * math.cos(th) - r * math.sin(th)), y - (px * math.sin(th) + r * math.cos(th)), 0.0, pad_yaw)
+        with _publish_lock:
+            cur = getattr(self, "_pad_layout", None) or PadLayout()
+            if mid in cur:
+                return
+            self._pad_layout = cur.with_pads({mid: pad})
+        print(f"[pads] Pad {mid} aprendido en ({pad[0]:.0f}, {pad[1]:.0f}), yaw {pad_yaw:.0f}°")
+        return
+
+    fx, fy, fyaw = layout.locate(mid, px, py, yaw_rel)
+    x, y, _, _, _ = pose.snapshot()
+    jump = math.hypot(fx - x, fy - y)
+    if jump > _MAX_JUMP_CM:
+        if getattr(self, "_pad_last_reject", None) != mid:
+            print(f"[pads] Fijo del pad {mid} descartado: salto de {jump:.0f} cm")
+            self._pad_last_reject = mid
+        return
+    self._pad_last_reject = None
+    pose.apply_fix(fx, fy, yaw_deg=fyaw, weight=getattr(self, "_pad_weight", 1.0), sigma_cm=_FIX_SIGMA_CM)
+    self._pad_last = {"mid": mid, "x": fx, "y": fy, "yaw": fyaw, "jump_cm": jump, "ts": ts}
@@ -1,5 +1,7 @@
 import math
-from dataclasses import dataclass
+import threading
+import time
+from array import array
 
 #Función para mantener siempre el ángulo entre 0 y 360 grados
 def _wrap_deg(deg: float) -> float:
@@ -7,141 +9,322 @@ def _wrap_deg(deg: float) -> float:
     return d if d >= 0 else d + 360.0
 
 
-@dataclass
+# Velocidades del Tello a RC 100 (aproximadas; ajustables según tu dron)
+MAX_SPEED_CM_S = 100.0  # cm/s
+MAX_YAW_DEG_S = 100.0  # grados/s
+
+# Posiciones de cada campo en el buffer de la pose
+_X, _Y, _Z, _YAW, _YAW0 = range(5)
+
+# Origen de cada publicación de la pose (PoseVirtual.source): los observadores tratan distinto una estima
+# determinista (comando) de una medida con ruido (telemetría, estimador) o de un fijo absoluto (mission pad)
+SRC_COMMAND = "command"
+SRC_TELEMETRY = "telemetry"
+SRC_ESTIMATOR = "estimator"
+SRC_FIX = "fix"
+
+
+def _field(i):
+    # Lectura de un campo suelto (atómica) y escritura publicada con el contador de secuencia
+    def fget(self):
+        return self._buf[i]
+
+    def fset(self, value):
+        # Asignación a mano: cuenta como un comando
+        with self._wlock:
+            self._seq += 1
+            self._buf[i] = float(value)
+            self._src = SRC_COMMAND
+            self._seq += 1
+            if self._trail is not None:
+                self._trail_append()
+
+    return property(fget, fset)
+
+
 class PoseVirtual:
-    x_cm: float = 0.0
-    y_cm: float = 0.0
-    z_cm: float = 0.0
-    yaw_deg: float = 0.0
+    """
+    Pose del dron (x, y, z, yaw, yaw0) en un único array de dobles preasignado.
+
+    La escriben la telemetría, los movimientos, goto, rc y el aterrizaje; la leen el geofence y la interfaz
+    desde otros hilos. Los escritores se serializan con _wlock y publican con un contador de secuencia
+    (impar = escritura en curso); los lectores no bloquean: snapshot() repite la lectura si el contador cambió.
+    """
+    __slots__ = ("_buf", "_seq", "_wlock", "_listeners", "_trail", "_src")
+
+    x_cm = _field(_X)
+    y_cm = _field(_Y)
+    z_cm = _field(_Z)
+    yaw_deg = _field(_YAW)
 
     # Referencia de yaw en el momento del despegue (para yaw relativo = 0) ---
-    yaw0_deg: float = 0.0
+    yaw0_deg = _field(_YAW0)
+
+    def __init__(self, x_cm: float = 0.0, y_cm: float = 0.0, z_cm: float = 0.0,
+                 yaw_deg: float = 0.0, yaw0_deg: float = 0.0):
+        self._buf = array("d", (float(x_cm), float(y_cm), float(z_cm), float(yaw_deg), float(yaw0_deg)))
+        self._seq = 0
+        self._wlock = threading.RLock()
+        # Observadores de cambios de pose (tupla: se sustituye entera al añadir/quitar, sin locks al notificar)
+        self._listeners = ()
+        # Rastro opcional (PoseTrail, ver enable_trail)
+        self._trail = None
+        self._src = SRC_COMMAND
+
+    # --- Publicación y lectura consistentes ---
+
+    def _store(self, x, y, z, yaw, yaw0, source: str = SRC_COMMAND) -> None:
+        # Escribe los cinco campos como una única publicación (llamar con _wlock tomado)
+        buf = self._buf
+        self._seq += 1
+        buf[_X] = x
+        buf[_Y] = y
+        buf[_Z] = z
+        buf[_YAW] = yaw
+        buf[_YAW0] = yaw0
+        self._src = source
+        self._seq += 1
+        if self._trail is not None:
+            self._trail_append()
+
+    def snapshot(self, out=None):
+        """
+        (x, y, z, yaw, yaw0) de un mismo instante, sin locks. Con `out` (lista o array de 5) se rellena
+        ese objeto en lugar de crear una tupla.
+        """
+        buf = self._buf
+        while True:
+            seq = self._seq
+            if seq & 1:
+                # Escritura a medias: esperamos a que el escritor suelte el lock
+                with self._wlock:
+                    pass
+                continue
+            if out is None:
+                vals = (buf[_X], buf[_Y], buf[_Z], buf[_YAW], buf[_YAW0])
+            else:
+                out[0], out[1], out[2], out[3], out[4] = buf[_X], buf[_Y], buf[_Z], buf[_YAW], buf[_YAW0]
+                vals = out
+            if self._seq == seq:
+                return vals
+
+    @property
+    def source(self) -> str:
+        # Origen de la última publicación (SRC_COMMAND, SRC_TELEMETRY, SRC_ESTIMATOR o SRC_FIX). Los observadores
+        # lo leen al ser notificados, desde el hilo que acaba de escribir
+        return self._src
+
+    # --- Rastro ---
+
+    @property
+    def trail(self):
+        return self._trail
+
+    def enable_trail(self, capacity: int = 6000):
+        """
+        Empieza a guardar un rastro acotado (t, x, y, z, yaw) con una fila por actualización de la pose.
+        Devuelve el PoseTrail (consultas por tiempo, distancia recorrida y vistas para dibujar). Requiere NumPy.
+        """
+        from TelloLink.modules.tello_history import PoseTrail
+        with self._wlock:
+            if self._trail is None or self._trail.capacity != int(capacity):
+                self._trail = PoseTrail(capacity)
+                self._trail_append()
+            return self._trail
+
+    def disable_trail(self) -> None:
+        with self._wlock:
+            self._trail = None
+
+    def _trail_append(self) -> None:
+        # Llamar con _wlock tomado, justo después de publicar
+        buf = self._buf
+        self._trail.append_pose(time.time(), buf[_X], buf[_Y], buf[_Z], buf[_YAW])
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.snapshot() == other.snapshot()
+
+    __hash__ = None
+
+    def add_listener(self, cb) -> None:
+        # cb(pose) se llama tras cada cambio, desde el hilo que modificó la pose
+        with self._wlock:
+            if cb not in self._listeners:
+                self._listeners = self._listeners + (cb,)
+
+    def remove_listener(self, cb) -> None:
+        with self._wlock:
+            self._listeners = tuple(c for c in self._listeners if c is not cb)
+
+    def _notify(self) -> None:
+        for cb in self._listeners:
+            try:
+                cb(self)
+            except Exception:
+                pass
 
     #Métodos básicos
     def reset(self) -> None:
-        #Reinicia la pose al origen (punto de despegue).
-        self.x_cm = 0.0
-        self.y_cm = 0.0
-        self.z_cm = 0.0
-        self.yaw_deg = 0.0
-        # También reseteamos la referencia
-        self.yaw0_deg = 0.0
+        #Reinicia la pose al origen (punto de despegue) y también la referencia de yaw.
+        # El rastro empieza de nuevo: el salto al origen no es distancia recorrida.
+        with self._wlock:
+            if self._trail is not None:
+                self._trail.clear()
+            self._store(0.0, 0.0, 0.0, 0.0, 0.0)
+        self._notify()
 
     def capture(self) -> dict:
         #Devuelve la pose actual y se redondea a un decimal
+        x, y, z, yaw, _ = self.snapshot()
         return {
-            "x_cm": round(self.x_cm, 1),
-            "y_cm": round(self.y_cm, 1),
-            "z_cm": round(self.z_cm, 1),
-            "yaw_deg": round(self.yaw_deg, 1),
+            "x_cm": round(x, 1),
+            "y_cm": round(y, 1),
+            "z_cm": round(z, 1),
+            "yaw_deg": round(yaw, 1),
         }
 
-    #Llama cuando completa el despegue para fijar la referencia  del vuelo
-    # Deja X=Y=0 en el punto de despegue, Z=altura actual y yaw relativo = 0
-    def set_takeoff_reference(self, height_cm: float | None = None,
-                              yaw_deg: float | None = None) -> None:
-        try:
-            self.x_cm = 0.0
-            self.y_cm = 0.0
-            self.z_cm = float(height_cm) if height_cm is not None else 0.0
-        except Exception:
-            self.z_cm = 0.0
-
-        if yaw_deg is not None:
-            self.yaw0_deg = _wrap_deg(float(yaw_deg))
-
-        self.yaw_deg = 0.0
-
     def set_from_telemetry(self, height_cm: float | None = None,
                            yaw_deg: float | None = None) -> None:
-        if height_cm is not None:
-            self.z_cm = float(height_cm)
-        if yaw_deg is not None:
+        with self._wlock:
+            x, y, z, yaw, yaw0 = self.snapshot()
+            new_z = float(height_cm) if height_cm is not None else z
             # Interpretamos yaw_deg como yaw ABSOLUTO del Tello y lo pasamos a relativo
-            self.set_heading_from_absolute_yaw(float(yaw_deg))
+            new_yaw = self._relative_yaw(float(yaw_deg)) if yaw_deg is not None else yaw
+            # Solo publicamos y notificamos si la telemetría cambió algo (en hover llegan paquetes idénticos)
+            changed = (new_z, new_yaw) != (z, yaw)
+            if changed:
+                self._store(x, y, new_z, new_yaw, yaw0, SRC_TELEMETRY)
+        if changed:
+            self._notify()
 
     def update_yaw(self, delta_deg: float) -> None:
         # Delta relativo (cw positivo) sobre el yaw relativo actual
-        self.yaw_deg = _wrap_deg(self.yaw_deg + float(delta_deg))
+        with self._wlock:
+            x, y, z, yaw, yaw0 = self.snapshot()
+            self._store(x, y, z, _wrap_deg(yaw + float(delta_deg)), yaw0)
+        self._notify()
 
-    def update_move(self, direction: str, dist_cm: float) -> None:
+    def move_delta(self, direction: str, dist_cm: float) -> tuple:
+        # Desplazamiento en el mundo (dx, dy, dz) que produciría un movimiento desde el yaw actual
         d = float(dist_cm)
         yaw = math.radians(self.yaw_deg)  # usamos el yaw RELATIVO
 
         if direction == "forward":
-            self.x_cm += d * math.cos(yaw)
-            self.y_cm += d * math.sin(yaw)
-
-        elif direction == "back":
-            self.x_cm -= d * math.cos(yaw)
-            self.y_cm -= d * math.sin(yaw)
+            return d * math.cos(yaw), d * math.sin(yaw), 0.0
+        if direction == "back":
+            return -d * math.cos(yaw), -d * math.sin(yaw), 0.0
+        if direction == "right":
+            return -d * math.sin(yaw), d * math.cos(yaw), 0.0
+        if direction == "left":
+            return d * math.sin(yaw), -d * math.cos(yaw), 0.0
+        if direction == "up":
+            return 0.0, 0.0, d
+        if direction == "down":
+            return 0.0, 0.0, -d
+        return 0.0, 0.0, 0.0
+
+    def body_delta(self, fwd_cm: float, right_cm: float, up_cm: float = 0.0) -> tuple:
+        # Ejes del dron (adelante, derecha, arriba) -> desplazamiento en el mundo
+        yaw = math.radians(self.yaw_deg)
+        f, r = float(fwd_cm), float(right_cm)
+        return f * math.cos(yaw) - r * math.sin(yaw), f * math.sin(yaw) + r * math.cos(yaw), float(up_cm)
+
+    def _translate(self, dx, dy, dz, source: str = SRC_COMMAND) -> None:
+        # Llamar con _wlock tomado (el delta se calculó con el yaw de esta misma escritura)
+        x, y, z, yaw, yaw0 = self.snapshot()
+        self._store(x + dx, y + dy, z + dz, yaw, yaw0, source)
 
-        elif direction == "right":
-            self.x_cm -= d * math.sin(yaw)
-            self.y_cm += d * math.cos(yaw)
-
-        elif direction == "left":
-            self.x_cm += d * math.sin(yaw)
-            self.y_cm -= d * math.cos(yaw)
-
-        elif direction == "up":
-            self.z_cm += d
-
-        elif direction == "down":
-            self.z_cm -= d
+    def update_move(self, direction: str, dist_cm: float) -> None:
+        with self._wlock:
+            self._translate(*self.move_delta(direction, dist_cm))
+        self._notify()
+
+    def update_go(self, fwd_cm: float, left_cm: float, up_cm: float) -> None:
+        # Desplazamiento de "go x y z" (ejes del SDK: x adelante, y IZQUIERDA, z arriba) en una sola actualización
+        with self._wlock:
+            self._translate(*self.body_delta(fwd_cm, -float(left_cm), up_cm))
+        self._notify()
+
+    def update_from_velocity(self, vx_cm_s: float, vy_cm_s: float, dt_sec: float) -> None:
+        # Velocidad horizontal MEDIDA (marco de la pose) mantenida durante dt; z y yaw los pone la telemetría
+        with self._wlock:
+            self._translate(float(vx_cm_s) * dt_sec, float(vy_cm_s) * dt_sec, 0.0, SRC_TELEMETRY)
+        self._notify()
+
+    def apply_fix(self, x_cm: float, y_cm: float, yaw_deg: float | None = None, weight: float = 1.0,
+                  sigma_cm: float | None = None) -> None:
+        # Posición (y rumbo) absolutos medidos, p.ej. con una mission pad: weight=1 la fija, <1 se acerca.
+        # El rumbo se corrige también en yaw0 para que la telemetría no lo deshaga. sigma_cm: ver PoseEstimator.
+        w = max(0.0, min(1.0, float(weight)))
+        with self._wlock:
+            x, y, z, yaw, yaw0 = self.snapshot()
+            x += w * (float(x_cm) - x)
+            y += w * (float(y_cm) - y)
+            if yaw_deg is not None:
+                d = w * ((float(yaw_deg) - yaw + 180.0) % 360.0 - 180.0)
+                yaw, yaw0 = (yaw + d) % 360.0, (yaw0 - d) % 360.0
+            self._store(x, y, z, yaw, yaw0, SRC_FIX)
+        self._notify()
 
     #Distancia entre una pose y otra
     def distance_to(self, other: "PoseVirtual") -> float:
-        dx = self.x_cm - other.x_cm
-        dy = self.y_cm - other.y_cm
-        dz = self.z_cm - other.z_cm
+        a, b = self.snapshot(), other.snapshot()
+        dx = a[_X] - b[_X]
+        dy = a[_Y] - b[_Y]
+        dz = a[_Z] - b[_Z]
         return math.sqrt(dx*dx + dy*dy + dz*dz)
 
     def set_takeoff_reference(self, yaw_abs_deg: float | None):
-
-        if yaw_abs_deg is None:
-            self.yaw0_deg = 0.0
-        else:
-            self.yaw0_deg = float(yaw_abs_deg) % 360.0
         # Al fijar la referencia, ponemos el yaw relativo a 0 (no tocamos x/y/z)
-        self.yaw_deg = 0.0
-
-    def set_heading_from_absolute_yaw(self, yaw_abs_deg: float):
+        yaw0 = 0.0 if yaw_abs_deg is None else float(yaw_abs_deg) % 360.0
+        with self._wlock:
+            x, y, z, _, _ = self.snapshot()
+            self._store(x, y, z, 0.0, yaw0)
+        self._notify()
 
+    def _relative_yaw(self, yaw_abs_deg: float) -> float:
         abs_norm = float(yaw_abs_deg) % 360.0
         zero = float(self.yaw0_deg or 0.0) % 360.0
-        rel = (abs_norm - zero) % 360.0
-        self.yaw_deg = rel
+        return (abs_norm - zero) % 360.0
+
+    def set_heading_from_absolute_yaw(self, yaw_abs_deg: float):
+        with self._wlock:
+            x, y, z, yaw, yaw0 = self.snapshot()
+            rel = self._relative_yaw(yaw_abs_deg)
+            changed = rel != yaw
+            if changed:
+                self._store(x, y, z, rel, yaw0, SRC_TELEMETRY)
+        if changed:
+            self._notify()
 
 
 
 
     def __repr__(self) -> str:
-        return (f"PoseVirtual(x={self.x_cm:.1f}, y={self.y_cm:.1f}, "
-                f"z={self.z_cm:.1f}, yaw={self.yaw_deg:.1f})")
+        x, y, z, yaw, _ = self.snapshot()
+        return (f"PoseVirtual(x={x:.1f}, y={y:.1f}, "
+                f"z={z:.1f}, yaw={yaw:.1f})")
 
     def update_from_rc(self, vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec=0.1):
-
-        import math
-
-        # Velocidad máxima del Tello (aproximada)
-        MAX_SPEED_CM_S = 100  # cm/s (ajustable según tu dron)
-        MAX_YAW_DEG_S = 100  # grados/s
-
-        # Convertir porcentajes a velocidades reales
-        vx_cm_s = (vx_pct / 100.0) * MAX_SPEED_CM_S
-        vy_cm_s = (vy_pct / 100.0) * MAX_SPEED_CM_S
-        vz_cm_s = (vz_pct / 100.0) * MAX_SPEED_CM_S
-        yaw_deg_s = (yaw_pct / 100.0) * MAX_YAW_DEG_S
-
-        # Calcular desplazamiento en el tiempo dt
-        dx_local = vx_cm_s * dt_sec  # adelante/atrás en sistema local
-        dy_local = vy_cm_s * dt_sec  # izquierda/derecha en sistema local
-        dz = vz_cm_s * dt_sec  # arriba/abajo (absoluto)
-        dyaw = yaw_deg_s * dt_sec  # rotación
-
-        # Convertir movimiento local a coordenadas globales
-        theta = math.radians(self.yaw_deg)
+        with self._wlock:
+            self._rc_store(vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec)
+        self._notify()
+
+    def _rc_store(self, vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec):
+        # Integración de un rc durante dt (con _wlock tomado; el aviso a los observadores lo da quien llama)
+        # Convertir porcentajes a desplazamientos en el tiempo dt (ejes del dron: adelante, derecha, arriba)
+        k = dt_sec / 100.0 * MAX_SPEED_CM_S
+        dx_local = vx_pct * k  # adelante/atrás en sistema local
+        dy_local = vy_pct * k  # izquierda/derecha en sistema local
+        dz = vz_pct * k  # arriba/abajo (absoluto)
+        dyaw = yaw_pct * (dt_sec / 100.0 * MAX_YAW_DEG_S)  # rotación
+
+        x, y, z, yaw, yaw0 = self.snapshot()
+
+        # Convertir movimiento local a coordenadas globales (con el yaw de antes de girar)
+        theta = math.radians(yaw)
         cos_theta = math.cos(theta)
         sin_theta = math.sin(theta)
 
@@ -150,8 +333,69 @@ class PoseVirtual:
         dy_global = dx_local * sin_theta + dy_local * cos_theta
 
         # Actualizar pose
-        self.x_cm += dx_global
-        self.y_cm += dy_global
-        self.z_cm += dz
-        self.yaw_deg = (self.yaw_deg + dyaw) % 360.0
-
+        self._store(x + dx_global, y + dy_global, z + dz, (yaw + dyaw) % 360.0, yaw0)
+
+    def update_from_rc_batch(self, vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec, apply: bool = True):
+        """
+        update_from_rc para N muestras de una vez (arrays o escalares de (adelante, derecha, arriba, yaw) en %
+        y dt en s). Devuelve la trayectoria (N, 4) con (x, y, z, yaw) tras cada muestra, igual que aplicarlas
+        una a una; con apply=True la pose queda en la última (una sola publicación). Requiere NumPy.
+        """
+        try:
+            import numpy as np
+        except Exception:
+            raise RuntimeError("Falta NumPy (pip install numpy)")
+
+        vx, vy, vz, vyaw, dt = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64)).ravel()
+                                                     for v in (vx_pct, vy_pct, vz_pct, yaw_pct, dt_sec)))
+        n = vx.shape[0]
+
+        # Mismas operaciones que update_from_rc, en el mismo orden (las sumas acumuladas son secuenciales)
+        k = dt / 100.0 * MAX_SPEED_CM_S
+        dx_local, dy_local, dz = vx * k, vy * k, vz * k
+        dyaw = vyaw * (dt / 100.0 * MAX_YAW_DEG_S)
+
+        with self._wlock:
+            x0, y0, z0, yaw0_rel, yaw0 = self.snapshot()
+            traj = np.empty((n, 4))
+            if n == 0:
+                return traj
+
+            # Yaw antes de cada muestra: el de partida más los giros anteriores
+            yaw_after = np.cumsum(np.concatenate(([yaw0_rel], dyaw)))
+            theta = np.radians(yaw_after[:-1] % 360.0)
+            cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+            traj[:, 0] = np.cumsum(np.concatenate(([x0], dx_local * cos_theta - dy_local * sin_theta)))[1:]
+            traj[:, 1] = np.cumsum(np.concatenate(([y0], dx_local * sin_theta + dy_local * cos_theta)))[1:]
+            traj[:, 2] = np.cumsum(np.concatenate(([z0], dz)))[1:]
+            traj[:, 3] = yaw_after[1:] % 360.0
+
+            if apply:
+                x, y, z, yaw = (float(v) for v in traj[-1])
+                self._store(x, y, z, yaw, yaw0)
+        if apply:
+            self._notify()
+        return traj
+
+
+# Observadores a nivel de dron: siguen enganchados aunque se sustituya dron.pose por una PoseVirtual nueva
+def watch_pose(owner, cb) -> None:
+    owner._pose_watchers = tuple(w for w in getattr(owner, "_pose_watchers", ()) if w is not cb) + (cb,)
+    sync_pose_watchers(owner)
+
+
+def unwatch_pose(owner, cb) -> None:
+    owner._pose_watchers = tuple(w for w in getattr(owner, "_pose_watchers", ()) if w is not cb)
+    pose = getattr(owner, "pose", None)
+    if pose is not None:
+        pose.remove_listener(cb)
+
+
+def sync_pose_watchers(owner) -> None:
+    # Se llama con cada paquete de estado: engancha los observadores a la pose actual si hace falta
+    pose = getattr(owner, "pose", None)
+    if pose is None:
+        return
+    for cb in getattr(owner, "_pose_watchers", ()):
+        if cb not in pose._listeners:
+            pose.add_listener(cb)
@@ -0,0 +1,339 @@
+import bisect
+import heapq
+import math
+
+# NumPy es opcional: sin él no hay campo de distancias, pero el geofence funciona igual
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Campo de distancias con signo (SDF) del geofence, precalculado en una rejilla.
+#
+# Valor = distancia en cm al borde más cercano del espacio permitido: positiva dentro (zona libre),
+# negativa en violación. Es 2.5D: los rangos de z de las exclusiones parten la altura en bandas y cada banda
+# tiene su rejilla 2D con las exclusiones activas en ella; el suelo/techo de la inclusión se añade como
+# distancia vertical. Las distancias se saturan a ±max_dist_cm, así cada zona solo toca los nodos cercanos.
+
+_DEFAULT_RES_CM = 10.0
+_DEFAULT_MAX_DIST_CM = 300.0
+_BLOCK = 1_000_000  # nodos x lados por bloque al calcular distancias a polígonos
+_PLAN_CELL_CM = 25.0    # celda de la búsqueda A* (la visibilidad se comprueba sobre la rejilla fina)
+_PLAN_CACHE_MAX = 256
+_SQRT2 = math.sqrt(2.0)
+
+
+def _seg_dist(px, py, x1, y1, x2, y2):
+    # Distancia de cada punto (M) a cada lado (E): matriz (M, E)
+    dx, dy = x2 - x1, y2 - y1
+    l2 = dx * dx + dy * dy
+    l2[l2 == 0] = 1e-12
+    t = ((px[:, None] - x1) * dx + (py[:, None] - y1) * dy) / l2
+    np.clip(t, 0.0, 1.0, out=t)
+    ex = px[:, None] - (x1 + t * dx)
+    ey = py[:, None] - (y1 + t * dy)
+    return np.sqrt(ex * ex + ey * ey)
+
+
+class GeofenceSDF:
+    """Rejillas de distancia con signo por banda de altura, con consultas bilineales O(1)."""
+
+    def __init__(self, compiled, limits, center, res_cm: float = _DEFAULT_RES_CM,
+                 max_dist_cm: float = _DEFAULT_MAX_DIST_CM):
+        if np is None:
+            raise RuntimeError("Falta NumPy (pip install numpy)")
+        self.res = float(res_cm)
+        self.max_dist = float(max_dist_cm)
+        self._comp = compiled
+        self._limits = dict(limits or {})
+        self._center = (float(center[0]), float(center[1]))
+        self._plans = {}
+        max_z = float(self._limits.get("max_z", 0.0) or 0.0)
+        self._zspan = (float(self._limits.get("zmin", 0.0) or 0.0), max_z) if max_z > 0 else None
+        self._setup_extent()
+        self._setup_bands()
+
+    # --- Construcción ---
+
+    def _box(self):
+        lim = self._limits
+        cx, cy = self._center
+        hx = float(lim.get("max_x", 0.0) or 0.0) / 2.0
+        hy = float(lim.get("max_y", 0.0) or 0.0) / 2.0
+        return (cx - hx, cy - hy, cx + hx, cy + hy) if hx > 0 and hy > 0 else None
+
+    def _setup_extent(self):
+        box = self._box()
+        comp = self._comp
+        boxes = [b for b in (comp.poly_bbox, comp.circ_bbox) if b.shape[0]] if comp is not None else []
+        if box is not None:
+            x0, y0, x1, y1 = box
+        elif boxes:
+            allb = np.vstack(boxes)
+            x0, y0 = allb[:, 0].min(), allb[:, 1].min()
+            x1, y1 = allb[:, 2].max(), allb[:, 3].max()
+        else:
+            x0 = y0 = x1 = y1 = 0.0
+        m = self.max_dist + self.res
+        self.x0, self.y0 = x0 - m, y0 - m
+        self.nx = int(math.ceil((x1 - x0 + 2 * m) / self.res)) + 1
+        self.ny = int(math.ceil((y1 - y0 + 2 * m) / self.res)) + 1
+        self._gx = self.x0 + self.res * np.arange(self.nx)
+        self._gy = self.y0 + self.res * np.arange(self.ny)
+
+    def _setup_bands(self):
+        comp = self._comp
+        zr = [] if comp is None else [comp.poly_z, comp.circ_z]
+        cuts = sorted({float(v) for a in zr for v in a.ravel() if math.isfinite(v)})
+        self._cuts = cuts
+        # Banda i = [cuts[i-1], cuts[i]); para cada banda, qué zonas están activas (por su punto medio)
+        if cuts:
+            mids = [cuts[0] - 1.0] + [(a + b) / 2.0 for a, b in zip(cuts[:-1], cuts[1:])] + [cuts[-1] + 1.0]
+        else:
+            mids = [0.0]
+        grids = {}
+        self._band_grid = []
+        for zm in mids:
+            key = self._active(zm)
+            if key not in grids:
+                grids[key] = self._build(*key)
+            self._band_grid.append(grids[key])
+
+    def _active(self, z):
+        comp = self._comp
+        if comp is None:
+            return (), ()
+        polys = tuple(int(k) for k in np.flatnonzero((comp.poly_z[:, 0] <= z) & (z <= comp.poly_z[:, 1])))
+        circs = tuple(int(k) for k in np.flatnonzero((comp.circ_z[:, 0] <= z) & (z <= comp.circ_z[:, 1])))
+        return polys, circs
+
+    def _window(self, bbox):
+        # Índices de los nodos a menos de max_dist de una caja
+        m = self.max_dist
+        i0 = max(0, int(math.floor((bbox[0] - m - self.x0) / self.res)))
+        i1 = min(self.nx, int(math.ceil((bbox[2] + m - self.x0) / self.res)) + 1)
+        j0 = max(0, int(math.floor((bbox[1] - m - self.y0) / self.res)))
+        j1 = min(self.ny, int(math.ceil((bbox[3] + m - self.y0) / self.res)) + 1)
+        return i0, i1, j0, j1
+
+    def _build(self, polys, circs):
+        # grid[j, i] = distancia con signo en el nodo (x0 + i·res, y0 + j·res)
+        md = self.max_dist
+        grid = np.full((self.ny, self.nx), md, dtype=np.float32)
+
+        box = self._box()
+        if box is not None:
+            gx, gy = np.meshgrid(self._gx, self._gy)
+            inside = np.minimum(np.minimum(gx - box[0], box[2] - gx), np.minimum(gy - box[1], box[3] - gy))
+            ox = np.maximum(np.maximum(box[0] - gx, gx - box[2]), 0.0)
+            oy = np.maximum(np.maximum(box[1] - gy, gy - box[3]), 0.0)
+            d = np.where(inside >= 0, inside, -np.sqrt(ox * ox + oy * oy))
+            np.minimum(grid, np.clip(d, -md, md), out=grid)
+
+        comp = self._comp
+        for k in circs:
+            i0, i1, j0, j1 = self._window(comp.circ_bbox[k])
+            if i0 >= i1 or j0 >= j1:
+                continue
+            gx, gy = np.meshgrid(self._gx[i0:i1], self._gy[j0:j1])
+            cx, cy = comp.circ_c[k]
+            d = np.hypot(gx - cx, gy - cy) - math.sqrt(max(comp.circ_r2[k] - 1e-6, 0.0))
+            sub = grid[j0:j1, i0:i1]
+            np.minimum(sub, np.clip(d, -md, md), out=sub)
+
+        for k in polys:
+            s, e = int(comp.poly_off[k]), int(comp.poly_off[k + 1])
+            if e - s < 3:
+                continue
+            i0, i1, j0, j1 = self._window(comp.poly_bbox[k])
+            if i0 >= i1 or j0 >= j1:
+                continue
+            gx, gy = np.meshgrid(self._gx[i0:i1], self._gy[j0:j1])
+            px, py = gx.ravel(), gy.ravel()
+            d = np.empty(px.shape[0])
+            block = max(1, _BLOCK // (e - s))
+            for b in range(0, px.shape[0], block):
+                d[b:b + block] = _seg_dist(px[b:b + block], py[b:b + block], comp.x[s:e], comp.y[s:e],
+                                           comp.x_next[s:e], comp.y_next[s:e]).min(axis=1)
+            d[comp.poly_contains_many(k, px, py)] *= -1.0
+            sub = grid[j0:j1, i0:i1]
+            np.minimum(sub, np.clip(d, -md, md).reshape(sub.shape), out=sub)
+        return grid
+
+    # --- Consultas ---
+
+    def lookup(self, x: float, y: float, z: float):
+        """(distancia, gx, gy, gz): distancia con signo en cm y su gradiente (hacia donde aumenta)."""
+        grid = self._band_grid[bisect.bisect_right(self._cuts, z)]
+        fx = min(max((x - self.x0) / self.res, 0.0), self.nx - 1.000001)
+        fy = min(max((y - self.y0) / self.res, 0.0), self.ny - 1.000001)
+        i, j = int(fx), int(fy)
+        tx, ty = fx - i, fy - j
+        v00, v10 = float(grid[j, i]), float(grid[j, i + 1])
+        v01, v11 = float(grid[j + 1, i]), float(grid[j + 1, i + 1])
+        d = (v00 * (1 - tx) + v10 * tx) * (1 - ty) + (v01 * (1 - tx) + v11 * tx) * ty
+        gx = ((v10 - v00) * (1 - ty) + (v11 - v01) * ty) / self.res
+        gy = ((v01 - v00) * (1 - tx) + (v11 - v10) * tx) / self.res
+        if self._zspan is not None:
+            # Suelo/techo de la inclusión
+            zmin, max_z = self._zspan
+            if z - zmin < d and z - zmin <= max_z - z:
+                return z - zmin, 0.0, 0.0, 1.0
+            if max_z - z < d:
+                return max_z - z, 0.0, 0.0, -1.0
+        return d, gx, gy, 0.0
+
+    def distance(self, x: float, y: float, z: float) -> float:
+        return self.lookup(x, y, z)[0]
+
+    # --- Planificador ---
+
+    def _grid_between(self, z0, z1):
+        # Peor caso (mínimo) de las bandas que atraviesa un tramo que sube o baja de z0 a z1
+        a = bisect.bisect_right(self._cuts, min(z0, z1))
+        b = bisect.bisect_right(self._cuts, max(z0, z1))
+        grids = {id(g): g for g in self._band_grid[a:b + 1]}
+        if len(grids) == 1:
+            return next(iter(grids.values()))
+        return np.minimum.reduce(list(grids.values()))
+
+    def _sample(self, grid, xs, ys):
+        # Interpolación bilineal vectorizada (sin gradiente)
+        fx = np.clip((xs - self.x0) / self.res, 0.0, self.nx - 1.000001)
+        fy = np.clip((ys - self.y0) / self.res, 0.0, self.ny - 1.000001)
+        i, j = fx.astype(np.int64), fy.astype(np.int64)
+        tx, ty = fx - i, fy - j
+        return ((grid[j, i] * (1 - tx) + grid[j, i + 1] * tx) * (1 - ty)
+                + (grid[j + 1, i] * (1 - tx) + grid[j + 1, i + 1] * tx) * ty)
+
+    @staticmethod
+    def _required(xs, ys, lim):
+        # Holgura exigida en cada punto: la completa salvo en el entorno (radio r) de una salida o llegada
+        # que ya está más cerca de un borde, donde basta la que tiene ese extremo
+        c, r, ends = lim
+        req = np.full(np.shape(xs), c)
+        for ex, ey, ce in ends:
+            if ce < c:
+                req = np.where(np.hypot(xs - ex, ys - ey) <= r, np.minimum(req, ce), req)
+        return req
+
+    def _visible(self, grid, a, b, lim):
+        # ¿El segmento a -> b mantiene la holgura exigida (_required) a cualquier borde?
+        n = max(2, int(math.ceil(math.hypot(b[0] - a[0], b[1] - a[1]) / (self.res / 2.0))) + 1)
+        t = np.linspace(0.0, 1.0, n)
+        xs, ys = a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1])
+        return bool(np.all(self._sample(grid, xs, ys) >= self._required(xs, ys, lim)))
+
+    def _astar(self, grid, a, b, lim):
+        # A* 8-conexo sobre una submuestra de la rejilla; devuelve la lista de puntos (x, y) o None
+        stride = max(1, int(round(_PLAN_CELL_CM / self.res)))
+        gx, gy = np.meshgrid(self._gx[::stride], self._gy[::stride])
+        free = grid[::stride, ::stride] >= self._required(gx, gy, lim)
+        h, w = free.shape
+        step = self.res * stride
+
+        def cell(p):
+            i = min(w - 1, max(0, int(round((p[0] - self.x0) / step))))
+            j = min(h - 1, max(0, int(round((p[1] - self.y0) / step))))
+            return i, j
+
+        start, goal = cell(a), cell(b)
+        # La celda de salida/llegada puede caer junto a un borde: se admiten aunque no cumplan la holgura
+        free[start[1], start[0]] = free[goal[1], goal[0]] = True
+        gi, gj = goal
+
+        def heur(i, j):
+            di, dj = abs(i - gi), abs(j - gj)
+            return max(di, dj) + (_SQRT2 - 1.0) * min(di, dj)
+
+        g = {start: 0.0}
+        parent = {start: None}
+        heap = [(heur(*start), 0.0, start)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if cost > g[node]:
+                continue
+            i, j = node
+            for di, dj, c in ((1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+                              (1, 1, _SQRT2), (1, -1, _SQRT2), (-1, 1, _SQRT2), (-1, -1, _SQRT2)):
+                ni, nj = i + di, j + dj
+                if not (0 <= ni < w and 0 <= nj < h) or not free[nj, ni]:
+                    continue
+                if di and dj and not (free[j, ni] and free[nj, i]):
+                    continue  # sin cortar esquinas
+                nc = cost + c
+                if nc < g.get((ni, nj), math.inf):
+                    g[(ni, nj)] = nc
+                    parent[(ni, nj)] = node
+                    heapq.heappush(heap, (nc + heur(ni, nj), nc, (ni, nj)))
+        if goal not in parent:
+            return None
+        cells = []
+        node = goal
+        while node is not None:
+            cells.append(node)
+            node = parent[node]
+        cells.reverse()
+        return [a] + [(self.x0 + i * step, self.y0 + j * step) for i, j in cells[1:-1]] + [b]
+
+    def _smooth(self, grid, pts, lim):
+        # Visibilidad: desde cada punto saltamos al más lejano que se ve en línea recta
+        out = [pts[0]]
+        i = 0
+        while i < len(pts) - 1:
+            j = len(pts) - 1
+            while j > i + 1 and not self._visible(grid, pts[i], pts[j], lim):
+                j -= 1
+            out.append(pts[j])
+            i = j
+        return out
+
+    def plan(self, p0, p1, clearance_cm: float):
+        """
+        Ruta de p0 a p1 (x, y, z) que mantiene `clearance_cm` a los bordes del geofence, como lista mínima de
+        puntos de paso [(x, y, z), ...] sin p0 y terminando en p1; None si no hay ruta. La z varía linealmente
+        a lo largo del recorrido y se evita lo que haya en todas las bandas de altura entre z0 y z1.
+        Una salida o llegada más cerca de un borde que `clearance_cm` solo relaja la holgura en su entorno.
+        """
+        p0 = tuple(float(v) for v in p0)
+        p1 = tuple(float(v) for v in p1)
+        grid = self._grid_between(p0[2], p1[2])
+        a, b = p0[:2], p1[:2]
+        d0 = float(self._sample(grid, np.array([a[0]]), np.array([a[1]]))[0])
+        d1 = float(self._sample(grid, np.array([b[0]]), np.array([b[1]]))[0])
+        if d0 <= 0 or d1 <= 0:
+            return None  # salida o llegada en violación
+        # Si salimos o llegamos junto a un borde, la holgura exigida no puede ser mayor que la que ya hay, pero
+        # solo hasta alejarse de ese extremo (radio = holgura + una celda de A*); el resto de la ruta mantiene
+        # la holgura completa
+        c = float(clearance_cm) - 1e-3
+        ends = ((a[0], a[1], min(c, d0 - 1e-3)), (b[0], b[1], min(c, d1 - 1e-3)))
+        lim = (c, float(clearance_cm) + _PLAN_CELL_CM, ends)
+        if self._visible(grid, a, b, lim):
+            return [p1]
+
+        q = self.res
+        key = (round(a[0] / q), round(a[1] / q), round(b[0] / q), round(b[1] / q),
+               round(p0[2] / q), round(p1[2] / q), round(c / q))
+        xy = self._plans.get(key)
+        if xy is None or (len(xy) > 1 and not self._visible(grid, a, xy[1], lim)):
+            raw = self._astar(grid, a, b, lim)
+            if raw is None:
+                return None
+            xy = self._smooth(grid, raw, lim)
+            if len(self._plans) >= _PLAN_CACHE_MAX:
+                self._plans.clear()
+            self._plans[key] = xy
+        pts = [a] + list(xy[1:-1]) + [b]
+
+        # z lineal con la distancia recorrida
+        seg = [math.hypot(q1[0] - q0[0], q1[1] - q0[1]) for q0, q1 in zip(pts[:-1], pts[1:])]
+        total = sum(seg) or 1.0
+        out, acc = [], 0.0
+        for (x, y), s in zip(pts[1:], seg):
+            acc += s
+            out.append((x, y, p0[2] + (p1[2] - p0[2]) * acc / total))
+        out[-1] = p1
+        return out
@@ -0,0 +1,389 @@
+import math
+import socket
+import threading
+import time
+
+# Simulador del protocolo SDK de Tello sobre UDP (loopback) para tests y benchmarks sin dron.
+# Uso típico:
+#     sim = TelloSimulator(port=9889).start()
+#     dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port)
+
+# Cinemática simplificada
+_DEFAULT_SPEED_CM_S = 50.0     # velocidad de 'forward', 'up', etc. (comando 'speed' la cambia)
+_YAW_RATE_DEG_S = 90.0         # velocidad de giro cw/ccw
+_RC_MAX_CM_S = 100.0           # rc 100 -> 100 cm/s (mismo supuesto que PoseVirtual.update_from_rc)
+_RC_MAX_YAW_DEG_S = 100.0
+_TAKEOFF_HEIGHT_CM = 80.0
+_ACK_DELAY_S = 0.05            # latencia de respuesta de cada comando
+_STATE_HZ = 10.0
+_TICK_S = 0.02
+
+# Batería (% por segundo)
+_DRAIN_IDLE = 0.002
+_DRAIN_FLYING = 0.1
+
+# Mission pads: se ven (hacia abajo) dentro de este radio horizontal y entre estas alturas
+_PAD_RANGE_CM = 60.0
+_PAD_Z_RANGE_CM = (30.0, 300.0)
+
+_MOVE_VERBS = {"forward": (1, 0, 0), "back": (-1, 0, 0), "right": (0, 1, 0),
+               "left": (0, -1, 0), "up": (0, 0, 1), "down": (0, 0, -1)}
+
+
+def _wrap_180(deg: float) -> float:
+    d = (deg + 180.0) % 360.0 - 180.0
+    return d
+
+
+class TelloSimulator:
+    """
+    Dron virtual que habla el protocolo de texto del SDK en `port`, envía paquetes de estado al
+    puerto `state_port` del cliente y, opcionalmente, un vídeo H.264 sintético a `video_port`.
+    `time_scale` > 1 acelera la simulación (movimientos y batería) para benchmarks.
+    `pads` ({mid: (x, y, yaw)} en el marco del simulador) coloca mission pads, que se reportan tras "mon".
+    `move_error` (p.ej. 0.05) hace que los movimientos recorran un 5 % más de lo ordenado (deriva de la estima).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8889, state_port: int = 8890,
+                 video_port: int | None = None, time_scale: float = 1.0, battery_pct: float = 100.0,
+                 ack_delay_s: float = _ACK_DELAY_S, pads: dict | None = None, move_error: float = 0.0):
+        self.host = host
+        self.port = int(port)
+        self.state_port = int(state_port)
+        self.video_port = video_port
+        self.time_scale = max(1e-3, float(time_scale))
+        self.ack_delay_s = float(ack_delay_s)
+        self.pads = dict(pads or {})
+        self.move_error = float(move_error)
+        self.mission_pads = False
+
+        # Estado físico (marco del despegue: x adelante, y derecha, z arriba, yaw cw)
+        self.x_cm = 0.0
+        self.y_cm = 0.0
+        self.z_cm = 0.0
+        self.yaw_deg = 0.0
+        self.vx_cm_s = 0.0
+        self.vy_cm_s = 0.0
+        self.vz_cm_s = 0.0
+        self.battery_pct = float(battery_pct)
+        self.flying = False
+        self.flight_time_s = 0.0
+        self.speed_cm_s = _DEFAULT_SPEED_CM_S
+        self.streaming = False
+
+        self._rc = (0, 0, 0, 0)
+        self._client = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._sock = None
+        self._threads = []
+
+        # Historial de comandos recibidos (útil para asserts en tests)
+        self.commands = []
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self._sock.settimeout(0.2)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        for target in (self._command_loop, self._physics_loop, self._state_loop, self._video_loop):
+            th = threading.Thread(target=target, daemon=True)
+            th.start()
+            self._threads.append(th)
+        print(f"[sim] Tello simulado en {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self._running = False
+        for th in self._threads:
+            th.join(timeout=1.0)
+        self._threads = []
+        try:
+            self._sock.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Bucles ---
+
+    def _command_loop(self):
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            cmd = data.decode("utf-8", errors="ignore").strip()
+            self._client = addr
+            self.commands.append(cmd)
+            if cmd.startswith("rc "):
+                self._handle_rc(cmd)
+                continue
+            time.sleep(self.ack_delay_s / self.time_scale)
+            try:
+                resp = self._handle(cmd)
+            except Exception as e:
+                resp = f"error {e}"
+            if resp is not None:
+                try:
+                    self._sock.sendto(resp.encode("utf-8"), addr)
+                except OSError:
+                    break
+
+    def _physics_loop(self):
+        last = time.time()
+        while self._running:
+            time.sleep(_TICK_S)
+            now = time.time()
+            dt = (now - last) * self.time_scale
+            last = now
+            with self._lock:
+                self.battery_pct = max(0.0, self.battery_pct - dt * (_DRAIN_FLYING if self.flying else _DRAIN_IDLE))
+                if not self.flying:
+                    continue
+                self.flight_time_s += dt
+                a, b, c, d = self._rc
+                if (a, b, c, d) != (0, 0, 0, 0):
+                    # rc a b c d = izquierda/derecha, adelante/atrás, arriba/abajo, yaw
+                    fwd = b / 100.0 * _RC_MAX_CM_S
+                    right = a / 100.0 * _RC_MAX_CM_S
+                    self._set_body_velocity(fwd, right, c / 100.0 * _RC_MAX_CM_S)
+                    self._integrate(dt)
+                    self.yaw_deg = (self.yaw_deg + d / 100.0 * _RC_MAX_YAW_DEG_S * dt) % 360.0
+
+    def _state_loop(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            while self._running:
+                time.sleep(1.0 / _STATE_HZ)
+                if self._client is None:
+                    continue
+                try:
+                    sock.sendto(self.state_packet().encode("ascii"), (self._client[0], self.state_port))
+                except OSError:
+                    pass
+        finally:
+            sock.close()
+
+    def _video_loop(self):
+        if self.video_port is None:
+            return
+        try:
+            import av
+            import numpy as np
+        except Exception:
+            print("[sim] Vídeo sintético desactivado (faltan 'av' y/o 'numpy').")
+            return
+
+        w, h, fps = 320, 240, 30
+        codec = None
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        n = 0
+        try:
+            while self._running:
+                time.sleep(1.0 / fps)
+                if not self.streaming or self._client is None:
+                    codec = None
+                    continue
+                if codec is None:
+                    codec = av.CodecContext.create("libx264", "w")
+                    codec.width, codec.height, codec.pix_fmt = w, h, "yuv420p"
+                    codec.framerate = fps
+                    codec.options = {"tune": "zerolatency", "preset": "ultrafast",
+                                     "x264-params": "keyint=30:repeat-headers=1"}  # el cliente puede unirse tarde
+                # Degradado que se desplaza con el yaw y la altura
+                img = np.zeros((h, w, 3), dtype=np.uint8)
+                img[:, :, 0] = (np.arange(w, dtype=np.uint16) + int(self.yaw_deg) + n) % 256
+                img[:, :, 1] = int(self.z_cm) % 256
+                frame = av.VideoFrame.from_ndarray(img, format="rgb24")
+                for pkt in codec.encode(frame):
+                    raw = bytes(pkt)
+                    for i in range(0, len(raw), 1460):
+                        sock.sendto(raw[i:i + 1460], (self._client[0], int(self.video_port)))
+                n += 1
+        finally:
+            sock.close()
+
+    # --- Cinemática ---
+
+    def _set_body_velocity(self, fwd, right, up):
+        th = math.radians(self.yaw_deg)
+        self.vx_cm_s = fwd * math.cos(th) - right * math.sin(th)
+        self.vy_cm_s = fwd * math.sin(th) + right * math.cos(th)
+        self.vz_cm_s = up
+
+    def _integrate(self, dt):
+        self.x_cm += self.vx_cm_s * dt
+        self.y_cm += self.vy_cm_s * dt
+        self.z_cm = max(0.0, self.z_cm + self.vz_cm_s * dt)
+
+    def _fly_body(self, fwd_cm, right_cm, up_cm, speed):
+        # Movimiento lineal a velocidad constante; responde al terminar (como el Tello real)
+        dist = math.sqrt(fwd_cm * fwd_cm + right_cm * right_cm + up_cm * up_cm)
+        if dist <= 0:
+            return
+        duration = dist / float(speed)
+        k = 1.0 + self.move_error
+        with self._lock:
+            self._set_body_velocity(k * fwd_cm / duration, k * right_cm / duration, up_cm / duration)
+        t_end = time.time() + duration / self.time_scale
+        last = time.time()
+        while True:
+            now = time.time()
+            step = min(now, t_end) - last
+            last = now
+            with self._lock:
+                self._integrate(step * self.time_scale)
+            if now >= t_end:
+                break
+            time.sleep(_TICK_S)
+        with self._lock:
+            self.vx_cm_s = self.vy_cm_s = self.vz_cm_s = 0.0
+
+    def _turn(self, deg):
+        time.sleep(abs(deg) / _YAW_RATE_DEG_S / self.time_scale)
+        with self._lock:
+            self.yaw_deg = (self.yaw_deg + deg) % 360.0
+
+    # --- Protocolo ---
+
+    def _handle_rc(self, cmd):
+        try:
+            a, b, c, d = (max(-100, min(100, int(v))) for v in cmd.split()[1:5])
+        except Exception:
+            return
+        with self._lock:
+            self._rc = (a, b, c, d)
+            if (a, b, c, d) == (0, 0, 0, 0):
+                self.vx_cm_s = self.vy_cm_s = self.vz_cm_s = 0.0
+
+    def _handle(self, cmd):
+        parts = cmd.split()
+        if not parts:
+            return "error"
+        verb, args = parts[0], parts[1:]
+
+        if verb in ("command", "mdirection"):
+            return "ok"
+        if verb in ("mon", "moff"):
+            self.mission_pads = verb == "mon"
+            return "ok"
+        if verb == "streamon":
+            self.streaming = True
+            return "ok"
+        if verb == "streamoff":
+            self.streaming = False
+            return "ok"
+        if verb.endswith("?"):
+            return self._query(verb[:-1])
+        if verb == "speed":
+            v = int(args[0])
+            if not 10 <= v <= 100:
+                return "error"
+            self.speed_cm_s = float(v)
+            return "ok"
+        if verb == "takeoff":
+            if self.battery_pct < 10:
+                return "error battery low"
+            if not self.flying:
+                self.flying = True
+                self._fly_body(0, 0, _TAKEOFF_HEIGHT_CM - self.z_cm, self.speed_cm_s)
+            return "ok"
+        if verb in ("land", "emergency"):
+            if self.flying and verb == "land":
+                self._fly_body(0, 0, -self.z_cm, self.speed_cm_s)
+            with self._lock:
+                self.flying = False
+                self.z_cm = 0.0
+                self._rc = (0, 0, 0, 0)
+            return "ok"
+        if verb == "stop":
+            with self._lock:
+                self._rc = (0, 0, 0, 0)
+                self.vx_cm_s = self.vy_cm_s = self.vz_cm_s = 0.0
+            return "ok"
+
+        if not self.flying:
+            return "error Not flying"
+
+        if verb in _MOVE_VERBS:
+            d = int(args[0])
+            if not 20 <= d <= 500:
+                return "error"
+            f, r, u = _MOVE_VERBS[verb]
+            self._fly_body(f * d, r * d, u * d, self.speed_cm_s)
+            return "ok"
+        if verb in ("cw", "ccw"):
+            d = int(args[0])
+            if not 1 <= d <= 360:
+                return "error"
+            self._turn(d if verb == "cw" else -d)
+            return "ok"
+        if verb == "go":
+            # go x y z speed: x adelante, y IZQUIERDA, z arriba (convención del SDK)
+            x, y, z, v = (int(a) for a in args[:4])
+            if max(abs(x), abs(y), abs(z)) > 500 or not 10 <= v <= 100:
+                return "error"
+            if abs(x) <= 20 and abs(y) <= 20 and abs(z) <= 20:
+                return "error"
+            self._fly_body(x, -y, z, v)
+            return "ok"
+        return "error Unknown command"
+
+    def _query(self, what):
+        if what == "battery":
+            return str(int(self.battery_pct))
+        if what == "speed":
+            return str(int(self.speed_cm_s))
+        if what == "time":
+            return f"{int(self.flight_time_s)}s"
+        if what == "height":
+            return f"{int(round(self.z_cm / 10.0))}dm"
+        if what == "wifi":
+            return "90"
+        return "error"
+
+    def _pad_fields(self) -> str:
+        # mid;x;y;z;mpry del pad más cercano bajo el dron (x hacia la cabeza del pad, y a la izquierda)
+        none = "mid:-1;x:0;y:0;z:0;mpry:0,0,0;"
+        if not (self.mission_pads and self.flying and self.pads):
+            return none
+        if not _PAD_Z_RANGE_CM[0] <= self.z_cm <= _PAD_Z_RANGE_CM[1]:
+            return none
+        mid, (px, py, pyaw) = min(self.pads.items(),
+                                  key=lambda kv: math.hypot(self.x_cm - kv[1][0], self.y_cm - kv[1][1]))
+        dx, dy = self.x_cm - px, self.y_cm - py
+        if math.hypot(dx, dy) > _PAD_RANGE_CM:
+            return none
+        th = math.radians(pyaw)
+        fx = dx * math.cos(th) + dy * math.sin(th)
+        right = -dx * math.sin(th) + dy * math.cos(th)
+        yaw_rel = _wrap_180(self.yaw_deg - pyaw)
+        return (f"mid:{mid};x:{int(round(fx))};y:{int(round(-right))};z:{int(round(self.z_cm))};"
+                f"mpry:0,0,{int(round(yaw_rel))};")
+
+    def state_packet(self) -> str:
+        with self._lock:
+            pads = self._pad_fields()
+            z = self.z_cm
+            yaw = _wrap_180(self.yaw_deg)
+            # Velocidades en dm/s en el marco del despegue (como las reporta el firmware); vgz positivo = bajando
+            vgx = int(round(self.vx_cm_s / 10.0))
+            vgy = int(round(self.vy_cm_s / 10.0))
+            vgz = int(round(-self.vz_cm_s / 10.0))
+            bat = int(self.battery_pct)
+            t = int(self.flight_time_s)
+        tof = int(max(10.0, z + 10.0)) if self.flying else 10
+        baro = 100.0 + z / 100.0
+        return (f"{pads}pitch:0;roll:0;yaw:{int(round(yaw))};"
+                f"vgx:{vgx};vgy:{vgy};vgz:{vgz};templ:60;temph:62;tof:{tof};h:{int(round(z))};"
+                f"bat:{bat};baro:{baro:.2f};time:{t};agx:0.00;agy:0.00;agz:-1000.00;\r\n")
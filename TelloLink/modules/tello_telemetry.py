@@ -1,136 +1,417 @@
+import asyncio
 import threading
 import time
 
 # Intentamos importar la PoseVirtual (opcional: si no existe no se rompe)
 try:
-    from TelloLink.modules.tello_pose import PoseVirtual
+    from TelloLink.modules.tello_pose import PoseVirtual, sync_pose_watchers
 except Exception:
     PoseVirtual = None
+    sync_pose_watchers = None
+
+from TelloLink.modules.tello_blackbox import _record_state
+from TelloLink.modules.tello_pads import _pad_correct
+from TelloLink.modules.tello_geofence import _gf_begin_packet, _gf_end_packet
+
+# El Tello envía un paquete de estado (~10 Hz) al puerto 8890. La telemetría se actualiza al llegar cada paquete:
+#  - backend asyncio: el transporte nos llama con cada paquete (add_state_listener)
+#  - backend djitellopy: su hilo receptor guarda cada paquete en djitellopy.tello.drones[ip]["state"];
+#    sustituimos esa entrada por una que marca un Event al guardar, y el hilo de telemetría espera en él
+_STATE_RATE_HZ = 10.0
+_STATE_WATCH_S = 0.5 / _STATE_RATE_HZ      # sin el gancho (otra versión de djitellopy): sondeo a 2x el ritmo de estado
+
+# Tipos de cada campo del paquete de estado ("clave:valor;" ...)
+_INT_FIELDS = ("mid", "x", "y", "z", "pitch", "roll", "yaw", "vgx", "vgy", "vgz",
+               "templ", "temph", "tof", "h", "bat", "time")
+_FLOAT_FIELDS = ("baro", "agx", "agy", "agz")
+_CONVERTERS = dict.fromkeys(_INT_FIELDS, int)
+_CONVERTERS.update(dict.fromkeys(_FLOAT_FIELDS, float))
+
+# Campo del paquete -> atributo tipado en TelloDron (unidades tal y como las envía el Tello)
+_STATE_ATTRS = (
+    ("pitch", "pitch_deg"), ("roll", "roll_deg"),
+    ("vgx", "vgx"), ("vgy", "vgy"), ("vgz", "vgz"),            # dm/s
+    ("agx", "agx"), ("agy", "agy"), ("agz", "agz"),            # milésimas de g
+    ("tof", "tof_cm"), ("baro", "baro_m"),
+    ("templ", "templ_c"), ("temph", "temph_c"),
+)
+
+
+class TelemetrySnapshot:
+    """
+    Foto inmutable de la telemetría (y la pose) en un instante. Se publica sustituyendo la referencia
+    self._telemetry_snap de una vez, así quien la lee ve siempre valores de la misma época sin locks.
+    """
+    __slots__ = ("seq", "ts", "state",
+                 "height_cm", "battery_pct", "temp_c", "flight_time_s", "yaw_deg",
+                 "pitch_deg", "roll_deg", "vgx", "vgy", "vgz", "agx", "agy", "agz",
+                 "tof_cm", "baro_m", "templ_c", "temph_c",
+                 "x_cm", "y_cm", "z_cm", "pose_yaw_deg")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TelemetrySnapshot es inmutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("TelemetrySnapshot es inmutable")
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"TelemetrySnapshot(seq={self.seq}, h={self.height_cm}, bat={self.battery_pct}, "
+                f"pose=({self.x_cm}, {self.y_cm}, {self.z_cm}, {self.pose_yaw_deg}))")
+
+
+_EMPTY_SNAPSHOT = TelemetrySnapshot(seq=0)
+
+# Atributos de TelloDron copiados en cada snapshot (el wifi no viaja en el paquete de estado: solo con "wifi?")
+_SNAP_ATTRS = ("state", "height_cm", "battery_pct", "temp_c", "flight_time_s", "yaw_deg",
+               "pitch_deg", "roll_deg", "vgx", "vgy", "vgz", "agx", "agy", "agz",
+               "tof_cm", "baro_m", "templ_c", "temph_c")
+
+
+def _publish_snapshot(self, ts: float):
+    # Construye la snapshot nueva y la publica con una única asignación
+    values = {name: getattr(self, name, None) for name in _SNAP_ATTRS}
+    pose = getattr(self, "pose", None)
+    if pose is not None:
+        # Los cuatro campos de un mismo instante (la pose se escribe desde otros hilos)
+        values["x_cm"], values["y_cm"], values["z_cm"], values["pose_yaw_deg"], _ = pose.snapshot()
+    prev = getattr(self, "_telemetry_snap", None) or _EMPTY_SNAPSHOT
+    values["seq"] = prev.seq + 1
+    values["ts"] = ts
+    snap = TelemetrySnapshot(**values)
+    self._telemetry_snap = snap
+    return snap
+
+
+def telemetry(self) -> TelemetrySnapshot:
+    # Última snapshot publicada (seq=0 y campos a None si aún no ha llegado ningún paquete)
+    return getattr(self, "_telemetry_snap", None) or _EMPTY_SNAPSHOT
+
+
+class _Subscription:
+    __slots__ = ("callback", "fields", "min_dt", "min_delta", "last_ts", "last_vals")
+
+    def __init__(self, callback, fields, max_hz, min_delta):
+        self.callback = callback
+        self.fields = tuple(fields) if fields else None
+        self.min_dt = 1.0 / float(max_hz) if max_hz else 0.0
+        self.min_delta = float(min_delta or 0.0)
+        self.last_ts = None
+        self.last_vals = None
+
+    def wants(self, snap) -> bool:
+        # Límite de frecuencia por suscriptor
+        if self.last_ts is not None and snap.ts is not None and snap.ts - self.last_ts < self.min_dt:
+            return False
+        if self.fields is None or self.last_vals is None:
+            return True
+        # Solo si algún campo pedido cambió más que el umbral
+        for name, old in zip(self.fields, self.last_vals):
+            new = getattr(snap, name)
+            if new == old:
+                continue
+            if isinstance(new, (int, float)) and isinstance(old, (int, float)):
+                if abs(new - old) > self.min_delta:
+                    return True
+            else:
+                return True
+        return False
 
+    def mark(self, snap):
+        self.last_ts = snap.ts
+        if self.fields is not None:
+            self.last_vals = tuple(getattr(snap, name) for name in self.fields)
+
+
+_subs_lock = threading.Lock()
+
+
+def subscribe(self, callback, fields=None, max_hz=None, min_delta=0.0):
+    """
+    Registra callback(snapshot) para cada TelemetrySnapshot nueva que cumpla los filtros:
+    fields (solo si cambia alguno de esos campos, con umbral min_delta para los numéricos) y
+    max_hz (frecuencia máxima de entrega). Se llama desde el hilo de telemetría. Devuelve un
+    token para unsubscribe().
+    """
+    for name in fields or ():
+        if name not in TelemetrySnapshot.__slots__:
+            raise ValueError(f"Campo de telemetría desconocido: {name}")
+    sub = _Subscription(callback, fields, max_hz, min_delta)
+    with _subs_lock:
+        # Copia al escribir: el hilo de telemetría recorre la tupla sin bloquear
+        self._telemetry_subs = getattr(self, "_telemetry_subs", ()) + (sub,)
+    return sub
+
+
+def unsubscribe(self, token) -> bool:
+    with _subs_lock:
+        subs = getattr(self, "_telemetry_subs", ())
+        if token not in subs:
+            return False
+        self._telemetry_subs = tuple(s for s in subs if s is not token)
+    return True
 
-def _telemetry_loop(self, period_s: float):
-
-    if not hasattr(self, "_pose_takeoff_synced"):
-        self._pose_takeoff_synced = False
-
-    while not getattr(self, "_telemetry_stop", True):
 
-        # Si no hay conexión, esperamos y reintentamos
-        if getattr(self, "_tello", None) is None or getattr(self, "state", "disconnected") == "disconnected":
-            time.sleep(period_s)
+def _dispatch_snapshot(self, snap):
+    for sub in getattr(self, "_telemetry_subs", ()):
+        if not sub.wants(snap):
             continue
-
-        # Valores locales para sincronización de pose
-        height_val = None
-        yaw_val = None
-
-        # Altura (cm)
+        sub.mark(snap)
         try:
-            h = self._tello.get_height()
-            if h is not None:
-                self.height_cm = max(0, int(h))
-                height_val = self.height_cm
-        except Exception:
-            pass
-
-        #Yaw (grados)
+            sub.callback(snap)
+        except Exception as e:
+            print(f"[telemetry] Error en suscriptor: {e}")
+
+
+async def telemetry_stream(self, fields=None, max_hz=None, min_delta=0.0):
+    # Equivalente asíncrono de subscribe(): async for snap in dron.telemetry_stream(...)
+    # Si el consumidor va lento solo se conserva la snapshot más reciente
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=1)
+
+    def _put(snap):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(snap)
+
+    token = subscribe(self, lambda snap: loop.call_soon_threadsafe(_put, snap), fields, max_hz, min_delta)
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        unsubscribe(self, token)
+
+
+def parse_state(text: str) -> dict:
+    # Parser del paquete de estado: un split y un partition por campo, sin expresiones regulares
+    st = {}
+    conv = _CONVERTERS
+    for item in text.split(";"):
+        key, sep, val = item.partition(":")
+        if not sep:
+            continue
+        key = key.strip()
+        fn = conv.get(key)
         try:
-            # Primero intentamos get_yaw()
-            gy = getattr(self._tello, "get_yaw", None)
-            if callable(gy):
-                y = gy()
+            if fn is int:
+                st[key] = int(val)
+            elif fn is float:
+                st[key] = float(val)
+            elif key == "mpry":
+                # mpry: "x,y,z" (orientación respecto a la mission pad)
+                a, b, c = val.split(",")
+                st[key] = (int(a), int(b), int(c))
             else:
-                # Alternativa: leer del estado  si existe
-                y = None
-                gc = getattr(self._tello, "get_current_state", None)
-                if callable(gc):
-                    try:
-                        st = gc()
-                        # djitellopy suele mostrar 'yaw' en grados
-                        if isinstance(st, dict):
-                            y = st.get("yaw", None)
-                    except Exception:
-                        y = None
-
-            if y is not None:
-
-                self.yaw_deg = float(y)
-                yaw_val = self.yaw_deg
-        except Exception:
-            pass
+                st[key] = val.strip()
+        except ValueError:
+            # Algunos firmwares mandan decimales en campos enteros
+            try:
+                st[key] = float(val)
+            except ValueError:
+                st[key] = val.strip()
+    return st
+
+
+def _apply_state(self, st: dict, ts: float):
+    # Procesa un paquete de estado completo en una sola pasada
+    if getattr(self, "_recorder", None) is not None:
+        _record_state(self, st, ts)
+
+    # Altura (cm)
+    h = st.get("h")
+    height_val = None
+    if h is not None:
+        self.height_cm = max(0, int(h))
+        height_val = self.height_cm
+
+    # Yaw (grados)
+    yaw_val = None
+    y = st.get("yaw")
+    if y is not None:
+        self.yaw_deg = float(y)
+        yaw_val = self.yaw_deg
+
+    # Batería (%)
+    b = st.get("bat")
+    if b is not None:
+        self.battery_pct = max(0, int(b))
+
+    # Temperatura (°C): media de templ/temph como hace djitellopy
+    tl, th = st.get("templ"), st.get("temph")
+    if tl is not None and th is not None:
+        self.temp_c = (float(tl) + float(th)) / 2.0
+
+    # Tiempo de vuelo (s)
+    ft = st.get("time")
+    if ft is not None:
+        self.flight_time_s = max(0, int(ft))
+
+    # Actitud, velocidades, aceleraciones, ToF, barómetro y temperaturas
+    for key, attr in _STATE_ATTRS:
+        v = st.get(key)
+        if v is not None:
+            setattr(self, attr, v)
+
+    # Sincronización de PoseVirtual (z/yaw)
+    _gf_begin_packet(self)
+    try:
+        # Si aún no existe pose, la creamos
+        if not hasattr(self, "pose") or self.pose is None:
+            if PoseVirtual is not None:
+                self.pose = PoseVirtual()
+
+        if hasattr(self, "pose") and self.pose is not None:
+            # Observadores de la pose (geofence, caja negra...) enganchados a la pose actual
+            sync_pose_watchers(self)
+
+            # Altura (z) y yaw absoluto -> relativo, en una sola actualización
+            # (un PoseEstimator fusiona además velocidades, ToF y barómetro del mismo paquete)
+            if hasattr(self.pose, "update_from_state"):
+                self.pose.update_from_state(st, ts)
+            else:
+                self.pose.set_from_telemetry(height_cm=height_val, yaw_deg=yaw_val)
 
-        # Batería (%)
+            # Al pasar a estado 'flying' por primera vez, fijamos referencia de yaw del vuelo
+            if getattr(self, "state", "") == "flying":
+                if yaw_val is not None and not getattr(self, "_pose_takeoff_synced", False):
+                    self.pose.set_takeoff_reference(yaw_val)
+                    self._pose_takeoff_synced = True
+            else:
+                # cuando no estamos volando, reseteamos la marca para el siguiente vuelo
+                self._pose_takeoff_synced = False
+
+            # Fijo absoluto con mission pads (si están activas y el paquete trae un pad)
+            if getattr(self, "_pads_enabled", False):
+                _pad_correct(self, st, ts)
+    except Exception:
+        pass
+    finally:
+        # Geofence: una lectura por paquete aunque la pose no haya cambiado
+        _gf_end_packet(self)
+
+    # Marca de tiempo = recepción del paquete
+    self.telemetry_ts = ts
+    snap = _publish_snapshot(self, ts)
+    hist = getattr(self, "history", None)
+    if hist is not None:
+        hist.append_snapshot(snap)
+    _dispatch_snapshot(self, snap)
+
+
+def _poll_getters(self) -> dict:
+    # Último recurso para backends sin estado completo: los getters de siempre, uno por campo
+    st = {}
+    for key, getter in (("h", "get_height"), ("yaw", "get_yaw"), ("bat", "get_battery"),
+                        ("time", "get_flight_time")):
         try:
-            b = self._tello.get_battery()
-            if b is not None:
-                self.battery_pct = max(0, int(b))
+            fn = getattr(self._tello, getter, None)
+            if callable(fn):
+                st[key] = fn()
         except Exception:
             pass
+    try:
+        t = self._tello.get_temperature()
+        st["templ"] = st["temph"] = t
+    except Exception:
+        pass
+    return st
+
+
+class _StateSlot(dict):
+    # Entrada de djitellopy.tello.drones[ip]: avisa con un Event cada vez que el receptor guarda un paquete
+    __slots__ = ("event",)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if key == "state":
+            self.event.set()
+
+
+def _hook_state_arrival(tello):
+    # Devuelve el Event que se marca con cada paquete de estado de este dron (None si no se puede enganchar)
+    try:
+        from djitellopy import tello as djt
+        host = tello.address[0]
+        slot = djt.drones[host]
+    except Exception:
+        return None
+    if not isinstance(slot, _StateSlot):
+        # Copia superficial: la lista de respuestas de comandos sigue siendo la misma
+        new = _StateSlot(slot)
+        new.event = threading.Event()
+        djt.drones[host] = new
+        slot = new
+    return slot.event
 
-        #Temperatura (°C)
-        try:
-            t = self._tello.get_temperature()
-            if t is not None:
-                self.temp_c = float(t)
-        except Exception:
-            pass
 
-        # WiFi (0..100 aprox)
-        try:
-            w = self._tello.get_wifi()
-            if w is not None:
-                self.wifi = int(w)
-        except Exception:
-            pass
+def _telemetry_loop(self, period_s: float):
 
-        #  Tiempo de vuelo (s)
-        try:
-            ft = self._tello.get_flight_time()
-            if ft is not None:
-                self.flight_time_s = max(0, int(ft))
-        except Exception:
-            pass
+    if not hasattr(self, "_pose_takeoff_synced"):
+        self._pose_takeoff_synced = False
 
-        #  Sincronización de PoseVirtual (z/yaw)
-        try:
-            # Si aún no existe pose, la creamos
-            if not hasattr(self, "pose") or self.pose is None:
-                if PoseVirtual is not None:
-                    self.pose = PoseVirtual()
-
-            if hasattr(self, "pose") and self.pose is not None:
-                # Altura (z)
-                self.pose.set_from_telemetry(height_cm=height_val)
-
-                # Yaw absoluto -> relativo
-                if yaw_val is not None:
-                    try:
-                        self.pose.set_heading_from_absolute_yaw(yaw_val)
-                    except Exception:
-                        pass
-
-                # Al pasar a estado 'flying' por primera vez, fijamos referencia de yaw del vuelo
-                try:
-                    if getattr(self, "state", "") == "flying":
-                        if yaw_val is not None and not getattr(self, "_pose_takeoff_synced", False):
-                            self.pose.set_takeoff_reference(yaw_val)
-                            self._pose_takeoff_synced = True
-                    else:
-                        # cuando no estamos volando, reseteamos la marca para el siguiente vuelo
-                        self._pose_takeoff_synced = False
-                except Exception:
-                    pass
-        except Exception:
+    last_state = None
+    listening = None
+    hooked, arrival = None, None
 
-            pass
+    while not getattr(self, "_telemetry_stop", True):
+
+        tello = getattr(self, "_tello", None)
+
+        # Si no hay conexión, esperamos y reintentamos
+        if tello is None or getattr(self, "state", "disconnected") == "disconnected":
+            listening = None
+            time.sleep(period_s)
+            continue
 
+        # Backend con empuje (asyncio): nos suscribimos una vez y el hilo solo vigila reconexiones
+        if callable(getattr(tello, "add_state_listener", None)):
+            if listening is not tello:
+                tello.add_state_listener(self._telemetry_listener)
+                listening = tello
+            time.sleep(period_s)
+            continue
 
-        self.telemetry_ts = time.time()
+        # djitellopy: dormimos hasta que su receptor guarda un paquete nuevo y lo procesamos
+        gc = getattr(tello, "get_current_state", None)
+        if hooked is not tello:
+            hooked, arrival = tello, _hook_state_arrival(tello)
+        if arrival is not None:
+            # period_s de tope: así también se ven la desconexión y el stop sin paquetes
+            arrival.wait(period_s)
+            arrival.clear()
+        st = None
+        if callable(gc):
+            try:
+                st = gc()
+            except Exception:
+                st = None
+        if st:
+            if st is not last_state:
+                last_state = st
+                _apply_state(self, st, time.time())
+            if arrival is None:
+                time.sleep(_STATE_WATCH_S)
+            continue
 
+        _apply_state(self, _poll_getters(self), time.time())
         time.sleep(period_s)
 
+    if listening is not None:
+        try:
+            listening.remove_state_listener(self._telemetry_listener)
+        except Exception:
+            pass
+
 
-def startTelemetry(self, freq_hz: int = 5):
+def startTelemetry(self, freq_hz: int = 5, history_s: float | None = 600.0):
+    # freq_hz solo marca el ritmo de reintento/sondeo; con paquetes de estado se procesa cada paquete al llegar
+    # history_s: segundos de histórico en self.history (None = sin histórico)
 
     if freq_hz <= 0:
         freq_hz = 5
@@ -142,7 +423,6 @@ def startTelemetry(self, freq_hz: int = 5):
     self.height_cm = getattr(self, "height_cm", 0)
     self.battery_pct = getattr(self, "battery_pct", None)
     self.temp_c = getattr(self, "temp_c", None)
-    self.wifi = getattr(self, "wifi", None)
     self.flight_time_s = getattr(self, "flight_time_s", 0)
     self.telemetry_ts = time.time()
 
@@ -151,6 +431,17 @@ def startTelemetry(self, freq_hz: int = 5):
         if PoseVirtual is not None:
             self.pose = PoseVirtual()
 
+    # Histórico en buffer circular (requiere NumPy)
+    if history_s and getattr(self, "history", None) is None:
+        try:
+            from TelloLink.modules.tello_history import TelemetryHistory
+            self.history = TelemetryHistory(seconds=history_s)
+        except RuntimeError as e:
+            print(f"[telemetry] Sin histórico: {e}")
+
+    # Callback para backends con empuje (se llama desde el hilo del transporte)
+    self._telemetry_listener = lambda st, ts: _apply_state(self, st, ts)
+
     self._telemetry_stop = False
     period_s = 1.0 / float(freq_hz)
 
@@ -167,4 +458,4 @@ def stopTelemetry(self):
     if th and th.is_alive():
         th.join(timeout=2.0)
     self._telemetry_thread = None
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,612 @@
+import math
+import threading
+
+# NumPy es opcional: sin él las pruebas exactas se hacen en Python puro (mismos resultados)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Índice espacial de las zonas de exclusión del geofence.
+#
+# Las zonas viven en dos listas de dicts (_gf_excl_polys / _gf_excl_circles) que tanto el módulo de
+# geofence como los demostradores modifican directamente (append, clear...). ZoneList es una lista que
+# lleva la cuenta de esos cambios para que el índice se actualice solo: los append se insertan de forma
+# incremental y cualquier otro cambio provoca una reconstrucción completa.
+
+_GRID_CELL_CM = 100.0     # lado de la celda de la rejilla
+_MAX_CELLS_PER_ZONE = 4096  # zonas más grandes van a una lista aparte que se comprueba siempre
+_BBOX_PAD_CM = 1e-3         # margen de las cajas: los bordes cuentan como dentro (eps de las pruebas exactas)
+_VECTOR_MIN_EDGES = 48      # por debajo, la sobrecarga de NumPy por llamada supera a un bucle en Python
+_BATCH_CELLS = 1_000_000    # tamaño máximo (puntos x lados) de los bloques en las consultas por lotes
+
+
+class ZoneList(list):
+    """Lista de zonas con contador de versión (version cambia con cada modificación)."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+        self.rebuild_version = 0  # versión del último cambio que no fue un simple append
+
+    def _changed(self):
+        self.version += 1
+        self.rebuild_version = self.version
+
+    def append(self, item):
+        super().append(item)
+        self.version += 1
+
+    def extend(self, items):
+        super().extend(items)
+        self.version += 1
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, i, item):
+        super().insert(i, item)
+        self._changed()
+
+    def remove(self, item):
+        super().remove(item)
+        self._changed()
+
+    def pop(self, *args):
+        item = super().pop(*args)
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, i, item):
+        super().__setitem__(i, item)
+        self._changed()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._changed()
+
+
+def zone_list_property(name: str):
+    # Propiedad de clase para TelloDron: lo que se asigne se envuelve en ZoneList
+    store = name + "_store"
+
+    def fget(self):
+        lst = self.__dict__.get(store)
+        if lst is None:
+            lst = self.__dict__[store] = ZoneList()
+        return lst
+
+    def fset(self, value):
+        self.__dict__[store] = value if isinstance(value, ZoneList) else ZoneList(value or [])
+
+    return property(fget, fset)
+
+
+def _zone_bbox(kind: str, entry: dict):
+    if kind == "poly":
+        pts = entry.get("poly") or []
+        if len(pts) < 3:
+            return None
+        xs = [p[0] for p in pts]
+        ys = [p[1] for p in pts]
+        pad = _BBOX_PAD_CM
+        return min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad
+    cx, cy, r = entry.get("cx"), entry.get("cy"), entry.get("r")
+    if cx is None or cy is None or r is None:
+        return None
+    r = math.sqrt(r * r + 1e-6) + _BBOX_PAD_CM  # mismo margen que _point_in_circle
+    return cx - r, cy - r, cx + r, cy + r
+
+
+# Arrays de CompiledZones que se guardan con la plantilla (el resto se deriva de ellos al cargar)
+_COMPILED_ARRAYS = ("poly_off", "x", "y", "x_next", "y_next", "x_prev", "y_prev", "seg_dx", "seg_dy",
+                    "ray_dx", "ray_den", "poly_bbox", "poly_z", "circ_bbox", "circ_c", "circ_r2", "circ_z")
+
+
+class CompiledZones:
+    """
+    Zonas compiladas a arrays contiguos de NumPy. Cada vértice se guarda junto a su siguiente y su
+    anterior (dentro de su polígono) con las diferencias precalculadas, y las pruebas repiten exactamente
+    las operaciones de _point_in_poly / _point_in_circle: los resultados son idénticos, bordes incluidos.
+    Las consultas usan buffers de trabajo por hilo (sin reservar memoria en cada consulta).
+    """
+
+    def __init__(self, polys: list, circles: list):
+        counts = [len(p["poly"]) for p in polys]
+        self.poly_off = np.zeros(len(polys) + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(counts, out=self.poly_off[1:])
+        n = int(self.poly_off[-1])
+        self.x = np.array([float(v[0]) for p in polys for v in p["poly"]], dtype=np.float64).reshape(n)
+        self.y = np.array([float(v[1]) for p in polys for v in p["poly"]], dtype=np.float64).reshape(n)
+        # Índices del vértice siguiente/anterior, cerrando cada polígono sobre sí mismo
+        nxt = np.arange(1, n + 1, dtype=np.int64)
+        prv = np.arange(-1, n - 1, dtype=np.int64)
+        if counts:
+            nxt[self.poly_off[1:] - 1] = self.poly_off[:-1]
+            prv[self.poly_off[:-1]] = self.poly_off[1:] - 1
+        self.x_next, self.y_next = self.x[nxt], self.y[nxt]
+        self.x_prev, self.y_prev = self.x[prv], self.y[prv]
+        # Lado i -> i+1 (prueba de borde) y lado i-1 -> i (ray casting), como en _point_in_poly
+        self.seg_dx = self.x_next - self.x
+        self.seg_dy = self.y_next - self.y
+        self.ray_dx = self.x_prev - self.x
+        self.ray_den = self.y_prev - self.y
+        self.ray_den[self.ray_den == 0] = 1e-9
+        self.max_edges = max(counts, default=0)
+        self.edge_counts = counts
+
+        self.poly_bbox = np.array([_zone_bbox("poly", p) for p in polys], dtype=np.float64).reshape(-1, 4)
+        self.poly_z = np.array([_z_range(p) for p in polys], dtype=np.float64).reshape(-1, 2)
+
+        self.circ_bbox = np.array([_zone_bbox("circle", c) for c in circles], dtype=np.float64).reshape(-1, 4)
+        self.circ_c = np.array([(float(c["cx"]), float(c["cy"])) for c in circles], dtype=np.float64).reshape(-1, 2)
+        self.circ_r2 = np.array([float(c["r"]) * float(c["r"]) + 1e-6 for c in circles], dtype=np.float64)
+        self.circ_z = np.array([_z_range(c) for c in circles], dtype=np.float64).reshape(-1, 2)
+        self._circ = [(float(c["cx"]), float(c["cy"]), float(c["r"]) * float(c["r"]) + 1e-6) for c in circles]
+
+        self._tls = threading.local()
+
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in _COMPILED_ARRAYS}
+
+    def appended(self, polys: list, circles: list) -> "CompiledZones":
+        # Compilación con estas zonas añadidas al final: solo se compilan las nuevas y se concatenan los arrays.
+        # La actual no cambia (quien la esté usando desde otro hilo la sigue viendo entera)
+        if not polys and not circles:
+            return self
+        new = CompiledZones(polys, circles)
+        out = CompiledZones.__new__(CompiledZones)
+        for name in _COMPILED_ARRAYS:
+            tail = getattr(new, name)
+            if name == "poly_off":
+                tail = tail[1:] + self.poly_off[-1]
+            setattr(out, name, np.concatenate((getattr(self, name), tail)))
+        out.edge_counts = list(self.edge_counts) + new.edge_counts
+        out.max_edges = max(self.max_edges, new.max_edges)
+        out._circ = self._circ + new._circ
+        out._tls = threading.local()
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "CompiledZones":
+        # Reconstruye la compilación a partir de to_arrays() sin recorrer las zonas
+        self = cls.__new__(cls)
+        for name in _COMPILED_ARRAYS:
+            setattr(self, name, np.ascontiguousarray(arrays[name]))
+        self.edge_counts = np.diff(self.poly_off).tolist()
+        self.max_edges = max(self.edge_counts, default=0)
+        self._circ = [(cx, cy, r2) for (cx, cy), r2 in zip(self.circ_c.tolist(), self.circ_r2.tolist())]
+        self._tls = threading.local()
+        return self
+
+    def _buffers(self, n: int):
+        buf = getattr(self._tls, "buf", None)
+        if buf is None or buf[0].shape[0] < n:
+            size = max(n, self.max_edges, 8)
+            buf = self._tls.buf = (np.empty(size), np.empty(size), np.empty(size), np.empty(size),
+                                   np.empty(size, dtype=bool), np.empty(size, dtype=bool))
+        return tuple(b[:n] for b in buf)
+
+    def poly_contains(self, k: int, px: float, py: float, eps: float = 1e-6) -> bool:
+        s, e = int(self.poly_off[k]), int(self.poly_off[k + 1])
+        n = e - s
+        if n < 3:
+            return False
+        a, b, c, d, m1, m2 = self._buffers(n)
+        x, y = self.x[s:e], self.y[s:e]
+
+        # Borde explícito: |cruz| <= eps y producto escalar <= eps
+        np.subtract(px, x, out=a)
+        np.multiply(a, self.seg_dy[s:e], out=b)
+        np.subtract(py, y, out=c)
+        np.multiply(c, self.seg_dx[s:e], out=d)
+        np.subtract(b, d, out=b)
+        np.abs(b, out=b)
+        np.less_equal(b, eps, out=m1)
+        np.subtract(px, self.x_next[s:e], out=b)
+        np.multiply(a, b, out=a)
+        np.subtract(py, self.y_next[s:e], out=d)
+        np.multiply(c, d, out=c)
+        np.add(a, c, out=a)
+        np.less_equal(a, eps, out=m2)
+        np.logical_and(m1, m2, out=m1)
+        if m1.any():
+            return True
+
+        # Ray casting: lados que cruzan la horizontal de py con la intersección a la derecha de px
+        np.greater(y, py, out=m1)
+        np.greater(self.y_prev[s:e], py, out=m2)
+        np.not_equal(m1, m2, out=m1)
+        np.subtract(py, y, out=a)
+        np.multiply(self.ray_dx[s:e], a, out=a)
+        np.divide(a, self.ray_den[s:e], out=a)
+        np.add(a, x, out=a)
+        np.less(px, a, out=m2)
+        np.logical_and(m1, m2, out=m1)
+        return bool(np.count_nonzero(m1) & 1)
+
+    def poly_contains_many(self, k: int, px, py, eps: float = 1e-6):
+        # Igual que poly_contains para un array de puntos (matriz puntos x lados, por bloques)
+        s, e = int(self.poly_off[k]), int(self.poly_off[k + 1])
+        out = np.zeros(px.shape[0], dtype=bool)
+        if e - s < 3:
+            return out
+        x, y = self.x[s:e], self.y[s:e]
+        xn, yn, yp = self.x_next[s:e], self.y_next[s:e], self.y_prev[s:e]
+        sdx, sdy, rdx, rden = self.seg_dx[s:e], self.seg_dy[s:e], self.ray_dx[s:e], self.ray_den[s:e]
+        block = max(1, _BATCH_CELLS // (e - s))
+        for i in range(0, px.shape[0], block):
+            bx = px[i:i + block, None]
+            by = py[i:i + block, None]
+            a = bx - x
+            c = by - y
+            edge = (np.abs(a * sdy - c * sdx) <= eps) & ((a * (bx - xn) + c * (by - yn)) <= eps)
+            cross = ((y > by) != (yp > by)) & (bx < rdx * c / rden + x)
+            out[i:i + block] = edge.any(axis=1) | (np.count_nonzero(cross, axis=1) & 1).astype(bool)
+        return out
+
+    def contains_many(self, px, py, pz, polys=None, circles=None):
+        # Máscara de puntos dentro de alguna zona (con su rango de z); cada zona solo mira los puntos de su caja.
+        # polys/circles restringen las zonas a probar (None = todas)
+        hit = np.zeros(px.shape[0], dtype=bool)
+        order = np.argsort(px, kind="stable")
+        sx = px[order]
+        for bbox, zr, test, ids in ((self.circ_bbox, self.circ_z, self._circle_mask, circles),
+                                    (self.poly_bbox, self.poly_z, self.poly_contains_many, polys)):
+            ids = np.arange(bbox.shape[0]) if ids is None else np.asarray(ids, dtype=np.int64)
+            if not ids.size:
+                continue
+            lo = np.searchsorted(sx, bbox[ids, 0], side="left")
+            hi = np.searchsorted(sx, bbox[ids, 2], side="right")
+            for j in np.flatnonzero(hi > lo):
+                k = ids[j]
+                cand = order[lo[j]:hi[j]]
+                cy, cz = py[cand], pz[cand]
+                sel = cand[~hit[cand] & (cy >= bbox[k, 1]) & (cy <= bbox[k, 3])
+                           & (cz >= zr[k, 0]) & (cz <= zr[k, 1])]
+                if sel.size:
+                    hit[sel[test(k, px[sel], py[sel])]] = True
+        return hit
+
+    def _circle_mask(self, k: int, px, py):
+        dx = px - self.circ_c[k, 0]
+        dy = py - self.circ_c[k, 1]
+        return (dx * dx + dy * dy) <= self.circ_r2[k]
+
+    def circle_contains(self, k: int, px: float, py: float) -> bool:
+        cx, cy, r2 = self._circ[k]
+        dx, dy = px - cx, py - cy
+        return (dx * dx + dy * dy) <= r2
+
+
+# --- Márgenes (buffers) de las zonas ---
+
+_ARC_STEP_RAD = math.pi / 6  # las esquinas redondeadas se aproximan con tramos de como mucho 30°
+
+
+def _signed_area(pts) -> float:
+    n = len(pts)
+    return 0.5 * sum(pts[i][0] * pts[(i + 1) % n][1] - pts[(i + 1) % n][0] * pts[i][1] for i in range(n))
+
+
+def _convex_hull(pts):
+    # Cadena monótona de Andrew (sentido antihorario)
+    pts = sorted(set(pts))
+    if len(pts) < 3:
+        return pts
+
+    def half(seq):
+        out = []
+        for p in seq:
+            while len(out) >= 2 and ((out[-1][0] - out[-2][0]) * (p[1] - out[-2][1])
+                                     - (out[-1][1] - out[-2][1]) * (p[0] - out[-2][0])) <= 0:
+                out.pop()
+            out.append(p)
+        return out
+
+    return half(pts)[:-1] + half(reversed(pts))[:-1]
+
+
+def _segments_cross(a, b, c, d) -> bool:
+    def orient(p, q, r):
+        v = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return (v > 1e-9) - (v < -1e-9)
+
+    o1, o2, o3, o4 = orient(a, b, c), orient(a, b, d), orient(c, d, a), orient(c, d, b)
+    return o1 != o2 and o3 != o4 and 0 not in (o1, o2, o3, o4)
+
+
+def _self_intersects(pts) -> bool:
+    n = len(pts)
+    for i in range(n):
+        a, b = pts[i], pts[(i + 1) % n]
+        for j in range(i + 2, n):
+            if i == 0 and j == n - 1:
+                continue  # lados contiguos
+            if _segments_cross(a, b, pts[j], pts[(j + 1) % n]):
+                return True
+    return False
+
+
+def _offset_ring(pts, b: float):
+    # Desplaza cada lado b hacia fuera; esquinas convexas redondeadas (polígono circunscrito al arco, así
+    # nunca queda por dentro de la suma de Minkowski) y cóncavas por intersección de los lados desplazados
+    n = len(pts)
+    normals = []
+    for i in range(n):
+        (x1, y1), (x2, y2) = pts[i], pts[(i + 1) % n]
+        ln = math.hypot(x2 - x1, y2 - y1)
+        normals.append(((y2 - y1) / ln, -(x2 - x1) / ln))  # normal exterior en sentido antihorario
+    out = []
+    has_concave = False
+    for i in range(n):
+        vx, vy = pts[i]
+        n1, n2 = normals[i - 1], normals[i]
+        cross = n1[0] * n2[1] - n1[1] * n2[0]
+        a1, a2 = math.atan2(n1[1], n1[0]), math.atan2(n2[1], n2[0])
+        if cross >= -1e-12:
+            # Convexa: arco de a1 a a2 (giro positivo)
+            turn = (a2 - a1) % (2 * math.pi)
+            k = max(1, int(math.ceil(turn / _ARC_STEP_RAD))) if turn > 1e-9 else 0
+            out.append((vx + b * n1[0], vy + b * n1[1]))
+            if k:
+                step = turn / k
+                r = b / math.cos(step / 2.0)
+                for j in range(k):
+                    a = a1 + (j + 0.5) * step
+                    out.append((vx + r * math.cos(a), vy + r * math.sin(a)))
+                out.append((vx + b * n2[0], vy + b * n2[1]))
+        else:
+            has_concave = True
+            dot = n1[0] * n2[0] + n1[1] * n2[1]
+            m = b / (1.0 + dot)
+            out.append((vx + (n1[0] + n2[0]) * m, vy + (n1[1] + n2[1]) * m))
+    return out, has_concave
+
+
+def buffer_polygon(points, b: float):
+    """
+    Polígono que contiene al original ensanchado b cm en todas direcciones (suma de Minkowski con un disco,
+    aproximada por fuera). Si el desplazamiento de un polígono cóncavo se cruza consigo mismo (margen grande
+    frente a sus entrantes), se usa el de su envolvente convexa, que sigue siendo conservador.
+    """
+    pts = [(float(x), float(y)) for x, y in points]
+    dedup = [p for i, p in enumerate(pts) if p != pts[i - 1]] if len(pts) > 1 else pts
+    if b <= 0 or len(dedup) < 3 or abs(_signed_area(dedup)) < 1e-9:
+        return pts
+    if _signed_area(dedup) < 0:
+        dedup.reverse()
+    out, has_concave = _offset_ring(dedup, b)
+    if has_concave and _self_intersects(out):
+        out, _ = _offset_ring(_convex_hull(dedup), b)
+    return out
+
+
+def _z_range(entry: dict):
+    zmin, zmax = entry.get("zmin"), entry.get("zmax")
+    return (-math.inf if zmin is None else float(zmin)), (math.inf if zmax is None else float(zmax))
+
+
+class ExclusionIndex:
+    """
+    Rejilla uniforme sobre las cajas envolventes de las zonas. Cada celda guarda las zonas cuya caja la
+    toca; una consulta solo mira la celda del punto y descarta por caja y por rango de z antes de hacer
+    la prueba exacta (con CompiledZones si hay NumPy; si no, con las funciones de Python que se pasen).
+    """
+
+    def __init__(self, point_in_poly=None, point_in_circle=None, cell_cm: float = _GRID_CELL_CM):
+        self.cell = float(cell_cm)
+        self._point_in_poly = point_in_poly
+        self._point_in_circle = point_in_circle
+        self._lock = threading.Lock()
+        self._lists = {"poly": None, "circle": None}
+        self._reset()
+
+    def _reset(self):
+        self._cells = {}
+        self._big = []
+        self._zones = {"poly": [], "circle": []}
+        self._seen = {"poly": (-1, 0), "circle": (-1, 0)}  # (rebuild_version, elementos indexados)
+        self._compiled = None
+        self._pending = {"poly": [], "circle": []}  # indexadas pero aún no añadidas a _compiled
+
+    def _insert(self, kind, order, entry) -> bool:
+        # Mete la zona en la rejilla; False si no es válida (no se indexa)
+        if not isinstance(entry, dict):
+            return False  # formatos antiguos/corruptos: se ignoran como antes
+        bb = _zone_bbox(kind, entry)
+        if bb is None:
+            return False
+        zones = self._zones[kind]
+        item = (kind, order, len(zones), bb, entry.get("zmin"), entry.get("zmax"))
+        zones.append(entry)
+        c = self.cell
+        i0, j0 = math.floor(bb[0] / c), math.floor(bb[1] / c)
+        i1, j1 = math.floor(bb[2] / c), math.floor(bb[3] / c)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > _MAX_CELLS_PER_ZONE:
+            self._big.append(item)
+            return True
+        cells = self._cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cells.setdefault((i, j), []).append(item)
+        return True
+
+    def _insert_new(self, polys, circles) -> None:
+        # Inserta lo que haya a partir de lo ya indexado (con _lock tomado). Las zonas nuevas quedan pendientes
+        # de compilar: se añaden a la compilación cuando una consulta la necesita (ver compiled)
+        for kind, lst in (("poly", polys), ("circle", circles)):
+            _, seen_n = self._seen[kind]
+            new = list(lst[seen_n:])
+            for n, entry in enumerate(new, start=seen_n):
+                if self._insert(kind, n, entry) and self._compiled is not None:
+                    self._pending[kind].append(entry)
+            self._seen[kind] = (getattr(lst, "rebuild_version", None), seen_n + len(new))
+
+    def sync(self, polys, circles) -> None:
+        # Pone el índice al día con las listas actuales (barato si no han cambiado)
+        with self._lock:
+            for kind, lst in (("poly", polys), ("circle", circles)):
+                rv = getattr(lst, "rebuild_version", None)
+                seen_rv, seen_n = self._seen[kind]
+                if lst is not self._lists[kind] or rv is None or rv != seen_rv or len(lst) < seen_n:
+                    # Lista nueva o cambiada por algo que no es append: reconstrucción completa
+                    self._lists = {"poly": polys, "circle": circles}
+                    self._reset()
+                    for k, l in (("poly", polys), ("circle", circles)):
+                        for n, entry in enumerate(list(l)):
+                            self._insert(k, n, entry)
+                        self._seen[k] = (getattr(l, "rebuild_version", None), len(l))
+                    break
+            else:
+                # Solo appends: insertamos (y compilamos) lo nuevo
+                self._insert_new(polys, circles)
+            if self._compiled is None and np is not None:
+                self._compiled = CompiledZones(self._zones["poly"], self._zones["circle"])
+
+    def append_zones(self, polys, circles) -> None:
+        # polys/circles = las secuencias ya indexadas con zonas añadidas al final (p.ej. las tuplas de la
+        # configuración siguiente del geofence): pasan a ser las del índice y solo se insertan las nuevas
+        with self._lock:
+            self._insert_new(polys, circles)
+            self._lists = {"poly": polys, "circle": circles}
+            if self._compiled is None and np is not None:
+                self._compiled = CompiledZones(self._zones["poly"], self._zones["circle"])
+
+    @property
+    def compiled(self):
+        # Compilación al día: las zonas añadidas desde la última se compilan solas y se concatenan
+        with self._lock:
+            return self._flush()
+
+    def _flush(self):
+        # Con _lock tomado
+        pend = self._pending
+        if self._compiled is not None and (pend["poly"] or pend["circle"]):
+            self._compiled = self._compiled.appended(pend["poly"], pend["circle"])
+            self._pending = {"poly": [], "circle": []}
+        return self._compiled
+
+    @property
+    def zones(self):
+        # Zonas indexadas (solo las válidas), en el orden de sus índices k
+        return self._zones["poly"], self._zones["circle"]
+
+    def to_arrays(self) -> dict:
+        # Compilación + rejilla como arrays: claves de celda, offsets y referencias
+        # (k de polígono, o nº de polígonos + k de círculo)
+        with self._lock:
+            npoly = len(self._zones["poly"])
+
+            def ref(item):
+                return item[2] if item[0] == "poly" else npoly + item[2]
+
+            keys = sorted(self._cells)
+            off = np.zeros(len(keys) + 1, dtype=np.int64)
+            off[1:] = np.cumsum([len(self._cells[key]) for key in keys], dtype=np.int64)
+            refs = [ref(item) for key in keys for item in self._cells[key]]
+            comp = self._flush()
+            if comp is None:
+                comp = CompiledZones(self._zones["poly"], self._zones["circle"])
+            return {**comp.to_arrays(),
+                    "cell": np.array([self.cell]),
+                    "order": np.array([item[1] for kind in ("poly", "circle") for item in self._items(kind)],
+                                      dtype=np.int64),
+                    "keys": np.array(keys, dtype=np.int64).reshape(-1, 2),
+                    "off": off,
+                    "refs": np.array(refs, dtype=np.int64),
+                    "big": np.array([ref(item) for item in self._big], dtype=np.int64)}
+
+    def _items(self, kind):
+        # Entrada de la rejilla de cada zona de un tipo, en orden de k
+        out = {}
+        for lst in (*self._cells.values(), self._big):
+            for item in lst:
+                if item[0] == kind:
+                    out[item[2]] = item
+        return [out[k] for k in sorted(out)]
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, polys, circles, point_in_poly=None, point_in_circle=None) -> "ExclusionIndex":
+        # Índice ya construido (to_arrays) sobre estas zonas; las cajas salen de la compilación guardada
+        self = cls(point_in_poly, point_in_circle, float(arrays["cell"][0]))
+        comp = CompiledZones.from_arrays(arrays)
+        order = arrays["order"].tolist()
+        items = [("poly", order[k], k, tuple(comp.poly_bbox[k].tolist()), e.get("zmin"), e.get("zmax"))
+                 for k, e in enumerate(polys)]
+        items += [("circle", order[len(polys) + k], k, tuple(comp.circ_bbox[k].tolist()), e.get("zmin"), e.get("zmax"))
+                  for k, e in enumerate(circles)]
+        seq = [items[r] for r in arrays["refs"].tolist()]
+        off = arrays["off"].tolist()
+        self._cells = {(i, j): seq[a:b] for (i, j), a, b in zip(arrays["keys"].tolist(), off[:-1], off[1:])}
+        self._big = [items[r] for r in arrays["big"].tolist()]
+        self._zones = {"poly": list(polys), "circle": list(circles)}
+        self._lists = {"poly": polys, "circle": circles}
+        self._seen = {"poly": (None, len(polys)), "circle": (None, len(circles))}
+        self._compiled = comp
+        return self
+
+    def candidates(self, x: float, y: float, z: float):
+        # Zonas cuya caja contiene (x, y) y cuyo rango de z admite z; polígonos primero, en orden de alta
+        c = self.cell
+        with self._lock:
+            cell = self._cells.get((math.floor(x / c), math.floor(y / c)), ())
+            out = []
+            for item in (*cell, *self._big):
+                _, _, _, bb, zmin, zmax = item
+                if bb[0] <= x <= bb[2] and bb[1] <= y <= bb[3] \
+                        and (zmin is None or z >= zmin) and (zmax is None or z <= zmax):
+                    out.append(item)
+        if len(out) > 1:
+            out.sort(key=lambda it: (it[0] != "poly", it[1]))
+        return out
+
+    def contains_many(self, px, py, pz):
+        # Máscara por lotes (requiere NumPy): solo se prueban las zonas de las celdas que tocan los puntos
+        c = self.cell
+        keys = np.unique(np.column_stack((np.floor(px / c), np.floor(py / c))).astype(np.int64), axis=0)
+        with self._lock:
+            comp = self._flush()
+            ids = {"poly": set(), "circle": set()}
+            for i, j in keys.tolist():
+                for item in self._cells.get((i, j), ()):
+                    ids[item[0]].add(item[2])
+            for item in self._big:
+                ids[item[0]].add(item[2])
+        if comp is None:
+            return np.zeros(px.shape[0], dtype=bool)
+        return comp.contains_many(px, py, pz, polys=sorted(ids["poly"]), circles=sorted(ids["circle"]))
+
+    def first_hit(self, x: float, y: float, z: float):
+        # Primera zona (kind, entry) que contiene el punto, o None. Las zonas aún sin compilar se prueban en
+        # Python (mismo resultado) salvo los polígonos grandes, que compilan lo pendiente
+        comp = self._compiled
+        for kind, _, k, _, _, _ in self.candidates(x, y, z):
+            entry = self._zones[kind][k]
+            if kind == "poly":
+                if comp is not None and len(entry.get("poly", ())) >= _VECTOR_MIN_EDGES:
+                    if k >= len(comp.edge_counts):
+                        comp = self.compiled
+                    inside = comp.poly_contains(k, x, y)
+                else:
+                    inside = self._point_in_poly(x, y, entry.get("poly", []))
+            else:
+                inside = comp.circle_contains(k, x, y) if comp is not None and k < len(comp._circ) else \
+                    self._point_in_circle(x, y, entry.get("cx"), entry.get("cy"), entry.get("r"))
+            if inside:
+                return kind, entry
+        return None
@@ -0,0 +1,39 @@
+from TelloLink.Tello import TelloDron
+import asyncio
+import time
+
+
+async def vuelo():
+    print("=== Test backend asyncio (despegue, movimientos y aterrizaje) ===")
+    dron = TelloDron()
+
+    if not await dron.connect_async():
+        print("No se pudo conectar al Tello")
+        return
+
+    # Varios comandos en paralelo: el transporte los serializa sin ocupar un hilo por comando
+    t0 = time.time()
+    resps = await asyncio.gather(dron.send_async("battery?"), dron.send_async("speed?"), dron.send_async("time?"))
+    print(f"Consultas: {resps} en {time.time() - t0:.2f}s")
+
+    if not await dron.takeOff_async(0.5):
+        print("[ERROR] No se pudo despegar")
+        await dron.disconnect_async()
+        return
+
+    await dron.forward_async(50)
+    await dron.rotate_async(90)
+    await dron.back_async(50)
+    print(f"Pose tras movimientos: {dron.pose}")
+
+    await dron.Land_async()
+    await dron.disconnect_async()
+    print("=== Test completado ===")
+
+
+def main():
+    asyncio.run(vuelo())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_simulator import TelloSimulator
+from TelloLink.modules.tello_blackbox import FlightLog, KIND_NAMES
+import os
+import tempfile
+import time
+
+
+def main():
+    print("=== Test de la caja negra (simulador) ===")
+    # Las grabaciones van a una carpeta temporal (no a ./flightlogs)
+    with tempfile.TemporaryDirectory() as tmp:
+        vuelo(os.path.join(tmp, "test_blackbox.tlbb"))
+        vuelo_go(os.path.join(tmp, "test_blackbox_go.tlbb"))
+    print("=== Test completado ===")
+
+
+def vuelo(path: str):
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0).start()
+
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+
+    dron.startTelemetry(freq_hz=10)
+    dron.start_recording(path)
+
+    dron.takeOff(0.5, blocking=True)
+    dron.forward(50)
+    dron.rotate(90)
+    dron.forward(50)
+    dron.Land(blocking=True)
+
+    dron.stop_recording()
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+
+    with FlightLog(path) as log:
+        counts = {}
+        for _, kind, _ in log:
+            counts[KIND_NAMES[kind]] = counts.get(KIND_NAMES[kind], 0) + 1
+        print(f"Duración: {log.duration_s:.0f}s | Registros: {counts}")
+
+        # Acceso directo a un instante del vuelo
+        t = log.t0 + 2.0
+        for rt, kind, val in log.records(t, t + 0.5):
+            print(f"  t+{rt - log.t0:.2f}s {KIND_NAMES[kind]}: {val}")
+
+    print("\n--> Reproduciendo el vuelo...")
+    t0 = time.time()
+    track = dron.replay_flight(path)
+    print(f"{len(track)} pasos en {time.time() - t0:.3f}s | Final: {track[-1][1:5] if track else None}")
+    print(f"Pose en vivo al acabar: {dron.pose}")
+
+
+
+def vuelo_go(path: str):
+    # goto_rel en modo "go": la reproducción tiene que acabar donde acabó la pose en vivo
+    print("\n--> goto_rel(200, 100) en modo go")
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0).start()
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+
+    dron.startTelemetry(freq_hz=10)
+    dron.start_recording(path)
+    dron.takeOff(0.5, blocking=True)
+    dron.goto_rel(dx_cm=200, dy_cm=100, dz_cm=0, blocking=True, mode="go")
+    vivo = (dron.pose.x_cm, dron.pose.y_cm)
+    dron.Land(blocking=True)
+    dron.stop_recording()
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+
+    track = dron.replay_flight(path)
+    final = track[-1][1:3]
+    print(f"En vivo: ({vivo[0]:.0f}, {vivo[1]:.0f}) | Reproducido: ({final[0]:.0f}, {final[1]:.0f})")
+    assert abs(final[0] - vivo[0]) < 1.0 and abs(final[1] - vivo[1]) < 1.0, "la reproducción no sigue los go"
+    assert abs(vivo[0] - 200) < 20 and abs(vivo[1] - 100) < 20, "goto_rel no llegó al objetivo"
+
+
+if __name__ == "__main__":
+    main()
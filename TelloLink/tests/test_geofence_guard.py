@@ -0,0 +1,78 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_simulator import TelloSimulator
+from TelloLink.modules.tello_telemetry import _apply_state
+from TelloLink.modules.tello_estimator import PoseEstimator
+
+
+def hover_fuera():
+    # Sin simulador: un paquete por encima de max_z y luego hover estable a la misma altura (la pose ya no cambia).
+    # La violación se confirma con el segundo paquete, no se queda esperando a un cambio de la pose.
+    dron = TelloDron()
+    dron.state = "flying"
+    dron.set_geofence(max_x_cm=300, max_y_cm=300, max_z_cm=120, mode="soft")
+    t = 1000.0
+    _apply_state(dron, {"h": 130, "yaw": 0}, t)
+    primera = dron._gf_violation_streak, getattr(dron, "_goto_abort", False)
+    for i in range(20):
+        _apply_state(dron, {"h": 130, "yaw": 0}, t + 0.1 * (i + 1))
+        if i == 0:
+            segunda = dron._gf_violation_streak, dron._goto_abort
+    dron.disable_geofence()
+    print(f"Hover fuera (z=130 > 120): 1er paquete {primera} | 2º {segunda}  (esperado (1, False) | (2, True))")
+    assert primera == (1, False) and segunda == (2, True)
+
+    # Igual con un fijo (origen "fix") que deja la estima dentro de una exclusión y ahí se queda
+    dron = TelloDron()
+    dron.pose = PoseEstimator()
+    dron.state = "flying"
+    dron.set_geofence(max_x_cm=300, max_y_cm=300, max_z_cm=200, mode="soft")
+    dron.add_exclusion_circle(100, 0, 30)
+    dron.pose.apply_fix(100, 0)
+    primera = dron._gf_violation_streak, getattr(dron, "_goto_abort", False)
+    _apply_state(dron, {"h": 80, "yaw": 0}, t)
+    segunda = dron._gf_violation_streak, dron._goto_abort
+    dron.disable_geofence()
+    print(f"Fijo dentro de una exclusión: fijo {primera} | 1er paquete {segunda}  (esperado (1, False) | (2, True))")
+    assert primera == (1, False) and segunda == (2, True)
+
+
+def main():
+    print("=== Test del geofence predictivo (simulador) ===")
+    hover_fuera()
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0).start()
+
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+    dron.startTelemetry(freq_hz=10)
+    dron.takeOff(0.5, blocking=True)
+
+    # Modo hard: los movimientos se recortan antes de enviarse (margen de 10 cm al borde)
+    dron.set_geofence(max_x_cm=300, max_y_cm=300, max_z_cm=200, mode="hard")
+    print(f"forward(200) -> {dron.forward(200)} | Pose={dron.pose}  (esperado x≈140)")
+    print(f"forward(50)  -> {dron.forward(50)} | Pose={dron.pose}  (rechazado)")
+
+    dron.add_exclusion_circle(140, 100, 40)
+    print(f"right(150)   -> {dron.right(150)} | Pose={dron.pose}  (se para antes del círculo)")
+
+    dron.goto_rel(dx_cm=-500, dy_cm=0, dz_cm=0, blocking=True)
+    print(f"goto_rel(-500, 0) -> Pose={dron.pose}  (objetivo recortado, x≈-140)")
+
+    # Modo soft: solo avisa
+    dron.set_geofence(max_x_cm=300, max_y_cm=300, max_z_cm=200, mode="soft")
+    dron.clear_exclusions()
+    print(f"back(50) en soft -> {dron.back(50)} | Pose={dron.pose}")
+
+    dron.disable_geofence()
+    dron.Land(blocking=True)
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+    print(f"Comandos enviados: {len(sim.commands)}")
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
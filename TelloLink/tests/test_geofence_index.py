@@ -0,0 +1,133 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_geofence import _inside_any_exclusion, _point_in_poly, _point_in_circle
+from TelloLink.modules.tello_zones import ExclusionIndex, CompiledZones, ZoneList, _COMPILED_ARRAYS
+import numpy as np
+import contextlib
+import io
+import math
+import random
+import time
+
+
+def main():
+    print("=== Test del índice espacial de exclusiones (sin vuelo) ===")
+    dron = TelloDron()
+    random.seed(0)
+
+    # 300 obstáculos repartidos en un área de 40x40 m
+    for _ in range(150):
+        cx, cy = random.uniform(-2000, 2000), random.uniform(-2000, 2000)
+        dron.add_exclusion_circle(cx, cy, random.uniform(20, 100), z_min_cm=0, z_max_cm=200)
+    for _ in range(150):
+        cx, cy = random.uniform(-2000, 2000), random.uniform(-2000, 2000)
+        dron.add_exclusion_poly([(cx, cy), (cx + 80, cy), (cx + 80, cy + 60), (cx, cy + 60)])
+
+    # Un contorno grande (200 vértices): se evalúa sobre la geometría compilada en NumPy
+    dron.add_exclusion_poly([(3000 + 500 * math.cos(a / 100 * math.pi), 500 * math.sin(a / 100 * math.pi))
+                             for a in range(200)])
+    print(f"Dentro del contorno grande: {_inside_any_exclusion(dron, 3000, 0, 100)} | "
+          f"fuera: {_inside_any_exclusion(dron, 3600, 0, 100)}")
+
+    # Como hacen los demostradores: append directo a la lista
+    dron._gf_excl_circles.append({"cx": 0.0, "cy": 0.0, "r": 50.0, "zmin": None, "zmax": None})
+    print(f"Dentro del círculo añadido a mano: {_inside_any_exclusion(dron, 10, 10, 100)}")
+
+    t0 = time.perf_counter()
+    hits = sum(_inside_any_exclusion(dron, random.uniform(-2000, 2000), random.uniform(-2000, 2000), 100)
+               for _ in range(2000))
+    dt = time.perf_counter() - t0
+    print(f"2000 consultas con {len(dron._gf_excl_polys) + len(dron._gf_excl_circles)} zonas: "
+          f"{dt * 1000:.1f} ms ({hits} dentro)")
+
+    # Consultas por lotes: todos los puntos de una vez y primer punto de violación de un segmento
+    pts = [(random.uniform(-2000, 2000), random.uniform(-2000, 2000), 100) for _ in range(5000)]
+    t0 = time.perf_counter()
+    mask = dron.geofence_check_points(pts)
+    print(f"geofence_check_points(5000): {(time.perf_counter() - t0) * 1000:.1f} ms ({int(sum(mask))} dentro)")
+    t0 = time.perf_counter()
+    t = dron.geofence_check_segment((2300, 0, 100), (3700, 0, 100))
+    print(f"geofence_check_segment: t={t} ({(time.perf_counter() - t0) * 1000:.1f} ms) "
+          f"-> entra en el contorno en x={2300 + t * 1400:.1f} (esperado ≈ 2500)")
+
+    # Configuración inmutable: una instantánea no cambia aunque luego se editen las zonas
+    cfg = dron.geofence_config()
+    dron._gf_excl_circles[-1]["r"] = 500.0  # edición directa del dict: la instantánea tiene su propia copia
+    dron.clear_exclusions()
+    print(f"Tras clear_exclusions: {_inside_any_exclusion(dron, 10, 10, 100)} | "
+          f"instantánea v{cfg.version}: {len(cfg.polys) + len(cfg.circles)} zonas, r={cfg.circles[-1]['r']:.0f}, "
+          f"vigente v{dron.geofence_config().version}")
+    print("=== Test completado ===")
+
+
+def _por_tramos(costes, n=100):
+    # Media (ms) del primer y del último tramo de n medidas
+    return sum(costes[:n]) / n * 1000, sum(costes[-n:]) / n * 1000
+
+
+def test_append_incremental():
+    # Añadir zonas de una en una con una consulta por lotes tras cada una: la compilación a NumPy se amplía
+    # con la zona nueva en lugar de recompilarse entera, así que lo que cuesta ponerse al día no crece
+    print("--- Compilación incremental del índice ---")
+    random.seed(1)
+    polys, circles = ZoneList(), ZoneList()
+    idx = ExclusionIndex(_point_in_poly, _point_in_circle)
+    pts = np.random.default_rng(1).uniform(-2000, 2000, size=(3, 200))
+    costes = []
+    for i in range(600):
+        cx, cy = random.uniform(-2000, 2000), random.uniform(-2000, 2000)
+        if i % 2:
+            circles.append({"cx": cx, "cy": cy, "r": 40.0, "zmin": None, "zmax": None})
+        else:
+            polys.append({"poly": [(cx + 40 * math.cos(a / 6 * math.pi), cy + 40 * math.sin(a / 6 * math.pi))
+                                   for a in range(12)]})
+        t0 = time.perf_counter()
+        idx.sync(polys, circles)
+        idx.compiled  # la zona nueva se compila al pedir la compilación
+        costes.append(time.perf_counter() - t0)
+        idx.contains_many(*pts)
+
+    # Mismo resultado que compilar todo de golpe
+    full = CompiledZones(list(polys), list(circles))
+    iguales = all(np.array_equal(getattr(idx.compiled, name), getattr(full, name)) for name in _COMPILED_ARRAYS)
+    primero, ultimo = _por_tramos(costes)
+    print(f"Compilación incremental == completa: {iguales} | sync+compilación: {primero:.3f} ms (primeras 100) "
+          f"-> {ultimo:.3f} ms (últimas 100)")
+    assert iguales, "la compilación incremental no coincide con la completa"
+    assert ultimo < 4 * primero + 0.5, "el coste de añadir una zona crece con el número de zonas"
+
+
+
+def test_publish_incremental():
+    # Lo mismo a través de la API: cada add_exclusion_* publica una configuración nueva que se lleva el índice
+    # de la anterior, así que la consulta que sigue solo indexa la zona añadida
+    print("--- Índice conservado entre publicaciones ---")
+    random.seed(2)
+    dron = TelloDron()
+    costes = []
+    with contextlib.redirect_stdout(io.StringIO()):  # add_exclusion_* informa de cada zona
+        for i in range(500):
+            cx, cy = random.uniform(-2000, 2000), random.uniform(-2000, 2000)
+            t0 = time.perf_counter()
+            if i % 2:
+                dron.add_exclusion_circle(cx, cy, 40.0)
+            else:
+                dron.add_exclusion_poly([(cx, cy), (cx + 80, cy), (cx + 80, cy + 60), (cx, cy + 60)])
+            _inside_any_exclusion(dron, cx, cy, 100)
+            costes.append(time.perf_counter() - t0)
+    primero, ultimo = _por_tramos(costes)
+    print(f"add + consulta: {primero:.3f} ms (primeras 100) -> {ultimo:.3f} ms (últimas 100) | "
+          f"total {sum(costes) * 1000:.0f} ms")
+    assert ultimo < 4 * primero + 0.5, "cada publicación reconstruye el índice entero"
+
+    # Una configuración anterior sigue respondiendo con sus propias zonas
+    cfg = dron.geofence_config()
+    dron.add_exclusion_circle(5000, 5000, 50.0)
+    print(f"Instantánea anterior: {cfg.index.first_hit(5000, 5000, 100)} | "
+          f"vigente: {dron.geofence_config().index.first_hit(5000, 5000, 100)[0]}")
+    assert cfg.index.first_hit(5000, 5000, 100) is None
+
+
+if __name__ == "__main__":
+    main()
+    test_append_incremental()
+    test_publish_incremental()
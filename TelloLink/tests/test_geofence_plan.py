@@ -0,0 +1,52 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_simulator import TelloSimulator
+import time
+
+
+def main():
+    print("=== Test del planificador de rutas del geofence (simulador) ===")
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0).start()
+
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+    dron.startTelemetry(freq_hz=10)
+    dron.takeOff(0.5, blocking=True)
+
+    # Un muro entre el dron y el objetivo: en línea recta el modo hard recortaría el trayecto
+    dron.set_geofence(max_x_cm=1000, max_y_cm=600, max_z_cm=200, mode="hard")
+    dron.add_exclusion_poly([(100, -150), (200, -150), (200, 300), (100, 300)])
+
+    z = dron.pose.z_cm
+    t0 = time.perf_counter()
+    path = dron.geofence_plan((0, 0, z), (350, 0, z))
+    print(f"Ruta ({(time.perf_counter() - t0) * 1000:.1f} ms): {path}")
+    t0 = time.perf_counter()
+    dron.geofence_plan((0, 0, z), (350, 0, z))
+    print(f"Misma ruta desde la caché: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+    dron.goto_rel(dx_cm=350, dy_cm=0, dz_cm=0, blocking=True, avoid=True)
+    print(f"goto_rel(350, 0, avoid=True) -> Pose={dron.pose}  (esperado x≈350, y≈0)")
+
+    # Objetivo dentro de una exclusión: no hay ruta
+    dron.add_exclusion_circle(0, 200, 50)
+    dron.goto_rel(dx_cm=-350, dy_cm=200, dz_cm=0, blocking=True, avoid=True)
+    print(f"goto_rel a una exclusión -> Pose={dron.pose}  (no se mueve)")
+
+    # Misión de vuelta rodeando el muro
+    dron.run_mission([{"x": 0, "y": 0, "z": z}], do_land=False, avoid=True)
+    print(f"Misión de vuelta -> Pose={dron.pose}  (esperado x≈0, y≈0)")
+
+    dron.disable_geofence()
+    dron.Land(blocking=True)
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+    print(f"Comandos enviados: {len(sim.commands)}")
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
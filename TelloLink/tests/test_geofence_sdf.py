@@ -0,0 +1,70 @@
+from TelloLink.Tello import TelloDron
+import math
+import time
+
+
+def main():
+    print("=== Test del campo de distancias del geofence (sin vuelo) ===")
+    dron = TelloDron()
+    dron.set_geofence(max_x_cm=600, max_y_cm=400, max_z_cm=200, z_min_cm=0, mode="soft")
+    dron.add_exclusion_circle(100, 0, 50)
+    dron.add_exclusion_poly([(-200, -100), (-100, -100), (-100, 100), (-200, 100)], z_min_cm=0, z_max_cm=120)
+
+    t0 = time.perf_counter()
+    d = dron.geofence_distance(0, 0, 100)
+    print(f"Rasterizado en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    # Valores esperados: 50 cm al círculo, 100 cm al techo, etc.
+    print(f"(0,0,100)    -> {d:6.1f} cm (esperado ~50, borde del círculo)")
+    print(f"(100,0,100)  -> {dron.geofence_distance(100, 0, 100):6.1f} cm (esperado ~-50, centro del círculo)")
+    print(f"(-150,0,100) -> {dron.geofence_distance(-150, 0, 100):6.1f} cm (esperado ~-50, dentro del polígono)")
+    print(f"(-150,0,150) -> {dron.geofence_distance(-150, 0, 150):6.1f} cm (esperado ~50, por encima del polígono)")
+    print(f"(0,180,100)  -> {dron.geofence_distance(0, 180, 100):6.1f} cm (esperado ~20, lado de la inclusión)")
+    print(f"(0,0,190)    -> {dron.geofence_distance(0, 0, 190):6.1f} cm (esperado ~10, techo)")
+    print(f"Gradiente en (0,0,100): {tuple(round(g, 2) for g in dron.geofence_gradient(0, 0, 100))} (esperado ~(-1,0,0))")
+
+    t0 = time.perf_counter()
+    for i in range(10000):
+        dron.geofence_distance(i % 500 - 250, i % 300 - 150, 100)
+    print(f"10000 consultas: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    # Al cambiar las zonas se vuelve a rasterizar
+    dron.add_exclusion_circle(0, 0, 20)
+    print(f"Tras añadir un círculo en el origen: (0,0,100) -> {dron.geofence_distance(0, 0, 100):6.1f} cm (esperado ~-20)")
+
+    dron.configure_geofence_sdf(resolution_cm=5)
+    print(f"Resolución 5 cm: (0,0,100) -> {dron.geofence_distance(0, 0, 100):6.1f} cm")
+
+    # Margen de seguridad: zonas ensanchadas e inclusión encogida, calculados una vez al fijarlo
+    dron.set_geofence_buffer(15)
+    print(f"Margen 15 cm: (0,180,100) -> {dron.geofence_distance(0, 180, 100):6.1f} cm (esperado ~5) | "
+          f"(0,-40,100) -> {dron.geofence_distance(0, -40, 100):6.1f} cm (esperado ~5)")
+    dron.set_geofence_buffer(0)
+    dron.disable_geofence()
+    holgura_relajada()
+
+
+def holgura_relajada():
+    # Salida y llegada a 5 cm de un muro y un círculo a media ruta: la holgura se relaja solo junto a los
+    # extremos; el resto de la ruta mantiene los 30 cm (sin pasar por el pasillo de 50 cm entre muro y círculo)
+    dron = TelloDron()
+    dron.set_geofence(max_x_cm=1000, max_y_cm=1000, max_z_cm=200, mode="soft")
+    dron.add_exclusion_poly([(-300, 100), (300, 100), (300, 150), (-300, 150)])
+    dron.add_exclusion_circle(0, 20, 30)
+    p0, p1 = (-200, 95, 100), (200, 95, 100)
+    path = dron.geofence_plan(p0, p1, clearance_cm=30)
+    radio = 30 + 25  # holgura + una celda de A*
+    peor = math.inf
+    for q0, q1 in zip([p0] + path[:-1], path):
+        for k in range(101):
+            x, y = q0[0] + (q1[0] - q0[0]) * k / 100, q0[1] + (q1[1] - q0[1]) * k / 100
+            if min(math.hypot(x - p0[0], y - p0[1]), math.hypot(x - p1[0], y - p1[1])) > radio:
+                peor = min(peor, dron.geofence_distance(x, y, 100))
+    print(f"Ruta junto a un muro: {[(round(x), round(y)) for x, y, _ in path]} | holgura mínima lejos de los "
+          f"extremos: {peor:.1f} cm (esperado >= 30)")
+    assert peor >= 29.0
+    dron.disable_geofence()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from TelloLink.Tello import TelloDron
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    print("=== Test de plantillas de geofence (sin vuelo) ===")
+    random.seed(0)
+    dron = TelloDron()
+    dron.set_geofence(max_x_cm=4000, max_y_cm=4000, max_z_cm=300, mode="hard")
+    for _ in range(200):
+        dron._gf_excl_circles.append({"cx": random.uniform(-2000, 2000), "cy": random.uniform(-2000, 2000),
+                                      "r": random.uniform(20, 100), "zmin": 0.0, "zmax": 200.0})
+        cx, cy = random.uniform(-2000, 2000), random.uniform(-2000, 2000)
+        dron._gf_excl_polys.append({"poly": [(cx, cy), (cx + 80, cy), (cx + 80, cy + 60), (cx, cy + 60)],
+                                    "zmin": None, "zmax": None})
+
+    pts = [(random.uniform(-2100, 2100), random.uniform(-2100, 2100), random.uniform(0, 300)) for _ in range(5000)]
+    ref = list(dron.geofence_check_points(pts))
+
+    path = dron.save_geofence(os.path.join(tempfile.mkdtemp(), "sitio"))
+    print(f"Tamaño de la plantilla: {os.path.getsize(path) / 1024:.0f} KiB")
+
+    otro = TelloDron()
+    t0 = time.perf_counter()
+    otro.load_geofence(path)
+    print(f"Carga: {(time.perf_counter() - t0) * 1000:.1f} ms | activo={otro._gf_enabled} modo={otro._gf_mode}")
+    print(f"Mismos resultados en {len(pts)} puntos: {list(otro.geofence_check_points(pts)) == ref}")
+
+    # Las listas cargadas siguen siendo editables
+    otro.add_exclusion_circle(0, 0, 30)
+    print(f"Tras añadir un círculo: {len(otro._gf_excl_circles)} círculos, versión {otro.geofence_config().version}")
+    otro.disable_geofence()
+    dron.disable_geofence()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from TelloLink.Tello import TelloDron
+import time
+
+def main():
+    print("=== Test del histórico de telemetría (sin vuelo) ===")
+    dron = TelloDron()
+    dron.connect()
+
+    # 5 minutos de histórico en buffer circular
+    dron.startTelemetry(freq_hz=5, history_s=300)
+    print("\n--> Recogiendo telemetría durante 10s...")
+    time.sleep(10)
+
+    hist = dron.history
+    if hist is None:
+        print("Histórico no disponible (¿falta NumPy?)")
+    else:
+        w = hist.last(seconds=5)
+        print(f"Muestras totales: {len(hist)} | últimos 5s: {len(w)}")
+        if len(w):
+            print(f"Batería: {w['battery_pct'][0]:.0f}% -> {w['battery_pct'][-1]:.0f}%")
+            print(f"Altura media: {w['height_cm'].mean():.1f} cm")
+            print(f"Temperatura máx: {w['temph_c'].max():.0f} °C")
+
+    dron.stopTelemetry()
+    dron.disconnect()
+    print("=== Test completado ===")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_simulator import TelloSimulator
+import time
+
+# Pads del simulador (x, y, yaw) y el mismo layout para el dron
+PADS = {1: (0, 0, 0), 2: (220, 0, 0), 3: (440, 0, 90)}
+
+
+def vuelo(con_pads: bool):
+    # Cada "forward 100" recorre 110 cm de verdad: la estima acumula 10 cm de error por tramo
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0, pads=PADS, move_error=0.1).start()
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port,
+                        mission_pads=0 if con_pads else None):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return None
+    if con_pads:
+        dron.set_pad_layout({mid: (x, y, 0, yaw) for mid, (x, y, yaw) in PADS.items()}, mode="snap")
+    dron.startTelemetry(freq_hz=10)
+    dron.takeOff(0.5, blocking=True)
+
+    for _ in range(4):
+        dron.forward(100)
+        time.sleep(0.3)   # unos paquetes de estado sobre el pad (si lo hay)
+    err = ((dron.pose.x_cm - sim.x_cm) ** 2 + (dron.pose.y_cm - sim.y_cm) ** 2) ** 0.5
+    print(f"{'Con' if con_pads else 'Sin'} pads: Pose={dron.pose} | real=({sim.x_cm:.0f}, {sim.y_cm:.0f}) | "
+          f"error {err:.0f} cm | último fijo: {dron.pad_fix()}")
+
+    dron.Land(blocking=True)
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+    return err
+
+
+def main():
+    print("=== Test de corrección de la pose con mission pads (simulador) ===")
+    sin_pads = vuelo(con_pads=False)   # esperado: ~40 cm de error
+    con_pads = vuelo(con_pads=True)    # esperado: ~0 cm (fijo sobre el pad 3)
+    assert sin_pads is not None and con_pads is not None, "sin conexión con el simulador"
+    # Los fijos (origen "fix" en la pose) deben dejar la estima sobre el pad y muy por debajo de la deriva
+    assert con_pads < 10.0, f"con pads el error es {con_pads:.1f} cm (esperado < 10)"
+    assert con_pads < sin_pads - 20.0, f"los pads no corrigen: {con_pads:.1f} cm vs {sin_pads:.1f} cm sin pads"
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from TelloLink.modules.tello_pose import PoseVirtual
+import threading
 import time
 import math
 
@@ -62,6 +63,50 @@ def main():
     pose.update_yaw(-600)
     print(f"Yaw tras -600° -> {pose.yaw_deg:.1f}°")
 
+    # Lecturas concurrentes: un escritor mueve la pose y un lector comprueba que nunca ve una pose a medias
+    print("\n[11] Lecturas consistentes con un escritor en otro hilo:")
+    pose.reset()
+    fin = threading.Event()
+
+    def escritor():
+        while not fin.is_set():
+            pose.update_go(10, 0, 10)   # x y z avanzan siempre a la vez
+
+    t = threading.Thread(target=escritor, daemon=True)
+    t.start()
+    buf = [0.0] * 5
+    rotas = lecturas = 0
+    t_fin = time.time() + 0.5
+    while time.time() < t_fin:
+        x, y, z, yaw, yaw0 = pose.snapshot(buf)
+        lecturas += 1
+        if x != z:
+            rotas += 1
+    fin.set()
+    t.join()
+    print(f"{lecturas} lecturas, {rotas} inconsistentes (esperado 0) | {pose}")
+
+    # Integración rc por lotes: misma trayectoria que muestra a muestra
+    print("\n[12] update_from_rc_batch frente a update_from_rc (20 min de joystick a 20 Hz):")
+    try:
+        import numpy as np
+        rng = np.random.default_rng(0)
+        n = 20 * 60 * 20
+        fwd, lat, vert, giro = (rng.integers(-100, 101, n).astype(float) for _ in range(4))
+        dts = rng.uniform(0.03, 0.07, n)
+        a, b = PoseVirtual(yaw_deg=30), PoseVirtual(yaw_deg=30)
+        t0 = time.perf_counter()
+        for i in range(n):
+            a.update_from_rc(fwd[i], lat[i], vert[i], giro[i], dt_sec=dts[i])
+        t1 = time.perf_counter()
+        b.update_from_rc_batch(fwd, lat, vert, giro, dts)
+        t2 = time.perf_counter()
+        dif = max(abs(u - v) for u, v in zip(a.snapshot(), b.snapshot()))
+        print(f"Muestra a muestra: {(t1 - t0) * 1000:.0f} ms | por lotes: {(t2 - t1) * 1000:.1f} ms | "
+              f"diferencia final: {dif:.1e} cm")
+    except RuntimeError as e:
+        print(f"Sin NumPy: {e}")
+
     print("\n✅ Test del módulo tello_pose completado correctamente.")
 
 if __name__ == "__main__":
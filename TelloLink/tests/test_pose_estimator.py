@@ -0,0 +1,79 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_estimator import PoseEstimator
+from TelloLink.modules.tello_simulator import TelloSimulator
+import time
+
+
+def main():
+    print("=== Test del estimador de pose (Kalman) ===")
+
+    # Sin telemetría: se comporta como la PoseVirtual y su incertidumbre crece con cada comando
+    est = PoseEstimator()
+    est.update_move("forward", 100)
+    est.update_move("right", 50)
+    est.update_yaw(90)
+    est.update_move("forward", 100)
+    print(f"[1] Solo comandos: {est}  (esperado x≈100, y≈150, yaw=90)")
+
+    # Geofence: lo que publica el estimador o un fijo es una medida y necesita 2 lecturas seguidas en violación;
+    # lo que publica un comando se confirma en la primera
+    dron = TelloDron()
+    dron.pose = PoseEstimator()
+    dron.state = "flying"
+    dron.set_geofence(max_x_cm=0, max_y_cm=0, max_z_cm=0, mode="soft")
+    dron.add_exclusion_circle(100, 0, 30)
+    dron.pose.apply_fix(100, 0)      # valor atípico (origen "fix")
+    atipico = getattr(dron, "_goto_abort", False)
+    dron.pose.apply_fix(0, 0)
+    dron.pose.apply_fix(100, 0)
+    dron.pose.apply_fix(100, 0)      # dos lecturas seguidas dentro
+    confirmado = dron._goto_abort
+    dron._goto_abort = False
+    dron.pose.apply_fix(0, 0)
+    dron.pose.update_move("forward", 100)  # comando
+    comando = dron._goto_abort
+    dron.disable_geofence()
+    print(f"[1b] Geofence: lectura atípica -> {atipico} | dos seguidas -> {confirmado} | comando -> {comando}  "
+          f"(esperado False | True | True)")
+    assert (atipico, confirmado, comando) == (False, True, True)
+
+    # Con el simulador: velocidades, altura, ToF y barómetro del paquete de estado (tiempo real: vg coherentes)
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=1.0).start()
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+    dron.enable_pose_estimator()
+    dron.startTelemetry(freq_hz=10)
+    dron.takeOff(0.5, blocking=True)
+    print(f"[2] Tras despegar: {dron.pose}  (sim z={sim.z_cm:.0f})")
+
+    dron.forward(100)
+    dron.right(50)
+    time.sleep(0.5)
+    print(f"[3] forward 100 + right 50: {dron.pose}  (sim x={sim.x_cm:.0f}, y={sim.y_cm:.0f})")
+
+    # Movimientos por rc: la pose sigue a las velocidades medidas
+    dron.rc(0, 50, 0, 0)
+    time.sleep(2.0)
+    dron.rc(0, 0, 0, 0)
+    time.sleep(1.0)
+    print(f"[4] rc adelante 2 s: {dron.pose}  (sim x={sim.x_cm:.0f}, y={sim.y_cm:.0f})")
+    print(f"    Velocidad estimada: {tuple(round(v, 1) for v in dron.pose.velocity_cm_s)} cm/s")
+    print(f"    Covarianza xyz (diag): {[round(float(v), 1) for v in dron.pose.covariance.diagonal()[:3]]}")
+
+    # La incertidumbre de la pose fija el margen del geofence
+    dron.set_geofence(max_x_cm=800, max_y_cm=800, max_z_cm=300, mode="soft")
+    dron.set_geofence_buffer(10, sigma_k=3)
+    dron.disable_geofence()
+
+    dron.Land(blocking=True)
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
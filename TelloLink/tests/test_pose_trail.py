@@ -0,0 +1,50 @@
+from TelloLink.modules.tello_estimator import PoseEstimator
+from TelloLink.modules.tello_pose import PoseVirtual
+import time
+
+
+def main():
+    print("=== Test del rastro de la pose (sin vuelo) ===")
+    pose = PoseVirtual()
+    trail = pose.enable_trail(capacity=100)
+
+    # Un cuadrado de 100 cm, con una marca de tiempo al empezar cada lado
+    marcas = []
+    for _ in range(4):
+        marcas.append(time.time())
+        time.sleep(0.01)
+        pose.update_move("forward", 100)
+        time.sleep(0.01)
+        pose.update_yaw(90)
+    print(f"Muestras: {len(trail)} | distancia recorrida: {trail.distance_cm():.1f} cm (esperado 400)")
+    print(f"Pose al empezar el 3er lado: {tuple(round(v) for v in trail.at(marcas[2]))}  (esperado ≈(100, 100, 0, 180))")
+    t_medio = (trail.view()["t"][2] + trail.view()["t"][3]) / 2.0
+    print(f"Interpolación entre muestras: {trail.at(t_medio)}")
+    print(f"Antes del rastro: {trail.at(marcas[0] - 10)} | después: {trail.at(time.time() + 10)}")
+
+    # Vuelo largo: la memoria no crece (buffer circular) pero la distancia total sigue contando
+    for i in range(1000):
+        pose.update_move("forward" if i % 2 else "back", 20)
+    print(f"Tras 1000 movimientos: {len(trail)} muestras (capacidad {trail.capacity}) | "
+          f"distancia {trail.distance_cm():.0f} cm (esperado 20400)")
+    v = trail.decimated(max_points=20)
+    print(f"Vista diezmada para dibujar: {len(v)} puntos, termina en la pose actual: "
+          f"{abs(v['x'][-1] - pose.x_cm) < 0.01 and abs(v['y'][-1] - pose.y_cm) < 0.01}")
+
+    # El despegue (reset) empieza un rastro nuevo
+    pose.reset()
+    print(f"Tras reset: {len(trail)} muestras, distancia {trail.distance_cm():.0f} cm")
+
+    # Con el estimador: una fila por paquete de estado aunque el paquete corrija también el yaw
+    est = PoseEstimator()
+    trail = est.enable_trail(capacity=100)
+    n0 = len(trail)
+    for i in range(10):
+        est.update_from_state({"yaw": 5.0 * i, "vgx": 1, "vgy": 0, "vgz": 0, "h": 80}, ts=100.0 + 0.1 * i)
+    print(f"Estimador: {len(trail) - n0} filas para 10 paquetes (esperado 10)")
+    assert len(trail) - n0 == 10
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
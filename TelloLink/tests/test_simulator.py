@@ -0,0 +1,63 @@
+from TelloLink.Tello import TelloDron
+from TelloLink.modules.tello_simulator import TelloSimulator
+import time
+
+
+def main():
+    print("=== Test con el simulador (sin dron real) ===")
+
+    # time_scale acelera movimientos y batería del simulador
+    sim = TelloSimulator(port=9889, state_port=9890, time_scale=5.0).start()
+
+    dron = TelloDron()
+    if not dron.connect(host="127.0.0.1", port=sim.port, state_port=sim.state_port):
+        print("No se pudo conectar al simulador")
+        sim.stop()
+        return
+
+    dron.startTelemetry(freq_hz=10)
+    time.sleep(0.5)
+    print(f"Batería={dron.battery_pct}% | Altura={dron.height_cm} cm")
+
+    t0 = time.time()
+    dron.takeOff(0.5, blocking=True)
+    print(f"[1] takeOff: {time.time() - t0:.2f}s | Pose={dron.pose}")
+
+    t0 = time.time()
+    x0, y0 = dron.pose.x_cm, dron.pose.y_cm
+    dron.goto_rel(dx_cm=100, dy_cm=50, dz_cm=0, blocking=True)
+    print(f"[2] goto_rel(100, 50): {time.time() - t0:.2f}s | Pose={dron.pose}")
+    print(f"    Simulador: x={sim.x_cm:.1f} y={sim.y_cm:.1f} z={sim.z_cm:.1f}")
+    # El residuo final tiene que estar dentro de la tolerancia de goto (8 cm), en la pose y en el simulador
+    for x, y in ((dron.pose.x_cm, dron.pose.y_cm), (sim.x_cm, sim.y_cm)):
+        residuo = ((x - x0 - 100) ** 2 + (y - y0 - 50) ** 2) ** 0.5
+        assert residuo <= 8.0, f"goto_rel(100, 50) termina a {residuo:.1f} cm del objetivo"
+
+    t0 = time.time()
+    n0 = len(sim.commands)
+    dron.goto_rel(dx_cm=-100, dy_cm=0, dz_cm=0, blocking=True, mode="step")
+    dron.goto_rel(dx_cm=100, dy_cm=0, dz_cm=0, blocking=True, mode="go")
+    print(f"[2b] goto step+go: {time.time() - t0:.2f}s | Comandos: {sim.commands[n0:]}")
+
+    # El modo rc integra la pose en tiempo real: el simulador no puede ir acelerado
+    sim.time_scale = 1.0
+    t0 = time.time()
+    n0 = len(sim.commands)
+    dron.goto_rel(dx_cm=-50, dy_cm=50, dz_cm=20, blocking=True, mode="rc")
+    sim.time_scale = 5.0
+    print(f"[2c] goto rc: {time.time() - t0:.2f}s | rc enviados: {len(sim.commands) - n0} | Pose={dron.pose}")
+    print(f"    Simulador: x={sim.x_cm:.1f} y={sim.y_cm:.1f} z={sim.z_cm:.1f}")
+
+    t0 = time.time()
+    dron.run_mission([{"dx": 0, "dy": -50, "dz": 0}, {"x": 0, "y": 0, "z": 80}], do_land=True)
+    print(f"[3] run_mission: {time.time() - t0:.2f}s | Pose={dron.pose}")
+
+    print(f"Comandos enviados: {len(sim.commands)}")
+    dron.stopTelemetry()
+    dron.disconnect()
+    sim.stop()
+    print("=== Test completado ===")
+
+
+if __name__ == "__main__":
+    main()
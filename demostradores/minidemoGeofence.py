@@ -168,6 +168,11 @@ class MiniRemoteApp:
         self.frame_bg = "#f0f0f0"
 
         self.dron = TelloDron()
+        # Rastro de la pose para dibujar el recorrido en el mapa
+        try:
+            self.dron.pose.enable_trail()
+        except RuntimeError as e:
+            print(f"[pose] Sin rastro: {e}")
 
         # Variables interfaz gráfica
         self.step_var = tk.IntVar(value=DEFAULT_STEP)
@@ -672,8 +677,10 @@ class MiniRemoteApp:
                                 # NO hacer break en SOFT → el movimiento continúa
 
                 # 2) Exclusiones - ✅ CORREGIDO: Maneja dicts uniformemente y valida Z
-                excl_polys = list(getattr(self.dron, "_gf_excl_polys", []))
-                excl_circles = list(getattr(self.dron, "_gf_excl_circles", []))
+                # Instantánea inmutable: no hace falta copiar las listas
+                gf_cfg = self.dron.geofence_config()
+                excl_polys = gf_cfg.polys
+                excl_circles = gf_cfg.circles
 
                 def _blocked_by_exclusion():
                     # Polígonos
@@ -839,8 +846,10 @@ class MiniRemoteApp:
 
     def _pull_telemetry(self):
         try:
-            bat = getattr(self.dron, "battery_pct", None)
-            h = getattr(self.dron, "height_cm", None)
+            # Una sola snapshot: batería, altura y pose del mismo instante
+            snap = self.dron.telemetry()
+            bat = snap.battery_pct
+            h = snap.height_cm
             snr = getattr(self.dron, "wifi_snr", None)
             st = getattr(self.dron, "state", "disconnected")
 
@@ -852,10 +861,10 @@ class MiniRemoteApp:
             # POSE: actualizar panel
             pose = getattr(self.dron, "pose", None)
             if pose:
-                x = getattr(pose, "x_cm", None)
-                y = getattr(pose, "y_cm", None)
-                z = getattr(pose, "z_cm", None)
-                yaw = getattr(pose, "yaw_deg", None)
+                if snap.seq:
+                    x, y, z, yaw = snap.x_cm, snap.y_cm, snap.z_cm, snap.pose_yaw_deg
+                else:
+                    x, y, z, yaw = pose.x_cm, pose.y_cm, pose.z_cm, pose.yaw_deg
                 self.x_var.set(f"X: {x:.1f} cm" if x is not None else "X: —")
                 self.y_var.set(f"Y: {y:.1f} cm" if y is not None else "Y: —")
                 self.z_var.set(f"Z: {z:.1f} cm" if z is not None else "Z: —")
@@ -1126,6 +1135,18 @@ class MiniRemoteApp:
                     canvas_pts.extend(self._world_to_canvas(px, py))
                 self.map_canvas.create_polygon(canvas_pts, outline="#ff0000", fill="", width=2, tags="exclusion")
 
+    def _draw_map_trail(self, pose):
+        """Dibuja el recorrido del dron (rastro de la pose, diezmado) como una polilínea."""
+        self.map_canvas.delete("trail")
+        trail = getattr(pose, "trail", None)
+        if trail is None or len(trail) < 2:
+            return
+        v = trail.decimated(400)
+        pts = []
+        for x, y in zip(v["x"].tolist(), v["y"].tolist()):
+            pts.extend(self._world_to_canvas(x, y))
+        self.map_canvas.create_line(*pts, fill="#9ecae1", width=2, tags="trail")
+
     def _update_map_drone(self):
         """Actualiza la posición del dron en el mapa."""
         # Validar que la ventana y el canvas existen
@@ -1162,6 +1183,9 @@ class MiniRemoteApp:
         print(f"[DEBUG] Dibujando dron en mapa: x={x:.1f}, y={y:.1f}, yaw={yaw}")
 
         try:
+            # Recorrido (debajo del dron)
+            self._draw_map_trail(pose)
+
             # Eliminar dron anterior (círculo Y flecha)
             if self._map_drone_item:
                 self.map_canvas.delete("drone")  # Borra TODO con tag "drone"
@@ -68,6 +68,11 @@ class MiniRemoteApp:
         self.root.configure(bg="#f0f0f0")
 
         self.dron = TelloDron()
+        # Rastro de la pose para dibujar el recorrido en el mapa
+        try:
+            self.dron.pose.enable_trail()
+        except RuntimeError as e:
+            print(f"[pose] Sin rastro: {e}")
 
         # Variables interfaz gráfica
         self.step_var = tk.IntVar(value=DEFAULT_STEP)
@@ -1003,6 +1008,18 @@ class MiniRemoteApp:
                     canvas_pts.extend(self._world_to_canvas(px, py))
                 self.map_canvas.create_polygon(canvas_pts, outline="#ff0000", fill="", width=2, tags="exclusion")
 
+    def _draw_map_trail(self, pose):
+        """Dibuja el recorrido del dron (rastro de la pose, diezmado) como una polilínea."""
+        self.map_canvas.delete("trail")
+        trail = getattr(pose, "trail", None)
+        if trail is None or len(trail) < 2:
+            return
+        v = trail.decimated(400)
+        pts = []
+        for x, y in zip(v["x"].tolist(), v["y"].tolist()):
+            pts.extend(self._world_to_canvas(x, y))
+        self.map_canvas.create_line(*pts, fill="#9ecae1", width=2, tags="trail")
+
     def _update_map_drone(self):
         """Actualiza la posición del dron en el mapa."""
         try:
@@ -1035,6 +1052,7 @@ class MiniRemoteApp:
         self._last_pose_key = key
 
         try:
+            self._draw_map_trail(pose)
             if self._map_drone_item:
                 self.map_canvas.delete("drone")
 